@@ -0,0 +1,451 @@
+# benchmarks/_fakes.py
+# Offline stand-ins shared by the benchmark scripts so they can run without a Gemini key.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+
+# Benchmarks are run as scripts from anywhere; make the server modules importable.
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+# Benchmarks should not leave game event logs or turn journals behind unless asked to.
+os.environ.setdefault("EVENT_LOG_ENABLED", "0")
+os.environ.setdefault("TURN_JOURNAL_ENABLED", "0")
+
+from config import VILLAGER_ROSTER
+
+# Per-request client logging drowns out the benchmark output.
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+FAKE_STORY = {
+    "story_theme": "The village elders trade outsiders' memories to keep their own from fading.",
+    "inaccessible_locations": ["Old Mill", "Chapel Crypt", "Dry Well"],
+    "correct_location": "Chapel Crypt",
+}
+
+def fake_quest_network(num_nodes: int = 8):
+    nodes = []
+    for i in range(num_nodes):
+        villager = VILLAGER_ROSTER[i % len(VILLAGER_ROSTER)]
+        nodes.append({
+            "node_id": f"node{i + 1}",
+            "villager_name": villager["name"],
+            "content": f"{villager['name']} remembers something odd near {villager['location']}.",
+            "type": "Information",
+            "priority": 5 - (i % 5),
+            "key_clue": i % 4 == 0,
+            "preconditions": [f"node{i}"] if i % 3 == 2 else [],
+            "required_familiarity": None,
+        })
+    return {"nodes": nodes}
+
+def fake_response_bank(lines: int = 3):
+    def band_lines(name, kind, band):
+        return [{"npc_dialogue": f"{name} ({kind}, {band} #{i + 1}): the mist is thick tonight, stranger.",
+                 "player_response": "Goodbye for now."} for i in range(lines)]
+    return {"villagers": [
+        {"name": v["name"], **{kind: {band: band_lines(v["name"], kind, band) for band in ("low", "mid", "high")}
+                               for kind in ("farewell", "not_yet")}}
+        for v in VILLAGER_ROSTER
+    ]}
+
+def fake_opening_lines():
+    return {"villagers": [
+        {"name": v["name"], "npc_dialogue": f"I'm {v['name']}. Not many strangers come through here.",
+         "player_responses": ["Nice to meet you.", "What happened here?"], "new_familiarity_level": 1}
+        for v in VILLAGER_ROSTER
+    ]}
+
+FAKE_DIALOGUE = {
+    "npc_dialogue": "Mist rolls in early these days. You'd do well to ask around the chapel.",
+    "player_responses": ["Ask about the chapel.", "Goodbye."],
+    "node_revealed_id": None,
+    "new_familiarity_level": 1,
+}
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeGeminiModel:
+    """Mimics the parts of genai.GenerativeModel the engine uses, with a fixed latency.
+
+    With blocking=True the async method sleeps synchronously, reproducing the old
+    behaviour where every LLM call stalled the event loop.
+    """
+    def __init__(self, latency: float = 0.5, blocking: bool = False, num_nodes: int = 8):
+        self.latency = latency
+        self.blocking = blocking
+        self.num_nodes = num_nodes
+        self.calls = 0
+
+    def _reply(self, prompt):
+        self.calls += 1
+        if "Opening Lines" in prompt:
+            return json.dumps(fake_opening_lines())
+        if "Response Bank" in prompt:
+            return json.dumps(fake_response_bank())
+        if "Quest Network" in prompt:
+            return json.dumps(fake_quest_network(self.num_nodes))
+        if "master storyteller" in prompt:
+            return json.dumps(FAKE_STORY)
+        return json.dumps(FAKE_DIALOGUE)
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self.latency)
+        return _FakeResponse(self._reply(prompt))
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        if stream:
+            return self._stream(self._reply(prompt))
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return _FakeResponse(self._reply(prompt))
+
+    async def _stream(self, text, chunk_size: int = 8):
+        # A fifth of the latency goes to the first chunk, the rest is spread evenly.
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        await asyncio.sleep(self.latency * 0.2)
+        per_chunk = self.latency * 0.8 / max(1, len(chunks))
+        for chunk in chunks:
+            yield _FakeResponse(chunk)
+            await asyncio.sleep(per_chunk)
+
+def make_fake_engine(latency: float = 0.5, blocking: bool = False, num_nodes: int = 8, max_concurrency: int = None, world_pool_size: int = 0):
+    from game_logic.engine import GameEngine
+    engine = GameEngine(api_key="offline-benchmark", llm_max_concurrency=max_concurrency,
+                        world_pool_size=world_pool_size, llm_backend="fake")
+    engine.llm_api.model = FakeGeminiModel(latency=latency, blocking=blocking, num_nodes=num_nodes)
+    return engine
+
+def make_session_store(max_resident: int = 100000, idle_ttl: float = 3600):
+    """A SessionStore whose archive is a throwaway in-memory SQLite database."""
+    from game_logic.session_store import SessionStore, SQLiteSessionArchive
+    return SessionStore(max_resident=max_resident, idle_ttl=idle_ttl, archive=SQLiteSessionArchive(":memory:"))
+
+class FakeRedis:
+    """
+    In-process stand-in for the redis-py methods KeyValueSessionBackend calls (GET, SET,
+    DEL, SCAN, EVAL of its CAS script), with key expiry. Not shared between processes.
+    """
+    def __init__(self):
+        import threading
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = self._encode(value)
+            self._expires.pop(key, None)
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = sum(1 for key in keys if self._alive(key))
+            for key in keys:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def scan_iter(self, match="*"):
+        import fnmatch
+        with self._lock:
+            keys = [key for key in list(self._data) if self._alive(key) and fnmatch.fnmatchcase(key, match)]
+        return iter(keys)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        from game_logic.shared_state import KeyValueSessionBackend
+        if script != KeyValueSessionBackend.CAS_SCRIPT:
+            raise NotImplementedError("FakeRedis only runs KeyValueSessionBackend.CAS_SCRIPT")
+        (version_key, data_key), (expected, blob, ttl) = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        with self._lock:
+            current = int(self._data[version_key]) if self._alive(version_key) else 0
+            if current != int(expected):
+                return -current - 1
+            self._data[version_key] = self._encode(current + 1)
+            self._data[data_key] = self._encode(blob)
+            for key in (version_key, data_key):
+                if int(ttl) > 0:
+                    self._expires[key] = time.time() + int(ttl)
+                else:
+                    self._expires.pop(key, None)
+            return current + 1
+
+class FakeChainNode:
+    """
+    Local stand-in for a OneChain fullnode's executeTransactionBlock, for the claim
+    batcher. A transaction is a list of (target, arguments) move calls; each complete_game
+    call creates a RewardClaim and emits an event naming it, and the response has the
+    JSON-RPC shape (effects, events, objectChanges). A transaction costs `rtt` plus
+    `per_call` per move call. Calls for game sessions in `abort_sessions` abort the whole
+    transaction, as a Move abort does; `flaky` is the chance a transaction fails transiently
+    before executing, `drop` the chance it executes and its response is lost on the way back.
+    Like the contract, nothing stops a second complete_game for the same session: it creates
+    another RewardClaim, counted in `duplicate_claims`.
+
+    A transaction's digest is a hash of its calls and gas version, as signing the same bytes
+    gives the same digest. Sending an executed digest again returns its response without
+    running it twice, and `get_transaction_block(digest)` looks one up.
+
+    The admin address starts with one gas coin of `admin_balance`. A transaction may name
+    the gas coin version it pays with: a version that is not the coin's current one is
+    rejected, and two transactions signed with the same version equivocate, failing both
+    and locking the coin for the rest of the epoch (here, for good). Without a gas
+    reference the coin is not tracked.
+
+    Every event is also appended to a feed served by `query_events`, shaped like
+    suix_queryEvents pages, for the chain indexer. `start_game`, `complete_game` and
+    `claim_reward` add the player-signed GameStarted, GameCompleted and RewardClaimed events,
+    shaped as the contract emits them.
+    """
+    def __init__(self, rtt: float = 0.4, per_call: float = 0.002, flaky: float = 0.0, seed: int = 0,
+                 admin_balance: int = 1_000_000_000_000, fee: int = 1_000_000, fee_per_call: int = 200_000,
+                 drop: float = 0.0):
+        import random
+        self.rtt = rtt
+        self.per_call = per_call
+        self.flaky = flaky
+        self.drop = drop
+        self.fee = fee
+        self.fee_per_call = fee_per_call
+        self.abort_sessions = set()
+        self.claims = {}  # game_session_id -> RewardClaim object ID
+        self.duplicate_claims = 0
+        self.executed = {}  # digest -> response
+        self.dropped = 0
+        self.coins = {}  # gas coin object ID -> [version, balance]
+        self.locks = {}  # (coin, version) -> digest of the transaction signed with it
+        self.locked = set()
+        self.transactions = 0
+        self.equivocations = 0
+        self.events = []
+        self._positions = {}  # (txDigest, eventSeq) -> index in events
+        self.event_queries = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self._next_id = 0
+        self.coins[self._object_id()] = [1, admin_balance]
+
+    def _object_id(self) -> str:
+        self._next_id += 1
+        return f"0x{self._next_id:064x}"
+
+    @staticmethod
+    def _reference(object_id, version):
+        return {"objectId": object_id, "version": version, "digest": f"{object_id[-8:]}v{version}"}
+
+    async def list_coins(self):
+        """GasCoinPool's list_coins: the admin's coins as (ObjectRef, balance)."""
+        from onchain_claims import ObjectRef
+        await asyncio.sleep(self.rtt / 2)
+        return [(ObjectRef(object_id, version), balance) for object_id, (version, balance) in self.coins.items()
+                if object_id not in self.locked]
+
+    @staticmethod
+    def digest_of(calls, gas) -> str:
+        import hashlib
+        signed = repr((calls, None if gas is None else (gas.object_id, gas.version)))
+        return "tx" + hashlib.sha256(signed.encode()).hexdigest()[:16]
+
+    async def get_transaction_block(self, digest):
+        await asyncio.sleep(self.rtt / 2)
+        return self.executed.get(digest)
+
+    async def _execute(self, gas, calls: int, effects_of, digest: str):
+        """Runs one transaction; `effects_of()` applies it and returns (effects, events, changes)."""
+        self.transactions += 1
+        if digest in self.executed:
+            await asyncio.sleep(self.rtt)
+            return self.executed[digest]
+        if gas is not None:
+            coin = self.coins.get(gas.object_id)
+            if gas.object_id in self.locked:
+                raise RuntimeError(f"Gas coin {gas.object_id} is locked by an equivocated transaction until epoch end")
+            if (gas.object_id, gas.version) in self.locks:
+                self.equivocations += 1
+                self.locked.add(gas.object_id)
+            elif coin is None or coin[0] != gas.version:
+                raise RuntimeError(f"Object {gas.object_id} version {gas.version} is unavailable for consumption")
+            else:
+                self.locks[(gas.object_id, gas.version)] = digest
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            await asyncio.sleep(self.rtt + self.per_call * calls)
+        finally:
+            self._in_flight -= 1
+        if gas is not None:
+            self.locks.pop((gas.object_id, gas.version), None)
+            if gas.object_id in self.locked:
+                raise RuntimeError(f"Transaction {digest} equivocated: gas coin {gas.object_id} is locked until epoch end")
+        if self._rng.random() < self.flaky:
+            raise ConnectionError("fullnode request timed out")
+        effects, events, changes = effects_of()
+        self._publish(digest, events)
+        if gas is not None:
+            coin = self.coins[gas.object_id]
+            fee = self.fee + self.fee_per_call * calls
+            coin[0] += 1
+            coin[1] -= fee
+            reference = self._reference(gas.object_id, coin[0])
+            effects["gasObject"] = {"owner": {"AddressOwner": "admin"}, "reference": reference}
+            effects.setdefault("mutated", []).append(effects["gasObject"])
+            effects["gasUsed"] = {"computationCost": str(fee), "storageCost": "0", "storageRebate": "0"}
+        response = {"digest": digest, "effects": effects, "events": events, "objectChanges": changes}
+        self.executed[digest] = response
+        if self._rng.random() < self.drop:
+            self.dropped += 1
+            raise ConnectionError("fullnode connection dropped before the response arrived")
+        return response
+
+    async def execute_transaction_block(self, calls, gas=None):
+        def effects_of():
+            for index, (target, arguments) in enumerate(calls):
+                if arguments[1] in self.abort_sessions:
+                    return {"status": {
+                        "status": "failure",
+                        "error": f"MoveAbort(MoveLocation {{ module: contract_onechain, function: 0 }}, 3) in command {index}",
+                    }}, [], []
+            created, events, changes = [], [], []
+            for target, (treasury_id, game_session_id, won, reward_amount) in calls:
+                claim_id = self._object_id()
+                self.duplicate_claims += game_session_id in self.claims
+                self.claims[game_session_id] = claim_id
+                object_type = f"{target.split('::')[0]}::contract_onechain::RewardClaim"
+                created.append({"owner": {"Shared": {}}, "reference": self._reference(claim_id, 1)})
+                changes.append({"type": "created", "objectId": claim_id, "objectType": object_type, "version": "1"})
+                events.append({"type": f"{target.split('::')[0]}::contract_onechain::GameCompleted",
+                               "parsedJson": {"game_session_id": game_session_id, "claim_id": claim_id,
+                                              "won": won, "reward_amount": str(reward_amount)}})
+            return {"status": {"status": "success"}, "created": created}, events, changes
+        return await self._execute(gas, len(calls), effects_of, self.digest_of(calls, gas))
+
+    async def split_coins(self, reserve, amounts, merge):
+        """GasCoinPool's split_coins: merges `merge` into the reserve, then splits `amounts` off it."""
+        from onchain_claims import execute_signed
+        digest = self.digest_of([("split", amounts, [ref.object_id for ref in merge])], reserve)
+        return await execute_signed(lambda: self._split_coins(reserve, amounts, merge, digest),
+                                    self.get_transaction_block, digest, backoff=self.rtt / 4)
+
+    async def _split_coins(self, reserve, amounts, merge, digest):
+        def effects_of():
+            balance = self.coins[reserve.object_id][1] + sum(self.coins.pop(ref.object_id)[1] for ref in merge)
+            if balance < sum(amounts):
+                return {"status": {"status": "failure", "error": "InsufficientCoinBalance in command 1"}}, [], []
+            self.coins[reserve.object_id][1] = balance - sum(amounts)
+            created = []
+            for amount in amounts:
+                object_id = self._object_id()
+                self.coins[object_id] = [1, amount]
+                created.append({"owner": {"AddressOwner": "admin"}, "reference": self._reference(object_id, 1)})
+            deleted = [self._reference(ref.object_id, ref.version + 1) for ref in merge]
+            return {"status": {"status": "success"}, "created": created, "deleted": deleted}, [], []
+        return await self._execute(reserve, len(amounts) + len(merge), effects_of, digest)
+
+    def _publish(self, digest, events, sender="0xadmin"):
+        timestamp = str(int(time.time() * 1000))
+        for seq, event in enumerate(events):
+            event.update(id={"txDigest": digest, "eventSeq": str(seq)}, sender=sender, timestampMs=timestamp)
+            self._positions[(digest, str(seq))] = len(self.events)
+            self.events.append(event)
+
+    def start_game(self, player: str, package_id: str = "0xpackage") -> str:
+        """A player's start_game_with_fee transaction; like the contract's event, it names no session."""
+        self.transactions += 1
+        digest = f"tx{self.transactions:08d}"
+        self._publish(digest, [{"type": f"{package_id}::contract_onechain::GameStarted",
+                                "parsedJson": {"player": player, "entrance_fee": "10000000",
+                                               "timestamp": str(int(time.time() * 1000))}}], sender=player)
+        return digest
+
+    def complete_game(self, player: str, game_session_id: str, score: int, won: bool, reward_amount: int,
+                      package_id: str = "0xpackage") -> str:
+        """
+        A player's complete_game_and_create_proof transaction for the server's game ID: creates
+        a GameCompletionProof owned by the player and emits GameCompleted, whose event does not
+        name the proof.
+        """
+        self.transactions += 1
+        digest = f"tx{self.transactions:08d}"
+        proof_id = self._object_id()
+        self.claims[game_session_id] = proof_id
+        events = [{"type": f"{package_id}::contract_onechain::GameCompleted",
+                   "parsedJson": {"player": player, "score": str(score), "won": won,
+                                  "reward_amount": str(reward_amount if won else 0),
+                                  "game_session_id": list(game_session_id.encode())}}]
+        self._publish(digest, events, sender=player)
+        self.executed[digest] = {"digest": digest, "events": events, "objectChanges": [{
+            "type": "created", "objectId": proof_id, "version": "1",
+            "objectType": f"{package_id}::contract_onechain::GameCompletionProof"}]}
+        return digest
+
+    def claim_reward(self, player: str, game_session_id: str, amount: int, package_id: str = "0xpackage"):
+        self.transactions += 1
+        self._publish(f"tx{self.transactions:08d}", [{
+            "type": f"{package_id}::contract_onechain::RewardClaimed",
+            "parsedJson": {"player": player, "amount": str(amount), "game_session_id": list(game_session_id.encode())},
+        }], sender=player)
+
+    async def query_events(self, cursor, limit):
+        """ChainIndexer's fetch: the page of events after `cursor`, oldest first."""
+        await asyncio.sleep(self.rtt / 4)
+        self.event_queries += 1
+        start = 0
+        if cursor is not None:
+            start = self._positions[(cursor["txDigest"], str(cursor["eventSeq"]))] + 1
+        page = self.events[start:start + limit]
+        return {"data": page, "nextCursor": page[-1]["id"] if page else cursor,
+                "hasNextPage": start + limit < len(self.events)}
+
+    def gas_pool(self, **kwargs):
+        from onchain_claims import GasCoinPool
+        return GasCoinPool(self.list_coins, self.split_coins, **kwargs)
+
+    def submitter(self, package_id: str = "0xpackage", treasury_id: str = "0xtreasury", gas_pool=None):
+        """
+        A ClaimBatcher `submit` callback doing what BlockchainService._submit_claims does.
+        Without a gas pool every transaction names the admin's first coin at the version
+        last seen, as a single signer resolving its gas coin per transaction would.
+        """
+        from onchain_claims import ObjectRef, claim_move_call, check_execution, execute_signed, map_created_claims
+        first_coin = next(iter(self.coins))
+
+        async def execute(calls, gas):
+            # Signed once: a lost response is looked up by digest and the same bytes resent.
+            return await execute_signed(lambda: self.execute_transaction_block(calls, gas=gas),
+                                        self.get_transaction_block, self.digest_of(calls, gas), backoff=self.rtt / 4)
+
+        async def submit(claims):
+            calls = [claim_move_call(package_id, treasury_id, claim) for claim in claims]
+            if gas_pool is None:
+                response = await execute(calls, ObjectRef(first_coin, self.coins[first_coin][0]))
+            else:
+                async with gas_pool.lease() as lease:
+                    response = await execute(calls, lease.ref)
+                    lease.settle(response)
+            check_execution(response)
+            return map_created_claims(claims, response)
+        return submit
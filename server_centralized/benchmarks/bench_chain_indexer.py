@@ -0,0 +1,134 @@
+# benchmarks/bench_chain_indexer.py
+# The chain index against a local stand-in fullnode's event feed: a cold index of N games
+# (paid starts, completions with their proof objects, payouts) keyed by the server game IDs
+# players send, a restart that resumes from the checkpoint and reads only new events,
+# session validation and claim lookups from the index against the fullnode round trip they
+# replace, and indexer lag while games keep starting and completing.
+#
+# Usage: python benchmarks/bench_chain_indexer.py --sessions 100000 --rtt-ms 80 --live-rate 200
+
+import os
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from chain_indexer import ChainIndexer
+from reward_service import RewardValidator
+
+def _fill(node, players, sessions: int, rng):
+    """Plays `sessions` games; 60% complete on-chain with a proof and half of those are paid out."""
+    rtt, node.rtt, node.per_call = node.rtt, 0.0, 0.0
+    played = []
+    for _ in range(sessions):
+        player = rng.choice(players)
+        node.start_game(player)
+        played.append((f"game-{rng.getrandbits(64):016x}", player))
+    completed = [s for s in played if rng.random() < 0.6]
+    for game_id, player in completed:
+        node.complete_game(player, game_id, rng.randrange(1000), True, 100_000_000)
+    for game_id, player in completed[::2]:
+        node.claim_reward(player, game_id, 100_000_000)
+    node.rtt = rtt
+    return played
+
+async def _catch_up(indexer):
+    while True:
+        await indexer.poll()
+        if indexer.caught_up:
+            return
+
+async def _live(node, indexer, players, rate: float, seconds: float, rng):
+    indexer.start()
+    lag = LatencyTracker(window=None)
+    miss_wait = LatencyTracker(window=None)
+    misses = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        player = rng.choice(players)
+        node.start_game(player)
+        if rng.random() < 0.05:
+            # A game completed on-chain just now: wait until the index has it.
+            game_id = f"game-{rng.getrandbits(64):016x}"
+            node.complete_game(player, game_id, 500, True, 100_000_000)
+            with miss_wait.time():
+                misses += (await indexer.wait_for_session(game_id)) is None
+        lag.record(indexer.lag_seconds() or 0.0)
+        await asyncio.sleep(rng.expovariate(rate))
+    await indexer.close()
+    return lag.summary(), miss_wait.summary(), misses
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Chain indexer benchmark")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--rtt-ms", type=float, default=80, help="Fullnode round trip per RPC")
+    parser.add_argument("--page-limit", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--live-rate", type=float, default=200, help="Games started per second in the live phase")
+    parser.add_argument("--live-seconds", type=float, default=10)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.getLogger("chain_indexer").setLevel(logging.ERROR)
+    rng = random.Random(11)
+    players = [f"0x{rng.getrandbits(256):064x}" for _ in range(args.players)]
+
+    node = _fakes.FakeChainNode(rtt=args.rtt_ms / 1000)
+    started = _fill(node, players, args.sessions, rng)
+    print(f"{args.sessions} game sessions, {len(node.events)} contract events, {args.rtt_ms:.0f}ms per fullnode RPC, "
+          f"pages of {args.page_limit}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'chain_index.sqlite3')}"
+        indexer = ChainIndexer(node.query_events, url=url, source="bench", page_limit=args.page_limit,
+                               lookup_transaction=node.get_transaction_block)
+        start = time.perf_counter()
+        asyncio.run(_catch_up(indexer))
+        elapsed = time.perf_counter() - start
+        print(f"  cold index        {indexer.events_indexed} events in {elapsed:.1f}s "
+              f"({indexer.events_indexed / elapsed:.0f} events/s, {node.event_queries} queries)")
+
+        more = _fill(node, players, args.sessions // 10, rng)
+        queries = node.event_queries
+        start = time.perf_counter()
+        indexer = ChainIndexer(node.query_events, url=url, source="bench", page_limit=args.page_limit,
+                               lookup_transaction=node.get_transaction_block)
+        loaded = time.perf_counter() - start
+        before = indexer.events_indexed
+        asyncio.run(_catch_up(indexer))
+        print(f"  restart           loaded {len(indexer._sessions)} sessions from disk in {loaded:.2f}s, resumed and "
+              f"read {indexer.events_indexed - before} new events in {node.event_queries - queries} queries "
+              f"(feed now {len(node.events)})")
+
+        sample = [rng.choice(started + more) for _ in range(args.lookups)]
+        # Per-call timers would cost more than the lookups; time the whole loop instead.
+        start = time.perf_counter()
+        valid = sum(RewardValidator.validate_game_session(game_id, indexer, player) for game_id, player in sample)
+        validate_us = (time.perf_counter() - start) / args.lookups * 1e6
+        impostor = players[0]
+        rejected = sum(not RewardValidator.validate_game_session(game_id, indexer, impostor)
+                       for game_id, player in sample if indexer.session(game_id) and player != impostor)
+        start = time.perf_counter()
+        claims = [indexer.claim(game_id) for game_id, _ in sample]
+        claim_us = (time.perf_counter() - start) / args.lookups * 1e6
+        print(f"  validate session  {validate_us:.1f}us mean ({valid}/{args.lookups} valid, "
+              f"{sum(1 for game_id, _ in sample if indexer.session(game_id))} completed on-chain, {rejected} "
+              f"rejected when sent by another player; an RPC per request would be ~{args.rtt_ms:.0f}ms)")
+        print(f"  claim lookup      {claim_us:.1f}us mean ({sum(1 for c in claims if c)} with a claim, "
+              f"{sum(1 for c in claims if c and c['claim_id'])} with its proof object ID)")
+
+        indexer.poll_interval = args.poll_interval
+        lag, miss_wait, misses = asyncio.run(_live(node, indexer, players, args.live_rate, args.live_seconds, rng))
+        stats = indexer.stats()
+        visibility = stats["visibility_latency"]
+        print(f"  live ({args.live_rate:.0f} starts/s, polling every {args.poll_interval}s)")
+        print(f"    indexer lag         p50 {lag['p50_ms']}ms  p95 {lag['p95_ms']}ms  p99 {lag['p99_ms']}ms")
+        print(f"    event to index      p50 {visibility['p50_ms']}ms  p95 {visibility['p95_ms']}ms")
+        print(f"    miss, wait for poll p50 {miss_wait['p50_ms']}ms  p95 {miss_wait['p95_ms']}ms  ({misses} still missing)")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,69 @@
+# benchmarks/bench_claim_batching.py
+# On-chain claim throughput against a local stand-in fullnode: claims arrive at a steady
+# rate and go through ClaimBatcher, once with batches of one (a transaction per claim, as
+# create_reward_claim used to do) and once batched. Reports claims/s, p50/p95 claim
+# latency and transactions sent; a few claims are made to abort so the individual retry
+# path is exercised too.
+#
+# Usage: python benchmarks/bench_claim_batching.py --claims 2000 --rate 100 --batch-size 100 --wait-ms 250
+
+import time
+import random
+import asyncio
+import logging
+import argparse
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from onchain_claims import ClaimBatcher, ClaimRequest
+
+async def _run(node, batcher, claims: int, rate: float, seed: int):
+    rng = random.Random(seed)
+    results = []
+
+    async def one(index):
+        request = ClaimRequest(f"0x{index:064x}", f"0x{rng.getrandbits(256):064x}", True, 100_000_000 + index)
+        results.append(await batcher.claim(request))
+
+    start = time.perf_counter()
+    tasks = []
+    for index in range(claims):
+        tasks.append(asyncio.ensure_future(one(index)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    await batcher.close()
+    return claims / (time.perf_counter() - start), sum(1 for claim_id in results if claim_id)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Reward claim batching benchmark")
+    parser.add_argument("--claims", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=100, help="Mean claims arriving per second")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--wait-ms", type=float, default=250)
+    parser.add_argument("--rtt-ms", type=float, default=400, help="Fullnode round trip per transaction")
+    parser.add_argument("--aborts", type=int, default=5, help="Claims that abort on-chain")
+    parser.add_argument("--unbatched-claims", type=int, default=50,
+                        help="Claims for the one-per-transaction run, which cannot keep up with the arrival rate")
+    args = parser.parse_args()
+    logging.getLogger("onchain_claims").setLevel(logging.CRITICAL)
+
+    print(f"{args.claims} claims arriving at ~{args.rate:.0f}/s, {args.rtt_ms:.0f}ms per transaction, "
+          f"{args.aborts} aborting")
+    runs = (("one per transaction", 1, min(args.claims, args.unbatched_claims)),
+            (f"batches of {args.batch_size}", args.batch_size, args.claims))
+    for label, batch_size, claims in runs:
+        node = _fakes.FakeChainNode(rtt=args.rtt_ms / 1000)
+        aborts = random.Random(3).sample(range(claims), min(claims, args.aborts))
+        node.abort_sessions = {f"0x{index:064x}" for index in aborts}
+        batcher = ClaimBatcher(node.submitter(), max_batch=batch_size, max_wait=args.wait_ms / 1000,
+                               retry_backoff=0.05)
+        batcher.claim_latency = LatencyTracker(window=None)
+        rate, claimed = asyncio.run(_run(node, batcher, claims, args.rate, seed=1))
+        stats = batcher.stats()
+        latency = stats["claim_latency"]
+        print(f"  {label:<22} {claims:>6} claims {rate:7.0f} claims/s  claim p50 {latency['p50_ms']:>8}ms  p95 {latency['p95_ms']:>8}ms  "
+              f"{node.transactions} transactions (mean batch {stats['mean_batch_size']}), {claimed} claimed, {stats['failed']} failed, "
+              f"{stats['individual_retries']} individual retries")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,121 @@
+# benchmarks/bench_complete_game_batch.py
+# Recording N completions through /api/complete-game one request at a time against one
+# POST to /api/complete-game/batch (in-process, each against a fresh ledger), with a few
+# invalid items mixed in. First checks the vectorized reward path against a line-by-line
+# transcription of the Move contract for every valid score, both endings and both
+# outcomes, and against RewardManager.calculate_reward.
+#
+# Usage: python benchmarks/bench_complete_game_batch.py --items 10000 --invalid 0.01
+
+import io
+import os
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+import httpx
+
+import _fakes  # noqa: F401  (sets up sys.path)
+from reward_service import RewardManager, U64_MAX
+
+def _move_reward(score: int, won: bool, is_true_ending: bool) -> int:
+    """complete_game_and_create_proof's reward, as the contract computes it."""
+    assert score <= 1000000, "E_INVALID_SCORE"
+    if not won:
+        return 0
+    reward = RewardManager.BASE_REWARD + score * RewardManager.SCORE_MULTIPLIER
+    assert reward <= U64_MAX, "arithmetic error"
+    if is_true_ending:
+        reward = reward + RewardManager.TRUE_ENDING_BONUS
+        assert reward <= U64_MAX, "arithmetic error"
+    if reward < RewardManager.MIN_REWARD:
+        reward = RewardManager.MIN_REWARD
+    if reward > RewardManager.MAX_REWARD:
+        reward = RewardManager.MAX_REWARD
+    return reward
+
+def _check_exact():
+    scores = np.arange(RewardManager.MAX_SCORE + 1, dtype=np.int64)
+    mismatches = 0
+    for won in (False, True):
+        for is_true_ending in (False, True):
+            vectorized = RewardManager.calculate_rewards(scores, np.full(len(scores), is_true_ending),
+                                                         np.full(len(scores), won)).tolist()
+            expected = [_move_reward(score, won, is_true_ending) for score in range(len(scores))]
+            mismatches += sum(1 for a, b in zip(vectorized, expected) if a != b)
+    manager = RewardManager(db_session=None)
+    single = sum(1 for score in range(0, RewardManager.MAX_SCORE + 1, 97) for te in (False, True)
+                 if manager.calculate_reward(score, te) != _move_reward(score, True, te))
+    try:
+        RewardManager.calculate_rewards(np.array([U64_MAX // RewardManager.SCORE_MULTIPLIER]), [False], [True])
+        overflow = "not detected"
+    except OverflowError:
+        overflow = "raised"
+    return 4 * len(scores), mismatches, single, overflow
+
+def _items(count: int, invalid: float, rng):
+    items = []
+    for i in range(count):
+        item = {"userAddress": f"0x{rng.getrandbits(256):064x}", "gameSessionId": f"session_{i:012d}",
+                "score": rng.randrange(0, 20000), "won": rng.random() < 0.7, "isTrueEnding": rng.random() < 0.1}
+        if rng.random() < invalid:
+            item[rng.choice(["score", "userAddress", "score"])] = rng.choice([-5, 1000001, "0xnothex"])
+        items.append(item)
+    return items
+
+async def _per_request(client, items):
+    ok = 0
+    for item in items:
+        response = await client.post("/api/complete-game", json=item)
+        ok += response.status_code == 200
+    return ok
+
+async def _batch(client, items):
+    response = await client.post("/api/complete-game/batch", json={"items": items})
+    response.raise_for_status()
+    return response.json()["completed"]
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Batch completion benchmark")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--invalid", type=float, default=0.01, help="Share of items with a bad field")
+    args = parser.parse_args()
+
+    combos, mismatches, single, overflow = _check_exact()
+    print(f"exactness: {combos} (score, won, ending) inputs, {mismatches} vectorized mismatches with the contract, "
+          f"{single} calculate_reward mismatches, u64 overflow {overflow}")
+
+    rng = random.Random(5)
+    items = _items(args.items, args.invalid, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["COMPLETIONS_DB_URL"] = f"sqlite:///{os.path.join(directory, 'per_request.sqlite3')}"
+        import main
+        from completions_ledger import CompletionsLedger
+        # Keep the per-completion log lines (they are part of the per-request cost) off the terminal.
+        for handler in logging.getLogger().handlers:
+            handler.setStream(io.StringIO())
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                start = time.perf_counter()
+                ok = await _per_request(client, items)
+                per_request = time.perf_counter() - start
+                main.completions = CompletionsLedger(f"sqlite:///{os.path.join(directory, 'batch.sqlite3')}")
+                start = time.perf_counter()
+                completed = await _batch(client, items)
+                batch = time.perf_counter() - start
+            return ok, per_request, completed, batch
+
+        ok, per_request, completed, batch = asyncio.run(run())
+    print(f"{args.items} completions, {args.invalid:.0%} invalid")
+    print(f"  per-request /api/complete-game  {per_request:7.2f}s  {args.items / per_request:8.0f} items/s  ({ok} recorded)")
+    print(f"  /api/complete-game/batch        {batch:7.2f}s  {args.items / batch:8.0f} items/s  ({completed} recorded)"
+          f"  {per_request / batch:.0f}x")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+# benchmarks/bench_completions_ledger.py
+# User-history lookups as the number of recorded completions grows: the old full scan of
+# the in-memory completed_games dict against the indexed SQLite ledger (first page, a
+# page deep into a long history via its cursor, and a hot-user cache hit), plus the
+# cost of recording one completion.
+#
+# Usage: python benchmarks/bench_completions_ledger.py --sizes 10000,100000,1000000 --users 50000
+
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import _fakes  # noqa: F401  (sets up sys.path)
+from game_logic.stats import LatencyTracker
+from completions_ledger import CompletionsLedger, add_completions
+from reward_service import RewardManager
+
+def _record(user: str, index: int, at: datetime, rng) -> dict:
+    won = rng.random() < 0.6
+    score = rng.randrange(0, 20000)
+    true_ending = won and rng.random() < 0.2
+    reward = RewardManager.BASE_REWARD + score * RewardManager.SCORE_MULTIPLIER if won else 0
+    return {"success": True, "gameSessionId": f"0x{index:064x}", "userAddress": user, "score": score, "won": won,
+            "isTrueEnding": true_ending, "rewardAmount": reward, "completedAt": at.isoformat(),
+            "needsBlockchainProof": won and reward > 0}
+
+def _old_lookup(completed_games: dict, user: str) -> dict:
+    # What get_user_completions did before the ledger.
+    user_completions = [comp for comp_id, comp in completed_games.items() if comp["userAddress"] == user]
+    return {"completions": user_completions, "totalRewards": sum(c["rewardAmount"] for c in user_completions if c["won"])}
+
+def _time(fn, repeats: int) -> dict:
+    tracker = LatencyTracker(window=None)
+    for _ in range(repeats):
+        with tracker.time():
+            fn()
+    return tracker.summary()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Completions ledger benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Total completions to measure at")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    logging.getLogger("reward_service").setLevel(logging.WARNING)
+
+    rng = random.Random(7)
+    users = [f"0x{rng.getrandbits(256):064x}" for _ in range(args.users)]
+    whale = users[0]  # Plays a lot: one game in fifty
+    start_at = datetime(2025, 1, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = CompletionsLedger(f"sqlite:///{os.path.join(directory, 'completions.sqlite3')}", cache_ttl=3600)
+        completed_games = {}
+        loaded = 0
+        print(f"{args.users} users; lookups are for random users and for one user with a long history")
+        for size in sizes:
+            start, before = time.perf_counter(), loaded
+            while loaded < size:
+                batch = []
+                for index in range(loaded, min(size, loaded + 5000)):
+                    user = whale if index % 50 == 0 else rng.choice(users)
+                    record = _record(user, index, start_at + timedelta(seconds=index), rng)
+                    batch.append(record)
+                    completed_games[f"{user}_{record['gameSessionId']}"] = record
+                with ledger.session() as db:
+                    add_completions(db, batch)
+                loaded += len(batch)
+            load_rate = (loaded - before) / max(time.perf_counter() - start, 1e-9)
+
+            sample = [rng.choice(users) for _ in range(args.lookups)]
+            scan_repeats = max(5, min(args.lookups, 2_000_000 // size))
+            old = _time(lambda: _old_lookup(completed_games, rng.choice(sample)), scan_repeats)
+            ledger.invalidate(*users)
+            first = _time(lambda: (ledger.invalidate(user := rng.choice(sample)), ledger.history(user)), args.lookups)
+            cursor = ledger.history(whale, limit=50)["nextCursor"]
+            for _ in range(10):  # Walk ten pages into the long history
+                cursor = ledger.history(whale, cursor=cursor, limit=50)["nextCursor"]
+            deep = _time(lambda: ledger.history(whale, cursor=cursor, limit=50), args.lookups)
+            ledger.history(whale)
+            cached = _time(lambda: ledger.history(whale), args.lookups * 10)
+
+            index = [loaded]
+
+            def record_one():
+                index[0] += 1
+                with ledger.session() as db:
+                    RewardManager(db_session=db).create_game_completion_record(
+                        rng.choice(users), f"0x{index[0]:064x}", rng.randrange(20000), True, False)
+            recording = _time(record_one, args.lookups)
+            loaded = index[0]
+
+            print(f"  {size:>9} completions (bulk loaded at {load_rate:.0f}/s)")
+            print(f"    old dict scan          p50 {old['p50_ms']:>9}ms  p99 {old['p99_ms']:>9}ms")
+            print(f"    ledger first page      p50 {first['p50_ms']:>9}ms  p99 {first['p99_ms']:>9}ms")
+            print(f"    ledger page 11 (long)  p50 {deep['p50_ms']:>9}ms  p99 {deep['p99_ms']:>9}ms")
+            print(f"    hot-user cache hit     p50 {cached['p50_ms']:>9}ms  p99 {cached['p99_ms']:>9}ms")
+            print(f"    record one completion  p50 {recording['p50_ms']:>9}ms  p99 {recording['p99_ms']:>9}ms")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,59 @@
+# benchmarks/bench_concurrent_interact.py
+# Fires N concurrent /interact calls at the FastAPI app (in-process, fake LLM) and
+# compares the old blocking LLM path against the async one.
+#
+# Usage: python benchmarks/bench_concurrent_interact.py --requests 20 --latency 0.5
+
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes  # noqa: F401  (sets up sys.path)
+import httpx
+import main
+
+async def _run(mode: str, num_requests: int, latency: float):
+    main.game_engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=num_requests)
+    main.active_games = _fakes.make_session_store()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        game_ids = []
+        for _ in range(num_requests):
+            game_ids.append((await client.post("/game/new", json={"difficulty": "Easy", "num_inaccessible_locations": 3})).json()["game_id"])
+
+        main.game_engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency, blocking=(mode == "blocking"))
+
+        async def interact(game_id, i):
+            payload = {"villager_id": f"villager_{i % 8}", "player_prompt": "Have you seen my friends?"}
+            response = await client.post(f"/game/{game_id}/interact", json=payload)
+            response.raise_for_status()
+
+        async def health_probe():
+            # Measured from when the probe wanted to fire, so time spent waiting
+            # for a blocked event loop counts against /health.
+            delay = latency / 4
+            start = time.perf_counter()
+            await asyncio.sleep(delay)
+            await client.get("/health")
+            return time.perf_counter() - start - delay
+
+        start = time.perf_counter()
+        results = await asyncio.gather(health_probe(), *(interact(g, i) for i, g in enumerate(game_ids)))
+        elapsed = time.perf_counter() - start
+        return elapsed, results[0]
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Concurrent /interact benchmark")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated LLM latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.requests} concurrent /interact calls, simulated LLM latency {args.latency:.2f}s")
+    for mode in ("blocking", "async"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, health = asyncio.run(_run(mode, args.requests, args.latency))
+        print(f"  {mode:<9} wall={elapsed:6.2f}s  ({elapsed / args.latency:5.1f}x LLM latency)  /health during load={health * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    main_cli()
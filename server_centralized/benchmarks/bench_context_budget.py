@@ -0,0 +1,49 @@
+# benchmarks/bench_context_budget.py
+# Plays one long conversation with a single villager and reports the Interaction
+# prompt size with the full history versus the bounded (summary + recent turns) one.
+#
+# Usage: python benchmarks/bench_context_budget.py --turns 150
+
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import estimate_tokens
+
+async def _run(turns: int, checkpoints):
+    engine = _fakes.make_fake_engine(latency=0.0)
+    game_state = await engine.start_new_game("bench", 3, "Easy")
+    npc_name = "Sam"
+    rows = []
+    for turn in range(1, turns + 1):
+        player_input = f"Turn {turn}: tell me more about what you saw near the grove last night, please."
+        await engine.process_interaction_turn(game_state, npc_name, player_input, {"friends": 0})
+        if turn in checkpoints:
+            start = time.perf_counter()
+            context = engine._build_interaction_context(game_state, npc_name, "And then?", {"friends": 0})
+            bounded_prompt = engine.llm_api._build_prompt("Interaction", context)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            unbounded_context = dict(context, chatHistory=game_state.memory_of(npc_name).as_messages(), historySummary="")
+            unbounded_prompt = engine.llm_api._build_prompt("Interaction", unbounded_context)
+            rows.append((turn, estimate_tokens(unbounded_prompt), estimate_tokens(bounded_prompt), build_ms))
+    return rows, engine.context_manager.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Conversation context budget benchmark")
+    parser.add_argument("--turns", type=int, default=150)
+    args = parser.parse_args()
+    checkpoints = {t for t in (1, 10, 25, 50, 100, 150, 250, 500) if t <= args.turns} | {args.turns}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows, stats = asyncio.run(_run(args.turns, checkpoints))
+    print(f"{'turn':>6} {'prompt tokens (full history)':>30} {'prompt tokens (bounded)':>25} {'build ms':>10}")
+    for turn, unbounded, bounded, build_ms in rows:
+        print(f"{turn:>6} {unbounded:>30} {bounded:>25} {build_ms:>10.2f}")
+    print(f"context manager: {stats}")
+
+if __name__ == "__main__":
+    main_cli()
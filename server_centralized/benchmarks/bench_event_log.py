@@ -0,0 +1,102 @@
+# benchmarks/bench_event_log.py
+# Request-path cost of game telemetry: the pretty-printed player state the engine used to
+# print on every turn, against emitting a typed event (info and debug verbosity, and with
+# turn sampling). Then how fast the writer thread drains a backlog to JSONL, and what a
+# too-small queue drops.
+#
+# Usage: python benchmarks/bench_event_log.py --turns 20000
+
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+import _fakes
+from game_logic.events import EventLog, Turn
+
+def _old_print(game_state, out):
+    with contextlib.redirect_stdout(out):
+        print("\n\n" + "-"*20 + " CURRENT PLAYER STATE " + "-"*20)
+        print(json.dumps({
+            "discovered_nodes": game_state.player_state.discovered_nodes,
+            "knowledge_summary": game_state.player_state.knowledge_summary,
+            "familiarity": dict(zip((v.name for v in game_state.villagers), game_state.player_state.familiarity)),
+        }, indent=2, default=str))
+        print("-"*60 + "\n\n")
+
+def _us_per_turn(fn, turns: int) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn()
+    return (time.perf_counter() - start) / turns * 1e6
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Game event log benchmark")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--turn-sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    n = args.turns
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = _fakes.make_fake_engine(latency=0.0)
+        game_state = asyncio.run(engine.start_new_game("game-0", 3, "Easy"))
+        for node in game_state.quest_graph.entries[:3]:
+            asyncio.run(engine.process_interaction_turn(game_state, node["villager_name"], "Tell me more.", {"friends": 0}))
+            if game_state.quest_graph.reveal(node["node_id"]):
+                game_state.player_state.discovered_nodes.append(node["node_id"])
+        game_state.player_state.knowledge_summary = game_state.quest_graph.knowledge_summary()
+    npc_name = game_state.villagers[0].name
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The old per-turn print, written to a real file as a redirected server log would be.
+        with open(os.devnull, "w") as devnull:
+            printed = _us_per_turn(lambda: _old_print(game_state, devnull), n)
+        print(f"{n} turns, per-turn telemetry cost on the request path")
+        print(f"  print(json.dumps(state, indent=2))   {printed:8.2f} us")
+
+        configs = [("emit, info", {}), ("emit, debug", {"verbosity": "debug"}),
+                   (f"emit, turns sampled {args.turn_sample_rate:.0%}", {"sample_rates": {"turn": args.turn_sample_rate}})]
+        for index, (label, options) in enumerate(configs):
+            log = EventLog(directory=os.path.join(directory, f"run{index}"), enabled=True,
+                           queue_size=n * 2, flush_interval=0.05, **options)
+            engine.events = log
+            game_ids = [f"game-{i}" for i in range(1000)]
+            i = 0
+
+            def emit():
+                nonlocal i
+                game_state.game_id = game_ids[i % 1000]
+                i += 1
+                engine._emit_turn(game_state, npc_name)
+            cost = _us_per_turn(emit, n)
+            start = time.perf_counter()
+            log.flush(timeout=60)
+            drained = time.perf_counter() - start
+            log.close()
+            size = os.path.getsize(log.path)
+            print(f"  {label:<36} {cost:8.2f} us   kept {log.written}/{n}, {size / log.written if log.written else 0:.0f} B/event, "
+                  f"backlog drained in {drained * 1000:.0f} ms")
+
+        burst = EventLog(directory=os.path.join(directory, "burst"), enabled=True, queue_size=1000, flush_interval=1.0)
+        for i in range(n):
+            burst.emit(Turn(f"game-{i % 1000}", npc_name, i, 1, 0))
+        burst.flush(timeout=60)
+        burst.close()
+        stats = burst.stats()
+        print(f"  burst of {n} into a 1000-event queue: written {stats['written']}, dropped {stats['dropped']}")
+
+        rotating = EventLog(directory=os.path.join(directory, "rotate"), enabled=True, queue_size=n * 2,
+                            max_bytes=256 * 1024, backups=3, flush_interval=0.05)
+        for i in range(n):
+            rotating.emit(Turn(f"game-{i % 1000}", npc_name, i, 1, 0))
+        rotating.flush(timeout=60)
+        rotating.close()
+        files = sorted(os.listdir(os.path.dirname(rotating.path)))
+        print(f"  rotation at 256KB, 3 backups: {rotating.rotations} rotations, files {files}")
+
+if __name__ == "__main__":
+    main_cli()
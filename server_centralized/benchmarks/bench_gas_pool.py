@@ -0,0 +1,82 @@
+# benchmarks/bench_gas_pool.py
+# Parallel claim submission from one admin address against a local stand-in fullnode.
+# Claims arrive faster than one transaction at a time can carry them and go through
+# ClaimBatcher three ways: one batch in flight (the serial signer), several in flight all
+# paying with the admin's one gas coin (which equivocates), and several in flight with
+# leased coins from a GasCoinPool. Small coin balances make the pool refill during the run.
+# Some transactions time out before executing and some execute but lose their response;
+# both are resolved by digest, so no claim may be created twice.
+#
+# Usage: python benchmarks/bench_gas_pool.py --claims 3000 --rate 500 --in-flight 8 --coin-balance 50000000
+
+import time
+import random
+import asyncio
+import logging
+import argparse
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from onchain_claims import ClaimBatcher, ClaimRequest
+
+async def _run(batcher, claims: int, rate: float, seed: int):
+    rng = random.Random(seed)
+    results = []
+
+    async def one(index):
+        request = ClaimRequest(f"0x{index:064x}", f"0x{rng.getrandbits(256):064x}", True, 100_000_000 + index)
+        results.append(await batcher.claim(request))
+
+    start = time.perf_counter()
+    tasks = []
+    for index in range(claims):
+        tasks.append(asyncio.ensure_future(one(index)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    await batcher.close()
+    return claims / (time.perf_counter() - start), sum(1 for claim_id in results if claim_id)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Gas coin pool parallel submission benchmark")
+    parser.add_argument("--claims", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=500, help="Mean claims arriving per second")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--wait-ms", type=float, default=100)
+    parser.add_argument("--in-flight", type=int, default=8, help="Parallel transactions (and pool size)")
+    parser.add_argument("--rtt-ms", type=float, default=400, help="Fullnode round trip per transaction")
+    parser.add_argument("--coin-balance", type=int, default=50_000_000, help="MIST per pooled gas coin")
+    parser.add_argument("--flaky", type=float, default=0.02, help="Chance a transaction times out")
+    parser.add_argument("--drop", type=float, default=0.02,
+                        help="Chance a transaction executes but its response is lost")
+    parser.add_argument("--one-coin-claims", type=int, default=300,
+                        help="Claims for the one-coin run, whose coin locks up almost at once")
+    args = parser.parse_args()
+    logging.getLogger("onchain_claims").setLevel(logging.CRITICAL)
+
+    print(f"{args.claims} claims arriving at ~{args.rate:.0f}/s, batches of up to {args.batch_size}, "
+          f"{args.rtt_ms:.0f}ms per transaction, {args.flaky:.0%} of transactions time out, "
+          f"{args.drop:.0%} lose their response")
+    runs = (("serial signer", 1, False, args.claims),
+            (f"{args.in_flight} in flight, one coin", args.in_flight, False, min(args.claims, args.one_coin_claims)),
+            (f"{args.in_flight} in flight, gas pool", args.in_flight, True, args.claims))
+    for label, in_flight, pooled, claims in runs:
+        node = _fakes.FakeChainNode(rtt=args.rtt_ms / 1000, flaky=args.flaky, drop=args.drop, seed=5)
+        pool = node.gas_pool(size=in_flight, coin_balance=args.coin_balance,
+                             min_balance=args.coin_balance // 4) if pooled else None
+        batcher = ClaimBatcher(node.submitter(gas_pool=pool), max_batch=args.batch_size,
+                               max_wait=args.wait_ms / 1000, max_in_flight=in_flight, retry_backoff=0.05)
+        batcher.claim_latency = LatencyTracker(window=None)
+        rate, claimed = asyncio.run(_run(batcher, claims, args.rate, seed=1))
+        stats = batcher.stats()
+        latency = stats["claim_latency"]
+        print(f"  {label:<26} {rate:6.0f} claims/s  claim p50 {latency['p50_ms']:>8}ms  p95 {latency['p95_ms']:>8}ms  "
+              f"{claimed}/{claims} claimed, {node.transactions} transactions, "
+              f"{node.equivocations} equivocations, {node.max_in_flight} max in flight, "
+              f"{node.dropped} responses lost, {node.duplicate_claims} duplicate claims")
+        if pool is not None:
+            pool_stats = pool.stats()
+            print(f"  {'':<26} gas pool: {pool_stats['leases']} leases, {pool_stats['refills']} refills, "
+                  f"{pool_stats['waits']} waits for a coin, {pool_stats['stale']} coins awaiting re-read")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+# benchmarks/bench_interact_dedupe.py
+# Replays /interact traffic with double clicks, client-timeout retries and retries after
+# a lost response, with and without idempotency keys, and counts LLM calls and turns
+# actually appended to the conversation. Then cancels keyed requests mid-turn (a client
+# that dropped) while their retry is already waiting on the key: each retry must run the
+# turn itself, exactly once.
+#
+# Usage: python benchmarks/bench_interact_dedupe.py --games 50 --turns 10 --latency 0.2
+
+import io
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+import httpx
+import main
+from game_logic.request_coalescer import InteractionCoalescer
+
+async def _run(use_keys: bool, games: int, turns: int, latency: float, double_click: float, timeout_retry: float, lost_response: float):
+    main.game_engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=games * 4)
+    main.active_games = _fakes.make_session_store()
+    main.interactions = InteractionCoalescer()
+    rng = random.Random(11)
+    sent = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+        game_ids = [(await client.post("/game/new", json={"difficulty": "Easy", "num_inaccessible_locations": 3})).json()["game_id"]
+                    for _ in range(games)]
+        model = main.game_engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency)
+
+        async def player(game_id):
+            nonlocal sent
+            for turn in range(turns):
+                payload = {"villager_id": "villager_1", "player_prompt": f"Turn {turn}: have you seen my friends?"}
+                if use_keys:
+                    payload["idempotency_key"] = str(uuid.uuid4())
+                url = f"/game/{game_id}/interact"
+                attempts = [asyncio.create_task(client.post(url, json=payload))]
+                if rng.random() < double_click:
+                    attempts.append(asyncio.create_task(client.post(url, json=payload)))
+                if rng.random() < timeout_retry:
+                    # The client gives up at half the LLM latency; the first request keeps running server-side.
+                    await asyncio.sleep(latency / 2)
+                    attempts.append(asyncio.create_task(client.post(url, json=payload)))
+                await asyncio.gather(*attempts)
+                if rng.random() < lost_response:
+                    await client.post(url, json=payload)
+                    sent += 1
+                sent += len(attempts)
+
+        await asyncio.gather(*(player(g) for g in game_ids))
+        appended = sum(len(main.active_games[g].memory_of("Sam")) // 2 for g in game_ids)
+    return {"requests": sent, "llm_calls": model.calls, "turns_appended": appended, "dedupe": main.interactions.stats()}
+
+async def _owner_cancelled(games: int, latency: float):
+    main.game_engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=games * 4)
+    main.active_games = _fakes.make_session_store()
+    main.interactions = InteractionCoalescer()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+        game_ids = [(await client.post("/game/new", json={"difficulty": "Easy", "num_inaccessible_locations": 3})).json()["game_id"]
+                    for _ in range(games)]
+        model = main.game_engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency)
+
+        async def player(game_id):
+            url = f"/game/{game_id}/interact"
+            payload = {"villager_id": "villager_1", "player_prompt": "Have you seen my friends?",
+                       "idempotency_key": str(uuid.uuid4())}
+            owner = asyncio.create_task(client.post(url, json=payload))
+            await asyncio.sleep(latency / 4)
+            retry = asyncio.create_task(client.post(url, json=payload))
+            await asyncio.sleep(latency / 4)
+            owner.cancel()
+            try:
+                return (await retry).status_code
+            except asyncio.CancelledError:
+                return "cancelled"
+
+        statuses = await asyncio.gather(*(player(g) for g in game_ids))
+        appended = sum(len(main.active_games[g].memory_of("Sam")) // 2 for g in game_ids)
+    return statuses, model.calls, appended
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Idempotent /interact benchmark")
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated LLM latency in seconds")
+    parser.add_argument("--double-click", type=float, default=0.10)
+    parser.add_argument("--timeout-retry", type=float, default=0.05)
+    parser.add_argument("--lost-response", type=float, default=0.05)
+    args = parser.parse_args()
+
+    intended = args.games * args.turns
+    print(f"{args.games} games x {args.turns} turns = {intended} intended turns; "
+          f"double-click {args.double_click:.0%}, timeout retry {args.timeout_retry:.0%}, lost response {args.lost_response:.0%}")
+    for use_keys in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(_run(use_keys, args.games, args.turns, args.latency,
+                                      args.double_click, args.timeout_retry, args.lost_response))
+        label = "with idempotency keys" if use_keys else "without keys"
+        print(f"  {label:<22} requests={result['requests']:<5} llm_calls={result['llm_calls']:<5} "
+              f"turns_appended={result['turns_appended']:<5} (intended {intended})")
+        if use_keys:
+            print(f"  {json.dumps(result['dedupe'])}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        statuses, calls, appended = asyncio.run(_owner_cancelled(args.games, args.latency))
+    print(f"  owner cancelled mid-turn, retry waiting: {statuses.count(200)}/{args.games} retries served, "
+          f"{sum(1 for s in statuses if s != 200)} failed, llm_calls={calls} turns_appended={appended} "
+          f"(intended {args.games})")
+
+if __name__ == "__main__":
+    main_cli()
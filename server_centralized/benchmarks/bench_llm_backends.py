@@ -0,0 +1,111 @@
+# benchmarks/bench_llm_backends.py
+# Plays scripted games against the local fake backend while recording every call, then
+# plays the same games again from the recording and checks that each model output is
+# replayed byte for byte. Also reports quest-network validity and how the engine copes
+# with the configured error / malformed-output rates.
+#
+# Usage: python benchmarks/bench_llm_backends.py --games 5 --turns 8 --nodes 30 --error-rate 0.05 --malformed-rate 0.05
+
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from collections import Counter
+
+import _fakes
+from game_logic.engine import GameEngine
+from game_logic.stats import LatencyTracker
+from game_logic.llm_backends import FakeModel, RecordingModel, ReplayModel, prompt_kind, _prompt_key
+
+class _Capture:
+    """Passes calls through and keeps (kind, prompt hash, full output) for every successful one."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.outputs = Counter()
+        self.failures = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        try:
+            response = await self.inner.generate_content_async(prompt, generation_config=generation_config, stream=stream)
+        except Exception:
+            self.failures += 1
+            raise
+        if stream:
+            return self._stream(prompt, response)
+        self.outputs[(prompt_kind(prompt), _prompt_key(prompt), response.text)] += 1
+        return response
+
+    async def _stream(self, prompt, response):
+        parts = []
+        async for chunk in response:
+            parts.append(chunk.text)
+            yield chunk
+        self.outputs[(prompt_kind(prompt), _prompt_key(prompt), "".join(parts))] += 1
+
+async def _play(model, games: int, turns: int, difficulty: str):
+    engine = GameEngine(api_key=None, world_pool_size=0, llm_backend="fake")
+    engine.llm_api.model = capture = _Capture(model)
+    turn_latency = LatencyTracker()
+    node_counts, failed_worlds, failed_turns = [], 0, 0
+    for g in range(games):
+        # One game at a time so the calls (and the fault draws) happen in a fixed order.
+        try:
+            game_state = await engine.start_new_game(f"game-{g}", 3, difficulty)
+        except Exception:
+            failed_worlds += 1
+            continue
+        node_counts.append(len(game_state.quest_network["nodes"]))
+        names = [v.name for v in game_state.villagers]
+        for t in range(turns):
+            start = time.perf_counter()
+            try:
+                await engine.process_interaction_turn(game_state, names[t % len(names)], f"Question {t}?", {"friends": 0})
+            except Exception:
+                failed_turns += 1  # Malformed replies surface to the player as a failed turn.
+                continue
+            turn_latency.record(time.perf_counter() - start)
+    return capture, node_counts, (failed_worlds, failed_turns), turn_latency.summary()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Fake backend and record/replay benchmark")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--difficulty", default="Medium")
+    parser.add_argument("--nodes", type=int, default=0, help="Quest network size (0 = follow difficulty)")
+    parser.add_argument("--latency", default="lognormal:0.05,0.4;tail=0.05,4", help="Fake latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--malformed-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "recording.jsonl")
+    fake = FakeModel(latency=args.latency, error_rate=args.error_rate, malformed_rate=args.malformed_rate,
+                     num_nodes=args.nodes, seed=11)
+    print(f"{args.games} {args.difficulty} games x {args.turns} turns, latency '{args.latency}', "
+          f"error rate {args.error_rate:.0%}, malformed rate {args.malformed_rate:.0%}")
+    recorder = RecordingModel(fake, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        recorded, node_counts, (failed_worlds, failed_turns), record_latency = asyncio.run(
+            _play(recorder, args.games, args.turns, args.difficulty))
+    recorder.flush()
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    print(f"  recorded {len(records)} calls {dict(Counter(r['kind'] for r in records))}, "
+          f"{recorded.failures} errors, {failed_worlds} worlds and {failed_turns} turns failed, {os.path.getsize(path) / 1024:.0f}KB on disk")
+    print(f"  quest networks: {node_counts} nodes")
+    print(f"  record  turn latency {json.dumps(record_latency)}")
+
+    for timing in ("recorded", "instant"):
+        replay = ReplayModel(path, timing=timing)
+        with contextlib.redirect_stdout(io.StringIO()):
+            replayed, _, _, replay_latency = asyncio.run(_play(replay, args.games, args.turns, args.difficulty))
+        identical = replayed.outputs == recorded.outputs and replayed.failures == recorded.failures
+        print(f"  replay ({timing:<8}) turn latency {json.dumps(replay_latency)}")
+        print(f"  {'':<18} byte-identical={identical} misses={replay.misses}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,118 @@
+# benchmarks/bench_llm_resilience.py
+# Interaction calls against the fake backend with a slow tail, transient errors and
+# malformed output. Compares a single bare attempt (the old behaviour) with the resilient
+# policy: deadline, retries with backoff, hedging and the circuit breaker. Finishes with a
+# full outage to show the breaker failing fast, and a half-open probe that is cancelled by
+# its caller, after which the next call must still be let through.
+#
+# Usage: python benchmarks/bench_llm_resilience.py --calls 400 --concurrency 8 --error-rate 0.05 --malformed-rate 0.05
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from game_logic.llm_backends import FakeModel
+from game_logic.resilience import ResilientCaller, CircuitBreaker
+
+def _policy(enabled: bool, semaphore, hedge_initial_delay: float):
+    if enabled:
+        return ResilientCaller(semaphore, hedge_initial_delay=hedge_initial_delay)
+    # One attempt, no hedge, a breaker that never opens: what generate_content_async used to do.
+    return ResilientCaller(semaphore, retries=0, hedge_types=(), breaker=CircuitBreaker(threshold=10**9),
+                           deadlines={}, default_deadline=3600)
+
+async def _run(resilient: bool, calls: int, concurrency: int, latency: str, error_rate: float, malformed_rate: float):
+    engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=concurrency * 2)
+    game_state = await engine.start_new_game("game-0", 3, "Easy")
+    context = engine._build_interaction_context(game_state, "Sam", "What happened here?", {"friends": 0})
+    api = engine.llm_api
+    api.model = FakeModel(latency=latency, error_rate=error_rate, malformed_rate=malformed_rate, seed=3)
+    api.resilience = _policy(resilient, api._semaphore, hedge_initial_delay=1.0)
+    turn_latency, failures = LatencyTracker(window=None), 0
+    queue = asyncio.Queue()
+    for _ in range(calls):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            reply = await api.generate_content_async("Interaction", context)
+            turn_latency.record(time.perf_counter() - start)
+            failures += reply == "{}"
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return turn_latency.summary(), failures, api.resilience.stats()
+
+async def _outage(calls: int):
+    engine = _fakes.make_fake_engine(latency=0.0)
+    game_state = await engine.start_new_game("game-0", 3, "Easy")
+    context = engine._build_interaction_context(game_state, "Sam", "What happened here?", {"friends": 0})
+    engine.llm_api.model = FakeModel(latency="fixed:0.2", error_rate=1.0)
+    tracker = LatencyTracker()
+    for _ in range(calls):
+        with tracker.time():
+            await engine.llm_api.generate_content_async("Interaction", context)
+    return tracker.summary(), engine.llm_api.resilience.stats()["breaker"]
+
+async def _cancelled_probe():
+    engine = _fakes.make_fake_engine(latency=0.0)
+    game_state = await engine.start_new_game("game-0", 3, "Easy")
+    context = engine._build_interaction_context(game_state, "Sam", "What happened here?", {"friends": 0})
+    api = engine.llm_api
+    api.resilience = ResilientCaller(api._semaphore, retries=0, hedge_types=(),
+                                     breaker=CircuitBreaker(threshold=1, reset_after=0.1))
+    api.model = FakeModel(latency="fixed:0.05", error_rate=1.0)
+    await api.generate_content_async("Interaction", context)  # Opens the breaker
+    await asyncio.sleep(0.15)
+
+    # The probe is abandoned mid-flight, the way a dropped speculation or a gone client is.
+    api.model = FakeModel(latency="fixed:1.0")
+    probe = asyncio.ensure_future(api.generate_content_async("Interaction", context))
+    await asyncio.sleep(0.1)
+    probe.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await probe
+
+    api.model = FakeModel(latency="fixed:0.05")
+    reply = await api.generate_content_async("Interaction", context)
+    return reply != "{}", api.resilience.stats()["breaker"]
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="LLM resilience benchmark")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.3,0.3;tail=0.05,10", help="Fake latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--malformed-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{args.calls} Interaction calls, {args.concurrency} at a time, latency '{args.latency}', "
+          f"error rate {args.error_rate:.0%}, malformed rate {args.malformed_rate:.0%}")
+    for resilient in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            latency, failures, stats = asyncio.run(_run(resilient, args.calls, args.concurrency, args.latency,
+                                                        args.error_rate, args.malformed_rate))
+        label = "resilient" if resilient else "single try"
+        print(f"  {label:<11} {json.dumps(latency)}  user-facing failures={failures} ({failures / args.calls:.1%})")
+        if resilient:
+            by_type = stats["by_prompt_type"]["Interaction"]
+            print(f"  {'':<11} " + json.dumps({k: v for k, v in by_type.items() if not k.endswith("latency")}))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latency, breaker = asyncio.run(_outage(20))
+    print(f"  outage      20 calls with every attempt failing: {json.dumps(latency)}  breaker={json.dumps(breaker)}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        recovered, breaker = asyncio.run(_cancelled_probe())
+    print(f"  cancelled   half-open probe abandoned, next call {'served' if recovered else 'REJECTED'}  "
+          f"breaker={json.dumps(breaker)}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,326 @@
+# benchmarks/bench_load.py
+# End-to-end load generator for the game API. Simulated players arrive at a configurable
+# rate and each plays a full game: /game/new, a run of /interact turns with think time in
+# between, /guess, then /api/complete-game. Reports latency percentiles, throughput,
+# error rate and server RSS per endpoint, and writes a versioned JSON result so runs can
+# be compared across releases.
+#
+# By default the app runs in-process with the fake LLM backend; pass --url to load a
+# real server (and --server-pid to sample its RSS). In-process, the RSS reported is that of
+# the whole process, load generator included. Per-endpoint RSS is sampled while requests to
+# that endpoint are in flight, so very fast endpoints may have no samples.
+#
+# Usage: python benchmarks/bench_load.py --players 500 --rate 25 --turns 8 --think-time 2 --out load.json
+#        python benchmarks/bench_load.py --url http://127.0.0.1:8000 --server-pid 1234 --players 2000 --rate 50
+
+import io
+import os
+import math
+import json
+import logging
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+import _fakes
+import httpx
+from game_logic.stats import LatencyTracker
+
+# Bump when the player script, the arrival model or the result format changes, so results
+# from different versions are never compared against each other.
+LOADGEN_VERSION = 1
+
+ENDPOINTS = ("POST /game/new", "POST /game/{id}/interact", "POST /game/{id}/guess", "POST /api/complete-game")
+OPENING_PROMPT = "This is the starting prompt of the conversation."
+FREE_FORM_PROMPTS = (
+    "What happened to the travellers who came before us?",
+    "Have you seen anything strange at night?",
+    "Who else should I talk to?",
+    "Why does everyone avoid the old church?",
+)
+
+def read_rss(pid: int):
+    """Resident set size in bytes from /proc, or None where that is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = LatencyTracker(window=None)  # Keep every sample: percentiles over the whole run.
+        self.statuses = Counter()
+        self.errors = 0
+        self.in_flight = 0
+        self.rss_samples = 0
+        self.rss_total = 0
+        self.rss_peak = 0
+
+    def summary(self, wall_seconds: float) -> dict:
+        count = self.latency.count
+        return {
+            **self.latency.summary(),
+            "throughput_rps": round(count / wall_seconds, 2) if wall_seconds else None,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else None,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "rss_mean_mb": round(self.rss_total / self.rss_samples / 2**20, 1) if self.rss_samples else None,
+            "rss_peak_mb": round(self.rss_peak / 2**20, 1) if self.rss_samples else None,
+        }
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, args, server_pid: int):
+        self.client = client
+        self.args = args
+        self.server_pid = server_pid
+        self.endpoints = {name: EndpointStats() for name in ENDPOINTS}
+        self.players_started = 0
+        self.players_finished = 0
+        self.players_aborted = 0
+        self.active_players = 0
+        self.peak_players = 0
+        self.rss = []  # (seconds since start, bytes)
+        self._start = 0.0
+
+    async def _request(self, endpoint: str, path: str, payload: dict):
+        """POSTs and records the outcome; returns the JSON body, or None on any failure."""
+        stats = self.endpoints[endpoint]
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=payload)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        finally:
+            stats.in_flight -= 1
+        stats.latency.record(time.perf_counter() - start)
+        stats.statuses[status] += 1
+        if response is None or response.status_code >= 400:
+            stats.errors += 1
+            return None
+        return response.json()
+
+    async def _think(self, rng: random.Random):
+        mean = self.args.think_time
+        if mean > 0:
+            # Log-normal with the configured mean: most pauses are short, a few are long.
+            sigma = 0.6
+            await asyncio.sleep(rng.lognormvariate(0.0, sigma) * mean / math.exp(sigma * sigma / 2))
+
+    async def player(self, index: int):
+        rng = random.Random(f"{self.args.seed}:player:{index}")
+        self.players_started += 1
+        self.active_players += 1
+        self.peak_players = max(self.peak_players, self.active_players)
+        try:
+            finished = await self._play(rng, index)
+        finally:
+            self.active_players -= 1
+        if finished:
+            self.players_finished += 1
+        else:
+            self.players_aborted += 1
+
+    async def _play(self, rng: random.Random, index: int) -> bool:
+        game = await self._request("POST /game/new", "/game/new", {
+            "difficulty": self.args.difficulty, "num_inaccessible_locations": self.args.locations})
+        if game is None:
+            return False
+        game_id = game["game_id"]
+        villager_ids = [v["id"] for v in game["villagers"]]
+
+        turns = max(1, round(self.args.turns * rng.uniform(0.5, 1.5)))
+        villager_id, prompt, suggestions = rng.choice(villager_ids), OPENING_PROMPT, []
+        for turn in range(turns):
+            if turn:
+                await self._think(rng)
+                if rng.random() < self.args.switch_rate:
+                    villager_id, prompt = rng.choice(villager_ids), OPENING_PROMPT
+                elif suggestions and rng.random() < self.args.click_rate:
+                    prompt = rng.choice(suggestions)
+                else:
+                    prompt = rng.choice(FREE_FORM_PROMPTS)
+            reply = await self._request("POST /game/{id}/interact", f"/game/{game_id}/interact", {
+                "villager_id": villager_id, "player_prompt": prompt, "idempotency_key": f"{index}-{turn}"})
+            suggestions = (reply or {}).get("player_suggestions") or []
+
+        await self._think(rng)
+        verdict = await self._request("POST /game/{id}/guess", f"/game/{game_id}/guess", {
+            "location_name": rng.choice(game["inaccessible_locations"])})
+        if verdict is None:
+            return False
+
+        digest = hashlib.sha256(f"{self.args.seed}:{index}".encode()).hexdigest()
+        completion = await self._request("POST /api/complete-game", "/api/complete-game", {
+            "userAddress": "0x" + digest,
+            "gameSessionId": "0x" + hashlib.sha256(game_id.encode()).hexdigest(),
+            "score": rng.randint(0, 10000),
+            "won": verdict["is_correct"],
+            "isTrueEnding": verdict["is_true_ending"],
+        })
+        return completion is not None
+
+    async def _sample_rss(self, interval: float = 0.25):
+        while True:
+            rss = read_rss(self.server_pid) if self.server_pid else None
+            if rss is not None:
+                self.rss.append((round(time.perf_counter() - self._start, 3), rss))
+                for stats in self.endpoints.values():
+                    if stats.in_flight:
+                        stats.rss_samples += 1
+                        stats.rss_total += rss
+                        stats.rss_peak = max(stats.rss_peak, rss)
+            await asyncio.sleep(interval)
+
+    def arrival_gaps(self):
+        rng = random.Random(f"{self.args.seed}:arrivals")
+        for _ in range(self.args.players):
+            if self.args.arrival == "poisson":
+                yield rng.expovariate(self.args.rate)
+            elif self.args.arrival == "burst":
+                yield 0.0
+            else:
+                yield 1.0 / self.args.rate
+
+    async def run(self) -> float:
+        self._start = time.perf_counter()
+        sampler = asyncio.ensure_future(self._sample_rss())
+        players = []
+        try:
+            for index, gap in enumerate(self.arrival_gaps()):
+                await asyncio.sleep(gap)
+                players.append(asyncio.ensure_future(self.player(index)))
+            await asyncio.gather(*players)
+        finally:
+            sampler.cancel()
+        return time.perf_counter() - self._start
+
+    def report(self, wall_seconds: float) -> dict:
+        rss = [value for _, value in self.rss]
+        return {
+            "wall_seconds": round(wall_seconds, 2),
+            "players": {
+                "started": self.players_started,
+                "finished": self.players_finished,
+                "aborted": self.players_aborted,
+                "peak_concurrent": self.peak_players,
+                "games_per_second": round(self.players_finished / wall_seconds, 2) if wall_seconds else None,
+            },
+            "endpoints": {name: stats.summary(wall_seconds) for name, stats in self.endpoints.items()},
+            "server_rss_mb": {
+                "start": round(rss[0] / 2**20, 1),
+                "peak": round(max(rss) / 2**20, 1),
+                "end": round(rss[-1] / 2**20, 1),
+            } if rss else None,
+        }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_fakes.SERVER_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+_scratch = None
+
+def _in_process_app(args):
+    """Points main's globals at a fresh engine with the fake LLM backend and returns the app."""
+    global _scratch
+    # Scratch databases, removed at exit; set before importing main so its defaults are never created here.
+    _scratch = tempfile.TemporaryDirectory(prefix="bench_load_")
+    url = f"sqlite:///{os.path.join(_scratch.name, 'completions.sqlite3')}"
+    os.environ["COMPLETIONS_DB_URL"] = url
+    os.environ["SESSION_ARCHIVE_PATH"] = os.path.join(_scratch.name, "sessions.sqlite3")
+    import main
+    from completions_ledger import CompletionsLedger
+    from game_logic.engine import GameEngine
+    from game_logic.llm_backends import FakeModel
+    from game_logic.request_coalescer import InteractionCoalescer
+    main.game_engine = GameEngine(api_key=None, llm_max_concurrency=args.llm_concurrency,
+                                  world_pool_size=0, llm_backend="fake")
+    main.game_engine.llm_api.model = FakeModel(latency=args.llm_latency, error_rate=args.llm_error_rate, seed=args.seed)
+    main.active_games = _fakes.make_session_store()
+    main.interactions = InteractionCoalescer()
+    main.completions = CompletionsLedger(url)
+    for name in ("main", "reward_service"):
+        logging.getLogger(name).setLevel(logging.WARNING)  # One INFO line per completion otherwise.
+    return main.app
+
+async def _main(args) -> dict:
+    if args.url:
+        transport, base_url, server_pid = None, args.url, args.server_pid
+    else:
+        transport = httpx.ASGITransport(app=_in_process_app(args))
+        base_url, server_pid = "http://loadgen", os.getpid()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        load = LoadRun(client, args, server_pid)
+        wall = await load.run()
+    return load.report(wall)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="End-to-end HTTP load generator")
+    parser.add_argument("--url", default=None, help="Server base URL; omit to run the app in-process with the fake LLM")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of the server to sample RSS from (with --url)")
+    parser.add_argument("--players", type=int, default=200, help="Total simulated players")
+    parser.add_argument("--rate", type=float, default=20.0, help="Player arrivals per second")
+    parser.add_argument("--arrival", choices=("poisson", "constant", "burst"), default="poisson")
+    parser.add_argument("--turns", type=int, default=8, help="Mean /interact calls per player")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean player think time between requests, seconds")
+    parser.add_argument("--click-rate", type=float, default=0.6, help="Share of turns that pick a suggested response")
+    parser.add_argument("--switch-rate", type=float, default=0.25, help="Share of turns that move to another villager")
+    parser.add_argument("--difficulty", default="Easy")
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout, seconds")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.35", help="In-process fake LLM latency distribution")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="In-process fake LLM error rate")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="In-process LLM concurrency limit")
+    parser.add_argument("--label", default=None, help="Free-form tag stored with the result, e.g. a release name")
+    parser.add_argument("--out", default=None, help="Write the versioned JSON result here")
+    args = parser.parse_args()
+
+    print(f"{args.players} players, {args.arrival} arrivals at {args.rate}/s, ~{args.turns} turns, "
+          f"think time ~{args.think_time}s, target {args.url or 'in-process app (fake LLM)'}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = asyncio.run(_main(args))
+
+    result = {
+        "benchmark": "bench_load",
+        "loadgen_version": LOADGEN_VERSION,
+        "label": args.label,
+        "git_commit": _git_commit(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": vars(args),
+        **report,
+    }
+    players = report["players"]
+    print(f"  {report['wall_seconds']}s wall, {players['finished']}/{players['started']} games finished, "
+          f"peak {players['peak_concurrent']} concurrent players, {players['games_per_second']} games/s")
+    for name, stats in report["endpoints"].items():
+        print(f"  {name:<26} n={stats['count']:<6} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms "
+              f"{stats['throughput_rps']} req/s  errors={stats['error_rate']}  rss peak={stats['rss_peak_mb'] or '-'} MB")
+    if report["server_rss_mb"]:
+        print(f"  server RSS {json.dumps(report['server_rss_mb'])}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"  wrote {args.out}")
+
+if __name__ == "__main__":
+    main_cli()
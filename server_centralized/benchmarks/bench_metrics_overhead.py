@@ -0,0 +1,91 @@
+# benchmarks/bench_metrics_overhead.py
+# What the metrics cost on the request path: per-observation cost of counters, histograms
+# and hot-path timers, the ASGI middleware's per-request overhead, and the time to render
+# a scrape with a realistic number of series.
+#
+# Usage: python benchmarks/bench_metrics_overhead.py --iterations 200000
+
+import time
+import asyncio
+import argparse
+
+import _fakes  # noqa: F401  (sets up sys.path)
+from game_logic.metrics import Registry, HTTPMetricsMiddleware, HOT_PATH_BUCKETS, LLM_BUCKETS, hot_path
+
+def _ns_per_op(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+async def _endpoint(scope, receive, send):
+    scope["endpoint"] = _endpoint  # What the router sets on a match
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+class _App:
+    routes = [type("Route", (), {"endpoint": _endpoint, "path": "/game/{game_id}/interact"})()]
+
+async def _requests(app, iterations: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app({"type": "http", "method": "POST", "path": "/game/x/interact", "app": _App}, receive, send)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Metrics overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    registry = Registry()
+    counter = registry.counter("c_total", "c", ("prompt_type",))
+    histogram = registry.histogram("h_seconds", "h", ("prompt_type", "model", "outcome"), LLM_BUCKETS)
+    hot = registry.histogram("hot_seconds", "hot", ("path",), HOT_PATH_BUCKETS)
+    child = hot.labels("apply_turn")
+
+    print(f"{n} iterations")
+    print(f"  empty loop                       {_ns_per_op(lambda: None, n):8.0f} ns")
+    print(f"  counter.labels(..).inc()          {_ns_per_op(lambda: counter.labels('Interaction').inc(40), n):8.0f} ns")
+    print(f"  histogram.labels(..).observe()    {_ns_per_op(lambda: histogram.labels('Interaction', 'm', 'valid').observe(0.8), n):8.0f} ns")
+
+    def timed():
+        with child.time():
+            pass
+    print(f"  hot-path timer (with block)       {_ns_per_op(timed, n):8.0f} ns")
+
+    def timed_lookup():
+        with hot_path("apply_turn"):
+            pass
+    print(f"  hot_path('...') incl. lookup      {_ns_per_op(timed_lookup, n):8.0f} ns")
+
+    requests = max(1000, n // 10)
+    bare = asyncio.run(_requests(_endpoint, requests))
+    wrapped = asyncio.run(_requests(HTTPMetricsMiddleware(_endpoint), requests))
+    print(f"  ASGI request, no middleware       {bare:8.0f} ns")
+    print(f"  ASGI request, metrics middleware  {wrapped:8.0f} ns  (+{wrapped - bare:.0f} ns per request)")
+
+    # A busy server: 8 routes x 4 statuses, 5 prompt types x 3 models x 3 outcomes, 5 hot paths.
+    http = registry.histogram("http_seconds", "http", ("method", "route", "status"))
+    for route in range(8):
+        for status in (200, 404, 409, 500):
+            http.labels("POST", f"/route/{route}", status).observe(0.01)
+    for prompt_type in range(5):
+        counter.labels(f"type{prompt_type}").inc()
+        for model in range(3):
+            for outcome in ("valid", "malformed", "error"):
+                histogram.labels(f"type{prompt_type}", f"model{model}", outcome).observe(1.0)
+    for path in range(5):
+        hot.labels(f"path{path}").observe(1e-5)
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"  render scrape ({len(text.splitlines())} lines, {len(text) / 1024:.0f}KB)   {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,72 @@
+# benchmarks/bench_model_routing.py
+# Interaction calls routed to a primary model whose latency degrades for a while and then
+# recovers. Compares static routing with adaptive tiering, which moves traffic to the
+# faster model while the primary is over its latency budget.
+#
+# Usage: python benchmarks/bench_model_routing.py --calls-per-phase 150 --budget 0.5
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from game_logic.llm_backends import FakeModel, LatencyProfile
+from game_logic.model_router import ModelRouter
+
+PRIMARY, FAST = "gemini-2.5-flash", "gemini-2.5-flash-lite"
+
+async def _run(adaptive: bool, calls_per_phase: int, concurrency: int, budget: float, phases):
+    engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=concurrency * 2)
+    game_state = await engine.start_new_game("game-0", 3, "Hard")
+    context = engine._build_interaction_context(game_state, "Sam", "What happened here?", {"friends": 0})
+    api = engine.llm_api
+    api.router = ModelRouter(default_model=FAST, routes={("Interaction", "Hard"): PRIMARY},
+                             tiers={PRIMARY: FAST} if adaptive else {}, latency_budgets={"Interaction": budget})
+    api.model = FakeModel(latency=phases["fast"], seed=1)
+    primary = api._routed_models[PRIMARY] = FakeModel(latency=phases["healthy"], seed=2)
+    results = []
+    for phase in ("healthy", "degraded", "recovered"):
+        primary.latency = LatencyProfile(phases["degraded" if phase == "degraded" else "healthy"])
+        tracker, remaining = LatencyTracker(window=None), calls_per_phase
+        before = dict(api.router.stats()["decisions"].get("Interaction", {}))
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                with tracker.time():
+                    await api.generate_content_async("Interaction", context)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        after = api.router.stats()["decisions"].get("Interaction", {})
+        routed = {model: sum(reasons.values()) - sum(before.get(model, {}).values()) for model, reasons in after.items()}
+        results.append((phase, tracker.summary(), routed))
+    return results, api.router.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Model routing / adaptive tiering benchmark")
+    parser.add_argument("--calls-per-phase", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--budget", type=float, default=0.5, help="Interaction p90 latency budget, seconds")
+    parser.add_argument("--healthy", default="lognormal:0.3,0.3", help="Primary model latency when healthy")
+    parser.add_argument("--degraded", default="lognormal:1.2,0.3", help="Primary model latency while degraded")
+    parser.add_argument("--fast", default="lognormal:0.1,0.3", help="Faster tier latency")
+    args = parser.parse_args()
+    phases = {"healthy": args.healthy, "degraded": args.degraded, "fast": args.fast}
+
+    print(f"{args.calls_per_phase} Interaction calls per phase, {args.concurrency} at a time, budget p90 <= {args.budget}s")
+    for adaptive in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, stats = asyncio.run(_run(adaptive, args.calls_per_phase, args.concurrency, args.budget, phases))
+        print(f"  {'adaptive tiering' if adaptive else 'static routing'}")
+        for phase, latency, routed in results:
+            print(f"    {phase:<10} {json.dumps(latency)}  routed={json.dumps(routed)}")
+        if adaptive:
+            print(f"    decisions {json.dumps(stats['decisions'])}")
+
+if __name__ == "__main__":
+    main_cli()
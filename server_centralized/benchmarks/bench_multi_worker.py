@@ -0,0 +1,128 @@
+# benchmarks/bench_multi_worker.py
+# Multi-process load test for the shared session backend. Each worker process runs its
+# own copy of the app against one SQLite/WAL file and sends /interact calls for games
+# picked at random, so consecutive turns of a game land on different workers the way
+# they would behind a load balancer without sticky sessions. Also checks that both
+# backends reject a write based on a stale version.
+#
+# Usage: python benchmarks/bench_multi_worker.py --workers 1,2,4 --games 400 --duration 5
+
+import io
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+
+import _fakes
+from game_logic.shared_state import (
+    SharedSessionStore, SQLiteSessionBackend, KeyValueSessionBackend, VersionConflict,
+)
+
+async def _seed(path: str, games: int):
+    engine = _fakes.make_fake_engine(latency=0.0)
+    store = SharedSessionStore(SQLiteSessionBackend(path))
+    for i in range(games):
+        store[f"game-{i}"] = await engine.start_new_game(f"game-{i}", 3, "Easy")
+
+def _worker(path: str, games: int, concurrency: int, latency: float, start_at: float, duration: float, results):
+    import httpx
+    import main
+
+    async def run():
+        main.game_engine = _fakes.make_fake_engine(latency=latency, max_concurrency=concurrency)
+        main.active_games = SharedSessionStore(SQLiteSessionBackend(path))
+        rng = random.Random(os.getpid())
+        counts = {"ok": 0, "conflict": 0, "error": 0}
+        latencies = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            await asyncio.sleep(max(0.0, start_at - time.time()))
+            deadline = time.time() + duration
+
+            async def loop():
+                while time.time() < deadline:
+                    payload = {"villager_id": f"villager_{rng.randrange(8)}", "player_prompt": "Have you seen my friends?"}
+                    started = time.perf_counter()
+                    response = await client.post(f"/game/game-{rng.randrange(games)}/interact", json=payload)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code == 200:
+                        counts["ok"] += 1
+                    elif response.status_code == 409:
+                        counts["conflict"] += 1
+                    else:
+                        counts["error"] += 1
+
+            await asyncio.gather(*(loop() for _ in range(concurrency)))
+        latencies.sort()
+        counts["p95_ms"] = latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None
+        counts["stale_reloads"] = main.active_games.stale_reloads
+        return counts
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.put(asyncio.run(run()))
+
+def _run_workers(path: str, workers: int, games: int, concurrency: int, latency: float, duration: float):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Workers import the app before the shared start time, so startup isn't measured.
+    start_at = time.time() + 3.0
+    processes = [context.Process(target=_worker, args=(path, games, concurrency, latency, start_at, duration, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return totals
+
+def _check_conflicts(backend):
+    """Two workers load the same session; the second save must be rejected."""
+    worker_a, worker_b = SharedSessionStore(backend), SharedSessionStore(backend)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = _fakes.make_fake_engine(latency=0.0)
+        worker_a["conflict-check"] = asyncio.run(engine.start_new_game("conflict-check", 3, "Easy"))
+
+    async def both():
+        async with worker_a.checkout("conflict-check") as state_a, worker_b.checkout("conflict-check") as state_b:
+            state_a.player_state.knowledge_summary = "from worker a"
+            state_b.player_state.knowledge_summary = "from worker b"
+
+    try:
+        asyncio.run(both())
+    except VersionConflict as conflict:
+        return f"rejected stale write ({conflict})"
+    return "NOT DETECTED"
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Multi-worker shared session benchmark")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--games", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight requests per worker")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated LLM latency in seconds")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"conflict check, sqlite: {_check_conflicts(SQLiteSessionBackend(':memory:'))}")
+    print(f"conflict check, key-value (FakeRedis): {_check_conflicts(KeyValueSessionBackend(_fakes.FakeRedis()))}")
+    print(f"{args.games} games, {args.concurrency} in flight per worker, LLM latency {args.latency * 1000:.0f}ms, "
+          f"{args.duration:.0f}s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'req/s':>9} {'scaling':>8} {'p95 ms':>8} {'409s':>6} {'errors':>7} {'cross-worker reloads':>21}")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "shared.sqlite3")
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(_seed(path, args.games))
+            totals = _run_workers(path, workers, args.games, args.concurrency, args.latency, args.duration)
+        throughput = sum(t["ok"] for t in totals) / args.duration
+        baseline = baseline or throughput / workers
+        p95 = max(t["p95_ms"] or 0 for t in totals)
+        print(f"{workers:>8} {throughput:>9.1f} {throughput / (baseline * workers):>7.0%} {p95:>8.1f} "
+              f"{sum(t['conflict'] for t in totals):>6} {sum(t['error'] for t in totals):>7} "
+              f"{sum(t['stale_reloads'] for t in totals):>21}")
+
+if __name__ == "__main__":
+    main_cli()
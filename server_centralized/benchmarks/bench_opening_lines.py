@@ -0,0 +1,57 @@
+# benchmarks/bench_opening_lines.py
+# Starts games and opens a conversation with every villager, comparing first-turn latency
+# and LLM calls with and without the batched opening lines.
+#
+# Usage: python benchmarks/bench_opening_lines.py --games 20 --latency 0.5
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+
+OPENING_PROMPT = "This is the starting prompt of the conversation."
+
+async def _run(use_openings: bool, games: int, latency: float):
+    engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=games * 8)
+    states = [await engine.start_new_game(f"game-{i}", 3, "Easy") for i in range(games)]
+    for game_state in states:
+        if not use_openings:
+            game_state.opening_lines = None
+        # Closing lines would otherwise answer some first turns; keep this about openings.
+        game_state.response_bank = None
+    model = engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency)
+    first_turn = LatencyTracker()
+
+    async def open_conversation(game_state, npc_name):
+        start = time.perf_counter()
+        await engine.process_interaction_turn(game_state, npc_name, OPENING_PROMPT, {"friends": 0})
+        first_turn.record(time.perf_counter() - start)
+
+    await asyncio.gather(*(open_conversation(g, v.name) for g in states for v in g.villagers))
+    familiarity = sum(sum(g.player_state.familiarity) for g in states)
+    memory = sum(len(log) for g in states for log in g.full_npc_memory)
+    return first_turn.summary(), model.calls, familiarity, memory, engine.opening_line_stats.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Opening lines benchmark")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated LLM latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.games} games, first conversation with each villager, simulated LLM latency {args.latency:.2f}s")
+    for use_openings in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            first_turn, calls, familiarity, memory, stats = asyncio.run(_run(use_openings, args.games, args.latency))
+        label = "with openings" if use_openings else "without"
+        print(f"  {label:<14} first turn {json.dumps(first_turn)}")
+        print(f"  {'':<14} interaction LLM calls={calls}  memory entries={memory}  familiarity total={familiarity}")
+        if use_openings:
+            print(f"  {json.dumps(stats)}")
+
+if __name__ == "__main__":
+    main_cli()
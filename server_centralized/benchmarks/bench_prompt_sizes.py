@@ -0,0 +1,53 @@
+# benchmarks/bench_prompt_sizes.py
+# Reports bytes/tokens per prompt type from the PromptBuilder, how much of each prompt
+# is a cacheable prefix, the build time per call, and the saving from compact JSON on
+# the largest embedded payloads.
+#
+# Usage: python benchmarks/bench_prompt_sizes.py --turns 30
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from config import VILLAGER_ROSTER
+from game_logic.prompt_builder import compact_json
+from game_logic.stats import estimate_tokens
+
+async def _run(turns: int):
+    engine = _fakes.make_fake_engine(latency=0.0, num_nodes=38)
+    game_state = await engine.start_new_game("bench", 5, "Hard")
+    for turn in range(turns):
+        await engine.process_interaction_turn(game_state, VILLAGER_ROSTER[turn % 8]["name"], "What did you see that night?", {"friends": 0})
+
+    builder = engine.llm_api.prompt_builder
+    context = engine._build_interaction_context(game_state, "Sam", "And then?", {"friends": 0})
+    start = time.perf_counter()
+    for _ in range(1000):
+        builder.build("Interaction", context)
+    build_us = (time.perf_counter() - start) * 1000
+    return builder.stats(), build_us, game_state.memory_of("Sam").as_messages()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Prompt size benchmark")
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats, build_us, history = asyncio.run(_run(args.turns))
+    print(f"{'prompt type':<16} {'prompts':>8} {'mean bytes':>11} {'mean tokens':>12} {'cacheable prefix':>17}")
+    for prompt_type, row in stats.items():
+        if isinstance(row, dict):
+            print(f"{prompt_type:<16} {row['prompts']:>8} {row['mean_bytes']:>11} {row['mean_tokens']:>12} {row['cacheable_prefix_share']:>17.1%}")
+    print(f"Interaction build time: {build_us:.1f}us per prompt (persona prefix cached)")
+
+    for label, payload in (("villager roster", VILLAGER_ROSTER), ("chat history", history)):
+        pretty, compact = json.dumps(payload, indent=2), compact_json(payload)
+        print(f"{label:<16} indent=2: {len(pretty):>6} bytes / {estimate_tokens(pretty):>5} tokens   "
+              f"compact: {len(compact):>6} bytes / {estimate_tokens(compact):>5} tokens")
+
+if __name__ == "__main__":
+    main_cli()
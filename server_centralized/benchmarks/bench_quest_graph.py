@@ -0,0 +1,103 @@
+# benchmarks/bench_quest_graph.py
+# Microbenchmark: clue-status lookup and reveal on synthetic quest networks, comparing
+# the original linear scan against QuestGraph. Also checks both give the same answers,
+# knowledge summaries included.
+#
+# Usage: python benchmarks/bench_quest_graph.py --sizes 40 1000 10000 --linear-max 1000
+
+import time
+import random
+import argparse
+
+import _fakes  # noqa: F401  (sets up sys.path)
+from game_logic.quest_graph import QuestGraph
+
+VILLAGERS = [f"Villager {i}" for i in range(8)]
+
+def synthetic_network(num_nodes: int, seed: int = 7):
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(num_nodes):
+        preconditions = [f"node{rng.randrange(i)}" for _ in range(rng.choice((0, 0, 1, 2)))] if i else []
+        nodes.append({
+            "node_id": f"node{i}",
+            "villager_name": rng.choice(VILLAGERS),
+            "content": f"Clue number {i}.",
+            "priority": rng.randint(1, 5),
+            "key_clue": rng.random() < 0.05,
+            "preconditions": preconditions,
+            "required_familiarity": rng.choice((None, None, 1, 2, 3)),
+        })
+    return {"nodes": nodes}
+
+def linear_clue_status(quest_network, discovered_nodes, familiarity, npc_name):
+    """The pre-QuestGraph implementation from GameEngine.get_villager_clue_status."""
+    undiscovered_nodes = [
+        node for node in quest_network.get("nodes", [])
+        if node["villager_name"] == npc_name and node["node_id"] not in discovered_nodes
+    ]
+    if not undiscovered_nodes:
+        return "PERMANENTLY_EXHAUSTED", None
+    sorted_nodes = sorted(undiscovered_nodes, key=lambda x: x.get('priority', 0), reverse=True)
+    for node in sorted_nodes:
+        preconditions_met = all(p in discovered_nodes for p in node.get("preconditions", []))
+        required_familiarity = node.get("required_familiarity")
+        if preconditions_met and (required_familiarity is None or familiarity >= required_familiarity):
+            return "CAN_REVEAL", node
+    return "HAS_LOCKED_CLUES", sorted_nodes[0]
+
+def linear_reveal(quest_network, discovered_nodes, node_id):
+    discovered_nodes.append(node_id)
+    contents = [node['content'] for node in quest_network.get('nodes', []) if node['node_id'] in discovered_nodes]
+    return "Key points discovered so far: " + "; ".join(contents)
+
+def play(quest_network, turns, use_graph, seed=11):
+    """Talks to random villagers, revealing whatever they can reveal. Returns (seconds, trace)."""
+    rng = random.Random(seed)
+    familiarity = {v: 0 for v in VILLAGERS}
+    discovered_nodes = []
+    graph = QuestGraph(quest_network) if use_graph else None
+    trace = []
+    start = time.perf_counter()
+    for _ in range(turns):
+        villager = rng.choice(VILLAGERS)
+        if use_graph:
+            status, node = graph.clue_status(villager, familiarity[villager])
+        else:
+            status, node = linear_clue_status(quest_network, discovered_nodes, familiarity[villager], villager)
+        trace.append((status, node and node["node_id"]))
+        if status == "CAN_REVEAL":
+            if use_graph:
+                graph.reveal(node["node_id"])
+                summary = graph.knowledge_summary()
+            else:
+                summary = linear_reveal(quest_network, discovered_nodes, node["node_id"])
+            trace.append(summary)
+        familiarity[villager] = min(5, familiarity[villager] + 1)
+    return time.perf_counter() - start, trace
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="QuestGraph microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 1000, 10000])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--linear-max", type=int, default=1000,
+                        help="Largest network to also run the linear scan on (it is quadratic in reveals)")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>7} {'build ms':>9} {'linear us/turn':>15} {'graph us/turn':>14} {'speedup':>8}")
+    for size in args.sizes:
+        network = synthetic_network(size)
+        start = time.perf_counter()
+        QuestGraph(network)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        graph_s, graph_trace = play(network, args.turns, use_graph=True)
+        if size > args.linear_max:
+            print(f"{size:>7} {build_ms:>9.2f} {'-':>15} {graph_s / args.turns * 1e6:>14.1f} {'-':>8}")
+            continue
+        linear_s, linear_trace = play(network, args.turns, use_graph=False)
+        assert linear_trace == graph_trace, "QuestGraph disagrees with the linear scan"
+        print(f"{size:>7} {build_ms:>9.2f} {linear_s / args.turns * 1e6:>15.1f} {graph_s / args.turns * 1e6:>14.1f} {linear_s / graph_s:>7.0f}x")
+
+if __name__ == "__main__":
+    main_cli()
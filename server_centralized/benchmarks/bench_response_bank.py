@@ -0,0 +1,63 @@
+# benchmarks/bench_response_bank.py
+# Players who keep talking to villagers with nothing left to say: compares per-turn
+# latency and LLM calls for those closing turns with and without the response bank.
+#
+# Usage: python benchmarks/bench_response_bank.py --games 20 --turns 40 --latency 0.3
+
+import io
+import json
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from game_logic.response_bank import BANK_KINDS
+
+async def _run(use_bank: bool, games: int, turns: int, latency: float):
+    engine = _fakes.make_fake_engine(latency=0.0, num_nodes=8, max_concurrency=games)
+    states = [await engine.start_new_game(f"game-{i}", 3, "Easy") for i in range(games)]
+    if not use_bank:
+        for game_state in states:
+            game_state.response_bank = None
+    model = engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency, num_nodes=8)
+    names = [v.name for v in states[0].villagers]
+    closing, other = LatencyTracker(), LatencyTracker()
+    rng = random.Random(5)
+
+    async def player(game_state):
+        for _ in range(turns):
+            npc_name = rng.choice(names)
+            status, node = engine.get_villager_clue_status(game_state, npc_name)
+            start = time.perf_counter()
+            dialogue = await engine.process_interaction_turn(game_state, npc_name, "Anything else?", {"friends": 0})
+            (closing if status in BANK_KINDS else other).record(time.perf_counter() - start)
+            if status == "CAN_REVEAL" and dialogue.get("node_revealed_id") is None:
+                # The fake model never reveals; do it here so villagers run out of clues.
+                engine._apply_dialogue_turn(game_state, npc_name, "", {"node_revealed_id": node["node_id"]})
+
+    await asyncio.gather(*(player(g) for g in states))
+    return closing.summary(), other.summary(), model.calls, engine.response_bank_stats.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Response bank benchmark")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated LLM latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.games} games x {args.turns} turns, simulated LLM latency {args.latency:.2f}s")
+    for use_bank in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            closing, other, calls, stats = asyncio.run(_run(use_bank, args.games, args.turns, args.latency))
+        label = "with bank" if use_bank else "without bank"
+        print(f"  {label:<13} closing turns {json.dumps(closing)}")
+        print(f"  {'':<13} other turns   {json.dumps(other)}")
+        print(f"  {'':<13} interaction LLM calls={calls}")
+        if use_bank:
+            print(f"  {json.dumps(stats)}")
+
+if __name__ == "__main__":
+    main_cli()
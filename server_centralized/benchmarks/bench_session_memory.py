@@ -0,0 +1,126 @@
+# benchmarks/bench_session_memory.py
+# Reports bytes per session after 0/50/500 turns for the compact GameState versus the
+# previous dict-based layout (name-keyed dicts, {"role", "content"} message dicts, and a
+# roster that was copied into every pickled session).
+#
+# Usage: python benchmarks/bench_session_memory.py --turns 0,50,500
+
+import sys
+import argparse
+from types import MappingProxyType
+
+import _fakes
+from config import VILLAGER_ROSTER
+from game_logic.roster import DEFAULT_ROSTER
+from game_logic.state_manager import GameState, Role, INITIAL_KNOWLEDGE_SUMMARY
+from game_logic.session_store import dump_session
+
+class LegacyGameState:
+    """The pre-compaction layout, kept here only for comparison."""
+
+    def __init__(self, game_id: str, difficulty: str):
+        self.game_id = game_id
+        self.difficulty = difficulty
+        self.correct_location = ""
+        self.story_theme = ""
+        self.inaccessible_locations = []
+        self.quest_network = {"nodes": []}
+        self.quest_graph = None
+        self.villagers = VILLAGER_ROSTER
+        self.player_state = {
+            "discovered_nodes": [],
+            "knowledge_summary": INITIAL_KNOWLEDGE_SUMMARY,
+            "familiarity": {v["name"]: 0 for v in VILLAGER_ROSTER},
+            "unproductive_turns": {v["name"]: 0 for v in VILLAGER_ROSTER},
+        }
+        self.full_npc_memory = {v["name"]: [] for v in VILLAGER_ROSTER}
+        self.conversation_summaries = {}
+
+def _turn_text(turn: int):
+    return (f"What did you see near the mill on night {turn}?",
+            f"On night {turn} the mill wheel stopped, and someone left lantern oil by the door.")
+
+def build_legacy(game_id: str, turns: int):
+    game_state = LegacyGameState(game_id, "Medium")
+    names = [v["name"] for v in VILLAGER_ROSTER]
+    for turn in range(turns):
+        name = names[turn % len(names)]
+        player_line, npc_line = _turn_text(turn)
+        game_state.full_npc_memory[name].append({"role": "player", "content": player_line})
+        game_state.full_npc_memory[name].append({"role": "npc", "content": npc_line})
+        game_state.player_state["familiarity"][name] = min(5, turn // len(names))
+        game_state.player_state["unproductive_turns"][name] += 1
+    return game_state
+
+def build_compact(game_id: str, turns: int):
+    game_state = GameState(game_id, "Medium")
+    names = [v.name for v in DEFAULT_ROSTER]
+    for turn in range(turns):
+        name = names[turn % len(names)]
+        player_line, npc_line = _turn_text(turn)
+        memory = game_state.memory_of(name)
+        memory.append(Role.PLAYER, player_line)
+        memory.append(Role.NPC, npc_line)
+        game_state.set_familiarity(name, turn // len(names))
+        game_state.player_state.unproductive_turns[game_state.villager_index(name)] += 1
+    return game_state
+
+def _shared_ids():
+    """Objects every session references but none owns: the roster and small ints/strings."""
+    shared = set()
+    stack = [DEFAULT_ROSTER, VILLAGER_ROSTER, INITIAL_KNOWLEDGE_SUMMARY, "Medium", "player", "npc", None]
+    stack.extend(Role)
+    stack.extend(range(-5, 257))
+    while stack:
+        obj = stack.pop()
+        if id(obj) in shared:
+            continue
+        shared.add(id(obj))
+        if isinstance(obj, (dict, MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, "__slots__"):
+            stack.extend(getattr(obj, slot) for slot in obj.__slots__ if hasattr(obj, slot))
+    return shared
+
+def deep_size(obj, shared: set) -> int:
+    seen = set(shared)
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        if hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                stack.append(getattr(obj, slot))
+    return total
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Per-session memory benchmark")
+    parser.add_argument("--turns", default="0,50,500", help="Comma-separated turn counts")
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions averaged per measurement")
+    args = parser.parse_args()
+
+    shared = _shared_ids()
+    print(f"{'turns':>6} {'layout':>8} {'heap B/session':>15} {'archived B/session':>19}")
+    for turns in [int(t) for t in args.turns.split(",")]:
+        for layout, build in (("legacy", build_legacy), ("compact", build_compact)):
+            sessions = [build(f"game-{i}", turns) for i in range(args.sessions)]
+            heap = sum(deep_size(s, shared) for s in sessions) / len(sessions)
+            archived = sum(len(dump_session(s)) for s in sessions) / len(sessions)
+            print(f"{turns:>6} {layout:>8} {heap:>15,.0f} {archived:>19,.0f}")
+
+if __name__ == "__main__":
+    main_cli()
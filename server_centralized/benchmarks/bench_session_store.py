@@ -0,0 +1,62 @@
+# benchmarks/bench_session_store.py
+# Creates many sessions with some conversation history, keeps only a bounded number
+# resident, and reports resident memory, archive size and hibernate/rehydrate latency.
+#
+# Usage: python benchmarks/bench_session_store.py --sessions 2000 --turns 20 --max-resident 200
+
+import io
+import os
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+import _fakes
+from game_logic.session_store import SessionStore, SQLiteSessionArchive
+from game_logic.state_manager import Role
+
+async def _run(sessions: int, turns: int, max_resident: int, archive_path: str):
+    engine = _fakes.make_fake_engine(latency=0.0, num_nodes=25)
+    store = SessionStore(max_resident=max_resident, idle_ttl=3600, archive=SQLiteSessionArchive(archive_path))
+    tracemalloc.start()
+    for i in range(sessions):
+        game_state = await engine.start_new_game(f"game-{i}", 5, "Medium")
+        for turn in range(turns):
+            game_state.memory_of("Sam").append(Role.PLAYER, f"Question {turn} about the mill?")
+            game_state.memory_of("Sam").append(Role.NPC, "The mill's been quiet since the harvest moon. Ask Elias.")
+        store[game_state.game_id] = game_state
+    resident_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    rng = random.Random(3)
+    for _ in range(500):
+        async with store.checkout(f"game-{rng.randrange(sessions)}") as game_state:
+            engine.get_villager_clue_status(game_state, "Sam")
+    store.flush()
+    len(store)  # Refreshes the archive count stats() reports
+    return resident_bytes, store.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Session store benchmark")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-resident", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, "sessions.sqlite3")
+        with contextlib.redirect_stdout(io.StringIO()):
+            resident_bytes, stats = asyncio.run(_run(args.sessions, args.turns, args.max_resident, archive_path))
+        archive_bytes = os.path.getsize(archive_path) + sum(
+            os.path.getsize(archive_path + suffix) for suffix in ("-wal",) if os.path.exists(archive_path + suffix))
+
+    print(f"{args.sessions} sessions x {args.turns} turns, max_resident={args.max_resident}")
+    print(f"  traced Python heap after load: {resident_bytes / 1e6:.1f} MB")
+    print(f"  archive on disk: {archive_bytes / 1e6:.1f} MB ({archive_bytes / max(1, stats['hibernated']) / 1024:.1f} KB per hibernated session)")
+    print(f"  {json.dumps(stats, indent=2)}")
+
+if __name__ == "__main__":
+    main_cli()
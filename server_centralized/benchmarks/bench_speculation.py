@@ -0,0 +1,74 @@
+# benchmarks/bench_speculation.py
+# Simulated players who usually click one of the suggested responses after a short think
+# time. Compares perceived turn latency and LLM spend with speculative prefetch on and off,
+# with plenty of LLM slots and with one slot per game, where speculation must not slow real turns.
+#
+# Usage: python benchmarks/bench_speculation.py --games 30 --turns 10 --click-rate 0.7
+
+import io
+import json
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from game_logic.speculation import Speculator
+
+async def _run(speculate: bool, games: int, turns: int, latency: float, think_time: float, click_rate: float, budget: int,
+               max_concurrency: int = None):
+    engine = _fakes.make_fake_engine(latency=0.0, max_concurrency=max_concurrency or games * 4)
+    states = [await engine.start_new_game(f"game-{i}", 3, "Easy") for i in range(games)]
+    model = engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency)
+    engine.speculator = Speculator(engine.llm_api, enabled=speculate, budget_per_game=budget)
+    turn_latency = LatencyTracker()
+    rng = random.Random(7)
+
+    async def player(game_state):
+        npc_name = "Sam"  # Always has a clue to reveal with the fake network, so no bank turns.
+        suggestions = []
+        for turn in range(turns):
+            if suggestions and rng.random() < click_rate:
+                player_input = rng.choice(suggestions)
+            else:
+                player_input = f"Free-form question {turn} about the mist?"
+            start = time.perf_counter()
+            dialogue = await engine.process_interaction_turn(game_state, npc_name, player_input, {"friends": 0})
+            turn_latency.record(time.perf_counter() - start)
+            suggestions = dialogue.get("player_responses") or []
+            await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+
+    await asyncio.gather(*(player(g) for g in states))
+    for game_state in states:
+        engine.speculator.discard(game_state.game_id)
+    return turn_latency.summary(), model.calls, engine.speculator.stats()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Speculative prefetch benchmark")
+    parser.add_argument("--games", type=int, default=30)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.4, help="Simulated LLM latency in seconds")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean player think time in seconds")
+    parser.add_argument("--click-rate", type=float, default=0.7, help="Share of turns that pick a suggestion")
+    parser.add_argument("--budget", type=int, default=30, help="Speculative calls per game")
+    parser.add_argument("--tight-concurrency", type=int, default=None,
+                        help="LLM concurrency limit for the saturated run (default: one slot per game)")
+    args = parser.parse_args()
+
+    print(f"{args.games} games x {args.turns} turns, LLM latency {args.latency:.2f}s, "
+          f"think time ~{args.think_time:.1f}s, click rate {args.click_rate:.0%}")
+    tight = args.tight_concurrency or args.games
+    runs = [(False, None, "baseline"), (True, None, "speculative"),
+            (False, tight, f"baseline, {tight} LLM slots"), (True, tight, f"speculative, {tight} LLM slots")]
+    for speculate, max_concurrency, label in runs:
+        with contextlib.redirect_stdout(io.StringIO()):
+            latency, calls, stats = asyncio.run(_run(speculate, args.games, args.turns, args.latency,
+                                                     args.think_time, args.click_rate, args.budget, max_concurrency))
+        print(f"  {label:<28} turn latency {json.dumps(latency)}  LLM calls={calls}")
+        if speculate:
+            print(f"  {json.dumps(stats)}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,60 @@
+# benchmarks/bench_stream_ttft.py
+# Compares time-to-first-dialogue-text for /interact/stream against the time the
+# buffered /interact takes to return anything at all (fake LLM, in-process app).
+#
+# Usage: python benchmarks/bench_stream_ttft.py --turns 20 --latency 1.0
+
+import io
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+import httpx
+import main
+from game_logic.stats import LatencyTracker
+
+async def _run(turns: int, latency: float):
+    main.game_engine = _fakes.make_fake_engine(latency=0.0)
+    main.active_games = _fakes.make_session_store()
+    buffered, first_text, stream_done = LatencyTracker(), LatencyTracker(), LatencyTracker()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+        game_id = (await client.post("/game/new", json={"difficulty": "Easy", "num_inaccessible_locations": 3})).json()["game_id"]
+        main.game_engine.llm_api.model = _fakes.FakeGeminiModel(latency=latency)
+        payload = {"villager_id": "villager_1", "player_prompt": "What happened here?"}
+
+        for _ in range(turns):
+            with buffered.time():
+                (await client.post(f"/game/{game_id}/interact", json=payload)).raise_for_status()
+
+            # httpx's ASGI transport buffers whole bodies, so drive the endpoint's
+            # body iterator directly to observe when each SSE event is produced.
+            start = time.perf_counter()
+            seen_text = False
+            response = await main.interact_stream(game_id, main.InteractRequest(**payload), idempotency_key=None)
+            async for event in response.body_iterator:
+                if event.startswith("event: dialogue") and not seen_text:
+                    first_text.record(time.perf_counter() - start)
+                    seen_text = True
+            stream_done.record(time.perf_counter() - start)
+        memory_turns = len(main.active_games[game_id].memory_of("Sam"))
+    return buffered.summary(), first_text.summary(), stream_done.summary(), memory_turns
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Streaming TTFT benchmark")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated full-response LLM latency in seconds")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        buffered, first_text, stream_done, memory_turns = asyncio.run(_run(args.turns, args.latency))
+    print(f"{args.turns} turns per path, simulated LLM latency {args.latency}s")
+    print(f"  /interact           first byte  {json.dumps(buffered)}")
+    print(f"  /interact/stream    first text  {json.dumps(first_text)}")
+    print(f"  /interact/stream    complete    {json.dumps(stream_done)}")
+    print(f"  memory entries after run: {memory_turns} (expected {4 * args.turns})")
+
+if __name__ == "__main__":
+    main_cli()
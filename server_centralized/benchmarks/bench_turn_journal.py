@@ -0,0 +1,142 @@
+# benchmarks/bench_turn_journal.py
+# Crash safety for live sessions: creates N in-memory games with the turn journal on,
+# plays turns against them from concurrent players (each turn waits for its group commit,
+# as a request does), then "crashes" without hibernating anything and rebuilds every session
+# from the journal, checking each one matches what was in memory. Some games also have a
+# stale archived copy (a row a crash or failed delete left behind), which must not win.
+#
+# Usage: python benchmarks/bench_turn_journal.py --sessions 10000 --turns 20000 --concurrency 64
+
+import io
+import os
+import time
+import pickle
+import random
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+import _fakes
+from game_logic.stats import LatencyTracker
+from game_logic.session_store import SessionStore, SQLiteSessionArchive, dump_session
+from game_logic.turn_journal import TurnJournal
+
+def _fingerprint(game_state):
+    bank = game_state.response_bank
+    return (
+        game_state.state_version,
+        tuple(game_state.player_state.discovered_nodes),
+        game_state.player_state.knowledge_summary,
+        bytes(game_state.player_state.familiarity),
+        tuple(tuple(memory.contents) for memory in game_state.full_npc_memory),
+        tuple(game_state.opening_lines or ()),
+        tuple(sorted(bank.used.items())) if bank is not None else None,
+    )
+
+async def _play(engine, store, game_ids, turns: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    latency = LatencyTracker(window=None)
+    remaining = turns
+
+    async def player():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            game_state = store.get(rng.choice(game_ids))
+            villager = rng.choice(game_state.villagers.villagers).name
+            nodes = [n["node_id"] for n in game_state.quest_network["nodes"] if n["villager_name"] == villager]
+            dialogue = {
+                "npc_dialogue": f"Turn {game_state.state_version + 1}: the mist is thick tonight.",
+                "player_responses": ["Go on.", "Goodbye."],
+                "node_revealed_id": rng.choice(nodes) if nodes and rng.random() < 0.2 else None,
+                "new_familiarity_level": game_state.familiarity_of(villager) + 1,
+            }
+            start = time.perf_counter()
+            engine._apply_dialogue_turn(game_state, villager, "Tell me what you saw.", dialogue)
+            await engine.commit()
+            latency.record(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player() for _ in range(concurrency)))
+    return turns / (time.perf_counter() - start), latency.summary()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Turn journal throughput and recovery benchmark")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--snapshot-every", type=int, default=50)
+    parser.add_argument("--no-fsync", action="store_true", help="Write without fsync (page cache only)")
+    parser.add_argument("--stale-archived", type=int, default=100, help="Games with a stale archived copy at recovery")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = _fakes.make_fake_engine(latency=0.0)
+        template = pickle.dumps(asyncio.run(engine.start_new_game("template", 3, "Medium")))
+    game_ids = [f"game-{i:05d}" for i in range(args.sessions)]
+
+    print(f"{args.sessions} live sessions, {args.turns} turns from {args.concurrency} concurrent players, "
+          f"fsync {'off' if args.no_fsync else 'on'}")
+
+    # Baseline: the same turns with no journal.
+    store = SessionStore(max_resident=args.sessions, archive=SQLiteSessionArchive(":memory:"))
+    for game_id in game_ids:
+        game_state = pickle.loads(template)
+        game_state.game_id = game_id
+        store[game_id] = game_state
+    engine.journal = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        rate, latency = asyncio.run(_play(engine, store, game_ids, args.turns, args.concurrency, seed=1))
+    print(f"  no journal        {rate:9.0f} turns/s  turn p50 {latency['p50_ms']}ms p99 {latency['p99_ms']}ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = TurnJournal(directory, snapshot_every=args.snapshot_every, fsync=not args.no_fsync)
+        store = SessionStore(max_resident=args.sessions, archive=SQLiteSessionArchive(":memory:"), journal=journal)
+        engine.journal = journal
+        start = time.perf_counter()
+        for game_id in game_ids:
+            game_state = pickle.loads(template)
+            game_state.game_id = game_id
+            store[game_id] = game_state
+        journal.flush(timeout=600)
+        created = time.perf_counter() - start
+        print(f"  create + snapshot {args.sessions / created:9.0f} games/s  ({created:.2f}s, "
+              f"{journal.bytes_written / args.sessions / 1024:.1f}KB per snapshot)")
+
+        commits_before, bytes_before = journal.commits, journal.bytes_written
+        with contextlib.redirect_stdout(io.StringIO()):
+            rate, latency = asyncio.run(_play(engine, store, game_ids, args.turns, args.concurrency, seed=1))
+        commits = journal.commits - commits_before
+        print(f"  journaled turns   {rate:9.0f} turns/s  turn p50 {latency['p50_ms']}ms p99 {latency['p99_ms']}ms  "
+              f"{commits} group commits ({args.turns / max(1, commits):.1f} records each), "
+              f"{(journal.bytes_written - bytes_before) / args.turns:.0f} B/turn, "
+              f"{journal.snapshots - args.sessions} periodic snapshots")
+        stats = journal.stats()
+        print(f"  commit latency    {stats['commit_latency']}")
+        expected = {game_id: _fingerprint(store.get(game_id)) for game_id in game_ids}
+
+        # Crash: nothing is hibernated or closed; the writer thread is simply abandoned.
+        segments = sorted(os.listdir(directory))
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in segments)
+        archive = SQLiteSessionArchive(":memory:")
+        for game_id in game_ids[:args.stale_archived]:
+            game_state = pickle.loads(template)
+            game_state.game_id = game_id
+            archive.save(game_id, dump_session(game_state))
+        recovered_store = SessionStore(max_resident=args.sessions, archive=archive,
+                                       journal=TurnJournal(directory, snapshot_every=args.snapshot_every,
+                                                           fsync=not args.no_fsync))
+        start = time.perf_counter()
+        recovered = recovered_store.recover()
+        elapsed = time.perf_counter() - start
+        mismatched = sum(1 for game_id in game_ids if _fingerprint(recovered_store.get(game_id)) != expected[game_id])
+        print(f"  recovery          {recovered} sessions from {len(segments)} segment(s), {size / 1e6:.0f}MB "
+              f"in {elapsed:.2f}s ({recovered / elapsed:.0f} sessions/s), mismatched: {mismatched}")
+        recovered_store.flush()
+        print(f"  stale archived    {min(args.stale_archived, args.sessions)} seeded, "
+              f"{archive.count()} left after recovery")
+        recovered_store.journal.close()
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,64 @@
+# benchmarks/bench_world_pool.py
+# Measures /game/new latency with and without the pre-generated world pool, under a
+# steady arrival of new players (fake LLM, in-process app), plus one request for a key
+# that is not prewarmed, which must not be pooled.
+#
+# Usage: python benchmarks/bench_world_pool.py --games 20 --latency 1.0 --interval 0.5
+
+import io
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+
+import _fakes
+import httpx
+import main
+from game_logic.stats import LatencyTracker
+
+async def _run(pool_size: int, num_games: int, latency: float, interval: float):
+    main.game_engine = _fakes.make_fake_engine(latency=latency, world_pool_size=pool_size)
+    main.active_games = _fakes.make_session_store()
+    if pool_size:
+        main.game_engine.world_pool.warm([("Hard", 5)])
+        # Give the initial fill time to finish, as it would during server startup.
+        await asyncio.sleep(2 * latency * pool_size + 0.1)
+
+    tracker = LatencyTracker()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+        async def new_game():
+            with tracker.time():
+                response = await client.post("/game/new", json={"difficulty": "Hard", "num_inaccessible_locations": 5})
+            response.raise_for_status()
+
+        tasks = []
+        for _ in range(num_games):
+            tasks.append(asyncio.create_task(new_game()))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*tasks)
+        # A key nobody prewarmed: served by generating on the spot, never added to the pool.
+        (await client.post("/game/new", json={"difficulty": "Nightmare", "num_inaccessible_locations": 42})).raise_for_status()
+        stats = (await client.get("/stats")).json()["world_pool"]
+    await main.game_engine.world_pool.close()
+    return tracker.summary(), stats
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="World pool benchmark")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated latency per LLM call in seconds")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between new players")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.games} x /game/new (Hard), one every {args.interval}s, LLM latency {args.latency}s per call")
+    for pool_size in (0, args.pool_size):
+        with contextlib.redirect_stdout(io.StringIO()):
+            latency, stats = asyncio.run(_run(pool_size, args.games, args.latency, args.interval))
+        print(f"  pool_size={pool_size}: /game/new {json.dumps(latency)}")
+        if pool_size:
+            print(f"    hits={stats['hits']} misses={stats['misses']} unpooled={stats['unpooled']} "
+                  f"ready={json.dumps(stats['ready'])} refill={json.dumps(stats['refill_latency'])}")
+
+if __name__ == "__main__":
+    main_cli()
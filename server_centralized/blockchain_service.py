@@ -1,14 +1,34 @@
 import os
+import time
+import base64
 import logging
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from pysui import SuiConfig, AsyncClient  # CHANGED: Use AsyncClient instead of SyncClient
 from pysui.abstracts import SignerBlock
+from pysui.sui.sui_builders.base_builder import SuiRequestType
+from pysui.sui.sui_builders.exec_builders import ExecuteTransaction
+from pysui.sui.sui_builders.get_builders import GetReferenceGasPrice, GetTx
 from pysui.sui.sui_clients.transaction import SuiTransaction
+from pysui.sui.sui_types.collections import SuiArray
 from pysui.sui.sui_types.address import SuiAddress
 from pysui.sui.sui_types.scalars import ObjectID, SuiU64, SuiBoolean
+from pysui.sui.sui_types import bcs
+from onchain_claims import (
+    ClaimBatcher, ClaimRequest, ClaimSubmissionError, GasCoinPool, ObjectRef, ObjectRefCache,
+    DEFAULT_CLAIM_MAX_IN_FLIGHT, check_execution, claim_move_call, execute_signed, map_created_claims,
+    transaction_digest,
+)
 
 logger = logging.getLogger(__name__)
 
+_RESPONSE_OPTIONS = {"showEffects": True, "showEvents": True, "showObjectChanges": True}
+# Gas budget per admin transaction (MIST) and how long the reference gas price is reused.
+DEFAULT_GAS_BUDGET = int(os.getenv("CLAIM_GAS_BUDGET", "50000000"))
+GAS_PRICE_REFRESH = float(os.getenv("GAS_PRICE_REFRESH", "600"))
+
+def _object_reference(ref: ObjectRef) -> bcs.ObjectReference:
+    return bcs.ObjectReference(bcs.Address.from_str(ref.object_id), ref.version, bcs.Digest.from_str(ref.digest))
+
 class BlockchainService:
     """Handle on-chain transactions for reward claims"""
     
@@ -26,6 +46,11 @@ class BlockchainService:
         
         if not self.admin_address:
             logger.warning("ADMIN_ADDRESS not set - on-chain claiming disabled")
+        # Claim transactions run in parallel, each paying with a gas coin leased from the pool.
+        self.objects = ObjectRefCache()
+        self.gas = GasCoinPool(self._list_gas_coins, self._split_gas_coins, self.objects)
+        self.claims = ClaimBatcher(self._submit_claims, max_in_flight=DEFAULT_CLAIM_MAX_IN_FLIGHT)
+        self._gas_price = None  # (reference gas price, monotonic time read)
     
     async def _get_client(self) -> AsyncClient:
         """Lazy initialization of async client"""
@@ -41,7 +66,8 @@ class BlockchainService:
         reward_amount: int
     ) -> Optional[str]:
         """
-        Create an on-chain RewardClaim object by calling complete_game
+        Create an on-chain RewardClaim object by calling complete_game. Claims are queued
+        and submitted in batches, one programmable transaction per batch.
         
         Returns:
             The object ID of the created RewardClaim, or None if failed
@@ -50,57 +76,110 @@ class BlockchainService:
             logger.error("Cannot create reward claim: Admin address not configured")
             return None
         
-        try:
-            logger.info(f"Creating reward claim for {player_address}, amount: {reward_amount}")
-            
-            # Get async client
-            client = await self._get_client()
-            
-            # Build transaction to call complete_game
-            txn = SuiTransaction(client=client)
-            
-            # Call complete_game Move function
+        logger.info(f"Queueing reward claim for {player_address}, amount: {reward_amount}")
+        claim_id = await self.claims.claim(ClaimRequest(game_session_id, player_address, won, reward_amount))
+        if claim_id:
+            logger.info(f"✓ Created RewardClaim: {claim_id}")
+        return claim_id
+    
+    async def _submit_claims(self, claims: List[ClaimRequest]) -> Dict[str, Optional[str]]:
+        """Executes one transaction with a complete_game call per claim (ClaimBatcher's submit)."""
+        client = await self._get_client()
+        txn = SuiTransaction(client=client)
+        for claim in claims:
+            target, (treasury_id, game_session_id, won, reward_amount) = claim_move_call(
+                self.package_id, self.treasury_id, claim)
             txn.move_call(
-                target=f"{self.package_id}::contract_onechain::complete_game",
+                target=target,
                 arguments=[
-                    ObjectID(self.treasury_id),
+                    ObjectID(treasury_id),
                     ObjectID(game_session_id),  # GameSession object
                     SuiBoolean(won),
                     SuiU64(reward_amount),
                 ]
             )
-            
-            # Execute transaction as admin (requires signing)
-            # NOTE: This requires admin's private key to be configured in pysui
-            result = await client.execute_transaction_block(
-                transaction=txn,
-                signer=self.config.active_address,  # Admin must have signing capability
-                options={
-                    "showEffects": True,
-                    "showEvents": True,
-                }
-            )
-            
-            if result.is_ok():
-                # Extract the created RewardClaim object ID from effects
-                effects = result.effects
-                created_objects = effects.get("created", [])
-                
-                for obj in created_objects:
-                    # Look for RewardClaim object type
-                    obj_type = obj.get("objectType", "")
-                    if "RewardClaim" in obj_type:
-                        claim_id = obj["objectId"]
-                        logger.info(f"✓ Created RewardClaim: {claim_id}")
-                        return claim_id
-                
-                logger.warning("RewardClaim object not found in created objects")
-                logger.debug(f"Created objects: {created_objects}")
-                return None
-            else:
-                logger.error(f"Transaction failed: {result.error}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Failed to create reward claim: {e}", exc_info=True)
-            return None
\ No newline at end of file
+        
+        async with self.gas.lease() as lease:
+            response = await self._execute(txn, lease.ref)
+            lease.settle(response)
+        check_execution(response)
+        return map_created_claims(claims, response)
+    
+    async def _execute(self, txn, gas: ObjectRef) -> Dict[str, Any]:
+        """
+        Signs `txn` once as admin, paying with the given gas coin version, and executes it.
+        A send that ends without a response is resolved by digest, resending the same
+        signed bytes, so a timeout never turns into a second transaction.
+        """
+        client = await self._get_client()
+        # NOTE: This requires admin's private key to be configured in pysui
+        tx_bytes = await self._transaction_bytes(txn, gas)
+        signature = self.config.keypair_for_address(self.config.active_address).new_sign_secure(tx_bytes)
+        digest = transaction_digest(tx_bytes)
+
+        async def send():
+            result = await client.execute(ExecuteTransaction(
+                tx_bytes=tx_bytes, signatures=SuiArray([signature]), options=_RESPONSE_OPTIONS,
+                request_type=SuiRequestType.WAITFORLOCALEXECUTION))
+            if not result.is_ok():
+                raise ClaimSubmissionError(f"Transaction failed: {result.result_string}")
+            return self._response_dict(result.result_data)
+
+        async def lookup(digest: str):
+            result = await client.execute(GetTx(digest=digest, options=_RESPONSE_OPTIONS))
+            return self._response_dict(result.result_data) if result.is_ok() else None
+
+        return await execute_signed(send, lookup, digest)
+
+    async def _transaction_bytes(self, txn, gas: ObjectRef) -> str:
+        """
+        BCS TransactionData for `txn` paying with `gas` exactly as cached from the last
+        transaction's effects. Letting pysui pick the gas coin would re-read its version
+        from the fullnode, which may not have caught up with that transaction yet.
+        """
+        sender = bcs.Address.from_str(self.config.active_address.address)
+        data = bcs.TransactionData("V1", bcs.TransactionDataV1(
+            txn.raw_kind(), sender,
+            bcs.GasData([_object_reference(gas)], sender, await self._reference_gas_price(), DEFAULT_GAS_BUDGET),
+            bcs.TransactionExpiration("None")))
+        return base64.b64encode(data.serialize()).decode()
+
+    async def _reference_gas_price(self) -> int:
+        if self._gas_price is None or time.monotonic() - self._gas_price[1] >= GAS_PRICE_REFRESH:
+            client = await self._get_client()
+            result = await client.execute(GetReferenceGasPrice())
+            if not result.is_ok():
+                raise ClaimSubmissionError(f"Could not read the reference gas price: {result.result_string}")
+            self._gas_price = (int(result.result_data), time.monotonic())
+        return self._gas_price[0]
+
+    @staticmethod
+    def _response_dict(data) -> Dict[str, Any]:
+        return data.to_dict() if hasattr(data, "to_dict") else data
+    
+    async def _list_gas_coins(self):
+        """The admin's gas coins as (ObjectRef, balance), for the gas pool."""
+        client = await self._get_client()
+        result = await client.get_gas(address=SuiAddress(self.admin_address))
+        if not result.is_ok():
+            raise ClaimSubmissionError(f"Could not list admin gas coins: {result.result_string}")
+        return [(ObjectRef(coin.coin_object_id, int(coin.version), coin.digest), int(coin.balance))
+                for coin in result.result_data.data]
+    
+    async def _split_gas_coins(self, reserve: ObjectRef, amounts: List[int], merge: List[ObjectRef]):
+        """Merges spent coins into the reserve and splits fresh pool coins off it, in one transaction."""
+        client = await self._get_client()
+        txn = SuiTransaction(client=client)
+        if merge:
+            # Spent pool coins at their cached versions, like the gas coin itself.
+            txn.merge_coins(merge_to=txn.gas, merge_from=[txn.builder.input_obj_from_objref(_object_reference(ref))
+                                                          for ref in merge])
+        coins = txn.split_coin(coin=txn.gas, amounts=amounts)
+        txn.transfer_objects(transfers=coins, recipient=SuiAddress(self.admin_address))
+        return await self._execute(txn, reserve)
+    
+    async def close(self):
+        await self.claims.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"claims": self.claims.stats(), "gas": self.gas.stats()}
@@ -0,0 +1,421 @@
+# chain_indexer.py
+# Local index of the game contract's on-chain objects. A background task pages through the
+# contract module's events (suix_queryEvents, or a stand-in feed with the same shape) and
+# folds them into player, GameSession and RewardClaim rows in SQLite, committing the event
+# cursor in the same transaction so a restart resumes where it stopped. Every row is also
+# held in memory, so validating a game session or looking up a claim is a dict read, not an RPC.
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+import httpx
+from sqlalchemy import create_engine, event, select, String, Integer, BigInteger, Boolean, DateTime, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from game_logic.stats import LatencyTracker
+from game_logic.metrics import hot_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAIN_INDEXER_ENABLED = os.getenv("CHAIN_INDEXER_ENABLED", "0") == "1"
+DEFAULT_CHAIN_INDEX_DB_URL = os.getenv("CHAIN_INDEX_DB_URL", "sqlite:///chain_index.sqlite3")
+DEFAULT_RPC_URL = os.getenv("ONECHAIN_RPC_URL", "https://rpc-testnet.onelabs.cc:443")
+DEFAULT_PACKAGE_ID = os.getenv("PACKAGE_ID", "0x48826cf627c4695d7ebb281732b208dec8a595121877924aa65a1347cec1cee9")
+DEFAULT_EVENT_MODULE = os.getenv("CHAIN_INDEXER_MODULE", "contract_onechain")
+DEFAULT_POLL_INTERVAL = float(os.getenv("CHAIN_INDEXER_POLL_INTERVAL", "1.0"))
+DEFAULT_PAGE_LIMIT = int(os.getenv("CHAIN_INDEXER_PAGE_LIMIT", "500"))
+# How long wait_for_session waits for the indexer to pick up a session it has not seen yet.
+DEFAULT_MISS_WAIT = float(os.getenv("CHAIN_INDEXER_MISS_WAIT", "2.0"))
+
+class Base(DeclarativeBase):
+    pass
+
+class IndexedPlayer(Base):
+    __tablename__ = "players"
+
+    player: Mapped[str] = mapped_column(String(66), primary_key=True)
+    games_started: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class IndexedGameSession(Base):
+    __tablename__ = "game_sessions"
+    __table_args__ = (Index("ix_game_sessions_player", "player"),)
+
+    game_session_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    player: Mapped[str] = mapped_column(String(66), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # completed
+    score: Mapped[Optional[int]] = mapped_column(BigInteger)
+    won: Mapped[Optional[bool]] = mapped_column(Boolean)
+    reward_amount: Mapped[Optional[int]] = mapped_column(BigInteger)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class IndexedRewardClaim(Base):
+    __tablename__ = "reward_claims"
+    __table_args__ = (Index("ix_reward_claims_player", "player"),)
+
+    game_session_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    claim_id: Mapped[Optional[str]] = mapped_column(String(66))
+    player: Mapped[str] = mapped_column(String(66), nullable=False)
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # created | claimed
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class IndexerCheckpoint(Base):
+    __tablename__ = "indexer_checkpoint"
+
+    source: Mapped[str] = mapped_column(String(200), primary_key=True)
+    tx_digest: Mapped[str] = mapped_column(String(64), nullable=False)
+    event_seq: Mapped[str] = mapped_column(String(20), nullable=False)
+    events_indexed: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+def normalize_address(address: str) -> str:
+    """0x-prefixed, lowercase, zero-padded to 32 bytes, as the chain reports addresses."""
+    hex_part = address[2:] if address.startswith("0x") else address
+    return "0x" + hex_part.lower().rjust(64, "0")
+
+def decode_session_id(value) -> Optional[str]:
+    """Move vector<u8> fields arrive as lists of byte values; sessions are stored as the text."""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        raw = bytes(value)
+        try:
+            return raw.decode()
+        except UnicodeDecodeError:
+            return "0x" + raw.hex()
+    return str(value)
+
+class JsonRpcEventSource:
+    """Pages of the package module's events from a fullnode, oldest first."""
+
+    def __init__(self, rpc_url: str = DEFAULT_RPC_URL, package_id: str = DEFAULT_PACKAGE_ID,
+                 module: str = DEFAULT_EVENT_MODULE, timeout: float = 10.0):
+        self.rpc_url = rpc_url
+        self.filter = {"MoveModule": {"package": package_id, "module": module}}
+        self.name = f"{package_id}::{module}"
+        self._client = httpx.AsyncClient(timeout=timeout)
+        self._request_id = 0
+
+    async def __call__(self, cursor: Optional[Dict[str, str]], limit: int) -> Dict[str, Any]:
+        return await self._rpc("suix_queryEvents", [self.filter, cursor, limit, False])
+
+    async def transaction(self, digest: str) -> Optional[Dict[str, Any]]:
+        """A transaction with its object changes, or None if the node does not know it."""
+        try:
+            return await self._rpc("sui_getTransactionBlock", [digest, {"showObjectChanges": True}])
+        except LookupError:
+            return None
+
+    async def _rpc(self, method: str, params: list):
+        self._request_id += 1
+        response = await self._client.post(self.rpc_url, json={
+            "jsonrpc": "2.0", "id": self._request_id, "method": method, "params": params,
+        })
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise LookupError(f"{method} failed: {body['error']}")
+        return body["result"]
+
+    async def close(self):
+        await self._client.aclose()
+
+class ChainIndexer:
+    """
+    `fetch(cursor, limit)` returns a suix_queryEvents page ({"data", "nextCursor",
+    "hasNextPage"}). Events are folded by name, following the contract's event structs:
+
+      GameStarted    {player, entrance_fee, timestamp}: counts a paid start for the player.
+                     It names no session, so it cannot be matched to one.
+      GameCompleted  {player, score, won, reward_amount, game_session_id}: the session,
+                     keyed by game_session_id, which is the server's game_id the frontend
+                     sends to /api/complete-game (as UTF-8 bytes). A won game with a reward
+                     also gets a RewardClaim row: the event's claim_id if it has one, else
+                     the claim (GameCompletionProof) object created by the same transaction,
+                     looked up with `lookup_transaction(digest)` when that is given.
+      RewardClaimed  {player, amount, game_session_id}: marks the session's claim paid out.
+
+    `synced_through` is the wall-clock time up to which every event is known to be
+    indexed: the start of the last poll that reached the end of the feed, or while
+    catching up, the timestamp of the newest indexed event. Lag is now minus that.
+    """
+
+    def __init__(self, fetch, url: str = DEFAULT_CHAIN_INDEX_DB_URL, source: Optional[str] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, page_limit: int = DEFAULT_PAGE_LIMIT,
+                 lookup_transaction=None):
+        self.fetch = fetch
+        self.lookup_transaction = lookup_transaction
+        self.source = source or getattr(fetch, "name", "default")
+        self.poll_interval = poll_interval
+        self.page_limit = page_limit
+        self.engine = create_engine(url)
+        if url.startswith("sqlite"):
+            event.listen(self.engine, "connect", _sqlite_pragmas)
+        Base.metadata.create_all(self.engine)
+        self._db = sessionmaker(self.engine, expire_on_commit=False)
+        self._players = {}  # player -> player dict
+        self._sessions = {}  # game_session_id -> session dict
+        self._claims = {}  # game_session_id -> claim dict
+        self.cursor = None
+        self.events_indexed = 0
+        self.synced_through = None
+        self.caught_up = False
+        self._task = None
+        self._wakeup = None
+        self._synced = None
+        self.polls = 0
+        self.poll_failures = 0
+        self.lookup_latency = LatencyTracker()
+        self.visibility_latency = LatencyTracker()
+        self.load()
+
+    def load(self):
+        """Reads the checkpoint and every indexed row into memory."""
+        with self._db() as db:
+            checkpoint = db.get(IndexerCheckpoint, self.source)
+            if checkpoint is not None:
+                self.cursor = {"txDigest": checkpoint.tx_digest, "eventSeq": checkpoint.event_seq}
+                self.events_indexed = checkpoint.events_indexed
+            # Plain rows rather than ORM objects: this reads every session at startup.
+            for row in db.execute(select(IndexedPlayer.__table__)).mappings():
+                self._players[row["player"]] = dict(row)
+            for row in db.execute(select(IndexedGameSession.__table__)).mappings():
+                self._sessions[row["game_session_id"]] = dict(row)
+            for row in db.execute(select(IndexedRewardClaim.__table__)).mappings():
+                self._claims[row["game_session_id"]] = dict(row)
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._synced = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        close = getattr(self.fetch, "close", None)
+        if close is not None:
+            await close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_failures += 1
+                logger.warning(f"Chain indexer poll failed: {e}")
+            if self.caught_up:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def poll(self) -> int:
+        """Indexes the next page of events; returns how many were applied."""
+        started_at = time.time()
+        self.polls += 1
+        page = await self.fetch(self.cursor, self.page_limit)
+        events = page.get("data") or []
+        if events:
+            players, sessions, claims, unresolved = self._fold(events)
+            if unresolved and self.lookup_transaction is not None:
+                await self._resolve_claims(claims, unresolved)
+            cursor = page.get("nextCursor") or events[-1]["id"]
+            await asyncio.to_thread(self._store, players, sessions, claims, cursor, self.events_indexed + len(events))
+            # Visible to lookups only once committed, so a restart never forgets what was served.
+            self._players.update(players)
+            self._sessions.update(sessions)
+            self._claims.update(claims)
+            self.cursor = cursor
+            self.events_indexed += len(events)
+            indexed_at = time.time()
+            for e in events:
+                if e.get("timestampMs"):
+                    self.visibility_latency.record(indexed_at - int(e["timestampMs"]) / 1000)
+        self.caught_up = not page.get("hasNextPage")
+        if self.caught_up:
+            self.synced_through = started_at
+            if self._synced is not None:
+                self._synced.set()
+                self._synced = asyncio.Event()
+        elif events and events[-1].get("timestampMs"):
+            self.synced_through = int(events[-1]["timestampMs"]) / 1000
+        return len(events)
+
+    def _fold(self, events: List[Dict[str, Any]]):
+        """
+        Applies a page of events to copies of the rows they touch. Also returns
+        {game_session_id: completing tx digest} for claims whose object ID is not in the event.
+        """
+        players, sessions, claims, unresolved = {}, {}, {}, {}
+
+        def session_of(session_id, player):
+            row = sessions.get(session_id) or self._sessions.get(session_id)
+            if row:
+                row = dict(row)
+            else:
+                # GameStarted names no session; the player's latest paid start is the best guess.
+                started = players.get(player) or self._players.get(player) or {}
+                row = {"game_session_id": session_id, "player": player, "status": "completed", "score": None,
+                       "won": None, "reward_amount": None, "started_at": started.get("last_started_at"),
+                       "completed_at": None}
+            sessions[session_id] = row
+            return row
+
+        for e in events:
+            name = e.get("type", "").rsplit("::", 1)[-1]
+            fields = e.get("parsedJson") or {}
+            at = datetime.utcfromtimestamp(int(e["timestampMs"]) / 1000) if e.get("timestampMs") else datetime.utcnow()
+            player = normalize_address(fields.get("player") or e.get("sender") or "0x0")
+            session_id = decode_session_id(fields.get("game_session_id") or fields.get("game_session"))
+            if name == "GameStarted":
+                row = players.get(player) or self._players.get(player)
+                row = dict(row) if row else {"player": player, "games_started": 0, "last_started_at": None}
+                row.update(games_started=row["games_started"] + 1, last_started_at=at)
+                players[player] = row
+            elif name == "GameCompleted" and session_id:
+                row = session_of(session_id, player)
+                row.update(status="completed", score=_int(fields.get("score")), won=bool(fields.get("won")),
+                           reward_amount=_int(fields.get("reward_amount")), completed_at=at)
+                claim_id = fields.get("claim_id") or fields.get("reward_claim_id")
+                if claim_id or (row["won"] and row["reward_amount"]):
+                    claims[session_id] = {"game_session_id": session_id, "claim_id": claim_id, "player": row["player"],
+                                          "amount": row["reward_amount"] or 0, "status": "created", "updated_at": at}
+                    if not claim_id:
+                        unresolved[session_id] = e["id"]["txDigest"]
+            elif name == "RewardClaimed" and session_id:
+                claim = claims.get(session_id) or self._claims.get(session_id)
+                claim = dict(claim) if claim else {"game_session_id": session_id, "claim_id": None, "player": player}
+                claim.update(amount=_int(fields.get("amount")) or claim.get("amount") or 0, status="claimed",
+                             updated_at=at)
+                claims[session_id] = claim
+        return players, sessions, claims, unresolved
+
+    async def _resolve_claims(self, claims, unresolved: Dict[str, str]):
+        """Fills in claim IDs from the objects their completing transactions created."""
+        digests = sorted(set(unresolved.values()))
+        responses = await asyncio.gather(*(self.lookup_transaction(digest) for digest in digests),
+                                         return_exceptions=True)
+        created = {}
+        for digest, response in zip(digests, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"Could not read transaction {digest} for its claim objects: {response}")
+                continue
+            created[digest] = [change.get("objectId") for change in (response or {}).get("objectChanges") or []
+                               if change.get("type") == "created"
+                               and _is_claim_type(change.get("objectType", ""))]
+        for session_id, digest in unresolved.items():
+            # A transaction completing several sessions cannot be told apart without the event naming its claim.
+            objects = created.get(digest) or []
+            if len(objects) == 1 and claims[session_id]["claim_id"] is None:
+                claims[session_id]["claim_id"] = objects[0]
+
+    def _store(self, players, sessions, claims, cursor, events_indexed):
+        with self._db() as db:
+            if players:
+                statement = sqlite_insert(IndexedPlayer)
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=["player"],
+                    set_={c: statement.excluded[c] for c in ("games_started", "last_started_at")}),
+                    list(players.values()))
+            if sessions:
+                statement = sqlite_insert(IndexedGameSession)
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=["game_session_id"],
+                    set_={c: statement.excluded[c] for c in ("player", "status", "score", "won", "reward_amount",
+                                                             "started_at", "completed_at")}),
+                    list(sessions.values()))
+            if claims:
+                statement = sqlite_insert(IndexedRewardClaim)
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=["game_session_id"],
+                    set_={c: statement.excluded[c] for c in ("claim_id", "player", "amount", "status", "updated_at")}),
+                    list(claims.values()))
+            db.merge(IndexerCheckpoint(source=self.source, tx_digest=cursor["txDigest"], event_seq=str(cursor["eventSeq"]),
+                                       events_indexed=events_indexed, updated_at=datetime.utcnow()))
+            db.commit()
+
+    def player(self, address: str) -> Optional[Dict[str, Any]]:
+        with hot_path("chain_index_lookup"), self.lookup_latency.time():
+            return self._players.get(normalize_address(address))
+
+    def session(self, game_session_id: str) -> Optional[Dict[str, Any]]:
+        with hot_path("chain_index_lookup"), self.lookup_latency.time():
+            return self._sessions.get(game_session_id)
+
+    def claim(self, game_session_id: str) -> Optional[Dict[str, Any]]:
+        with hot_path("chain_index_lookup"), self.lookup_latency.time():
+            return self._claims.get(game_session_id)
+
+    async def wait_for_session(self, game_session_id: str, timeout: float = DEFAULT_MISS_WAIT) -> Optional[Dict[str, Any]]:
+        """
+        A session the index has not seen may have completed after the last poll: polls now
+        and waits up to `timeout` for the feed to be read through to the current end.
+        """
+        session = self.session(game_session_id)
+        if session is not None or self._task is None:
+            return session
+        deadline = time.monotonic() + timeout
+        requested_at = time.time()
+        while self.synced_through is None or self.synced_through < requested_at:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            synced = self._synced
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(synced.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.session(game_session_id)
+
+    def lag_seconds(self) -> Optional[float]:
+        return None if self.synced_through is None else max(0.0, time.time() - self.synced_through)
+
+    def stats(self) -> Dict[str, Any]:
+        lag = self.lag_seconds()
+        return {
+            "source": self.source,
+            "events_indexed": self.events_indexed,
+            "players": len(self._players),
+            "game_sessions": len(self._sessions),
+            "reward_claims": len(self._claims),
+            "caught_up": self.caught_up,
+            "lag_seconds": round(lag, 3) if lag is not None else None,
+            "polls": self.polls,
+            "poll_failures": self.poll_failures,
+            "lookup_latency": self.lookup_latency.summary(),
+            "visibility_latency": self.visibility_latency.summary(),
+        }
+
+def create_chain_indexer(enabled: bool = DEFAULT_CHAIN_INDEXER_ENABLED) -> Optional[ChainIndexer]:
+    """The indexer reading the configured package's events, or None when CHAIN_INDEXER_ENABLED is off."""
+    if not enabled:
+        return None
+    source = JsonRpcEventSource()
+    return ChainIndexer(source, lookup_transaction=source.transaction)
+
+def _int(value) -> Optional[int]:
+    return None if value is None else int(value)
+
+def _is_claim_type(object_type: str) -> bool:
+    return object_type.endswith(("::GameCompletionProof", "::RewardClaim"))
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
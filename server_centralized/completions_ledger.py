@@ -0,0 +1,265 @@
+# completions_ledger.py
+# Persistent ledger of game completions behind /api/complete-game and /api/completions.
+# Rows live in SQLite through SQLAlchemy, indexed by (user, completion time); per-user
+# totals are kept up to date in the same transaction as each insert, so a user's history
+# page and totals cost an index range read regardless of how many completions exist.
+
+import os
+import time
+import base64
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import (
+    create_engine, event, select, func, String, Integer, BigInteger, Boolean, DateTime, Index, UniqueConstraint,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker, Session
+
+DEFAULT_COMPLETIONS_DB_URL = os.getenv("COMPLETIONS_DB_URL", "sqlite:///completions.sqlite3")
+DEFAULT_PAGE_SIZE = int(os.getenv("COMPLETIONS_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("COMPLETIONS_MAX_PAGE_SIZE", "500"))
+# Users whose first page and totals are served from memory. The TTL bounds how stale a
+# page can be when another worker process wrote the completion.
+DEFAULT_HOT_USERS = int(os.getenv("COMPLETIONS_CACHE_USERS", "10000"))
+DEFAULT_CACHE_TTL = float(os.getenv("COMPLETIONS_CACHE_TTL", "5"))
+
+class Base(DeclarativeBase):
+    pass
+
+class Completion(Base):
+    __tablename__ = "game_completions"
+    __table_args__ = (
+        UniqueConstraint("user_address", "game_session_id", name="uq_completion_user_session"),
+        # Newest-first history pages for one user are a range scan of this index.
+        Index("ix_completions_user_time", "user_address", "completed_at", "id"),
+        Index("ix_completions_time", "completed_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_address: Mapped[str] = mapped_column(String(66), nullable=False)
+    game_session_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    score: Mapped[int] = mapped_column(Integer, nullable=False)
+    won: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    is_true_ending: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    reward_amount: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Same shape as RewardManager.create_game_completion_record's result."""
+        return completion_dict(self)
+
+class UserCompletionTotals(Base):
+    """Running per-user aggregates, updated in the same transaction as each insert."""
+    __tablename__ = "user_completion_totals"
+
+    user_address: Mapped[str] = mapped_column(String(66), primary_key=True)
+    completions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    wins: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_rewards: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+def completion_dict(row) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "gameSessionId": row.game_session_id,
+        "userAddress": row.user_address,
+        "score": row.score,
+        "won": row.won,
+        "isTrueEnding": row.is_true_ending,
+        "rewardAmount": row.reward_amount,
+        "completedAt": row.completed_at.isoformat(),
+        "needsBlockchainProof": row.won and row.reward_amount > 0,
+    }
+
+def encode_cursor(completed_at: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{completed_at.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        completed_at, row_id = raw.split("|")
+        return datetime.fromisoformat(completed_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def add_completions(db: Session, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], bool]]:
+    """
+    Inserts completion records (RewardManager result dicts) and folds the new ones into
+    their users' totals. A (user, game session) pair is only recorded once; resubmissions
+    return the stored record. Returns [(record, created)] in input order. Does not commit.
+    """
+    if not records:
+        return []
+    rows = [{
+        "user_address": r["userAddress"],
+        "game_session_id": r["gameSessionId"],
+        "score": r["score"],
+        "won": r["won"],
+        "is_true_ending": r["isTrueEnding"],
+        "reward_amount": r["rewardAmount"],
+        "completed_at": datetime.fromisoformat(r["completedAt"]),
+    } for r in records]
+    # Core inserts on the tables: the ORM bulk-insert path costs about twice as much per row.
+    completions_table, totals_table = Completion.__table__, UserCompletionTotals.__table__
+    inserted = db.execute(
+        sqlite_insert(completions_table).on_conflict_do_nothing(index_elements=["user_address", "game_session_id"])
+        .returning(completions_table.c.user_address, completions_table.c.game_session_id),
+        rows,
+    ).all()
+    inserted = {(user, session_id) for user, session_id in inserted}
+    # A pair repeated within one call is inserted once; only its first occurrence counts.
+    created, seen = [], set()
+    for row in rows:
+        key = (row["user_address"], row["game_session_id"])
+        created.append(key in inserted and key not in seen)
+        seen.add(key)
+
+    totals = {}
+    for row, is_new in zip(rows, created):
+        if not is_new:
+            continue
+        entry = totals.setdefault(row["user_address"], [0, 0, 0, row["completed_at"]])
+        entry[0] += 1
+        entry[1] += row["won"]
+        entry[2] += row["reward_amount"] if row["won"] else 0
+        entry[3] = max(entry[3], row["completed_at"])
+    if totals:
+        statement = sqlite_insert(totals_table)
+        db.execute(
+            statement.on_conflict_do_update(index_elements=["user_address"], set_={
+                "completions": totals_table.c.completions + statement.excluded.completions,
+                "wins": totals_table.c.wins + statement.excluded.wins,
+                "total_rewards": totals_table.c.total_rewards + statement.excluded.total_rewards,
+                "last_completed_at": func.max(func.coalesce(totals_table.c.last_completed_at,
+                                                            statement.excluded.last_completed_at),
+                                              statement.excluded.last_completed_at),
+            }),
+            [{"user_address": user, "completions": c, "wins": w, "total_rewards": t, "last_completed_at": last}
+             for user, (c, w, t, last) in totals.items()],
+        )
+    db.info.setdefault("touched_users", set()).update(row["user_address"] for row in rows)
+    db.info["created_completions"] = db.info.get("created_completions", 0) + len(inserted)
+
+    duplicates = [(row["user_address"], row["game_session_id"]) for row, is_new in zip(rows, created) if not is_new]
+    stored = {}
+    if duplicates:
+        for user in {user for user, _ in duplicates}:
+            sessions = [session_id for u, session_id in duplicates if u == user]
+            for existing in db.scalars(select(Completion).where(
+                    Completion.user_address == user, Completion.game_session_id.in_(sessions))):
+                stored[(existing.user_address, existing.game_session_id)] = existing.to_dict()
+    results = []
+    for record, row, is_new in zip(records, rows, created):
+        key = (row["user_address"], row["game_session_id"])
+        results.append((record, True) if is_new else (stored.get(key, record), False))
+    return results
+
+class CompletionsLedger:
+    """
+    Owns the engine and session factory. `session()` yields a SQLAlchemy Session (the one
+    RewardManager is given), commits it, and drops the cached pages of every user it
+    wrote to. `history()` pages newest-first with an opaque keyset cursor; the first page
+    and totals of recently read users come from an LRU cache.
+    """
+
+    def __init__(self, url: str = DEFAULT_COMPLETIONS_DB_URL, hot_users: int = DEFAULT_HOT_USERS,
+                 cache_ttl: float = DEFAULT_CACHE_TTL):
+        self.engine = create_engine(url)
+        if url.startswith("sqlite"):
+            event.listen(self.engine, "connect", _sqlite_pragmas)
+        Base.metadata.create_all(self.engine)
+        self._sessions = sessionmaker(self.engine, expire_on_commit=False)
+        self.hot_users = hot_users
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()  # user_address -> {limit: (expires_at, first page)}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        with self._sessions() as db:
+            self._total = db.scalar(select(func.coalesce(func.sum(UserCompletionTotals.completions), 0)))
+
+    @contextmanager
+    def session(self):
+        db = self._sessions()
+        try:
+            yield db
+            db.commit()
+            with self._lock:  # Sessions run on worker threads
+                self._total += db.info.get("created_completions", 0)
+            self.invalidate(*db.info.get("touched_users", ()))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def invalidate(self, *user_addresses):
+        with self._lock:
+            for user_address in user_addresses:
+                self._cache.pop(user_address, None)
+
+    def total_completions(self) -> int:
+        return self._total
+
+    def totals(self, db: Session, user_address: str) -> Dict[str, Any]:
+        row = db.get(UserCompletionTotals, user_address)
+        return {
+            "completionCount": row.completions if row else 0,
+            "wins": row.wins if row else 0,
+            "totalRewards": row.total_rewards if row else 0,
+            "lastCompletedAt": row.last_completed_at.isoformat() if row and row.last_completed_at else None,
+        }
+
+    def history(self, user_address: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """One page of a user's completions, newest first, with their totals."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if cursor is None:
+            with self._lock:
+                cached = self._cache.get(user_address, {}).get(limit)
+                if cached is not None and cached[0] > time.monotonic():
+                    self._cache.move_to_end(user_address)
+                    self.cache_hits += 1
+                    return cached[1]
+                self.cache_misses += 1
+
+        query = select(Completion).where(Completion.user_address == user_address)
+        if cursor is not None:
+            completed_at, row_id = decode_cursor(cursor)
+            query = query.where((Completion.completed_at < completed_at)
+                                | ((Completion.completed_at == completed_at) & (Completion.id < row_id)))
+        query = query.order_by(Completion.completed_at.desc(), Completion.id.desc()).limit(limit + 1)
+        with self._sessions() as db:
+            rows = db.scalars(query).all()
+            page = {
+                "completions": [row.to_dict() for row in rows[:limit]],
+                "nextCursor": encode_cursor(rows[limit - 1].completed_at, rows[limit - 1].id) if len(rows) > limit else None,
+                **self.totals(db, user_address),
+            }
+
+        if cursor is None and self.hot_users > 0:
+            with self._lock:
+                self._cache.setdefault(user_address, {})[limit] = (time.monotonic() + self.cache_ttl, page)
+                self._cache.move_to_end(user_address)
+                while len(self._cache) > self.hot_users:
+                    self._cache.popitem(last=False)
+        return page
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "total_completions": self._total,
+            "cached_users": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else None,
+        }
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
@@ -0,0 +1,117 @@
+# game_logic/context_manager.py
+# Keeps the conversation history sent with each Interaction prompt within a token budget.
+
+import os
+from collections import deque
+from .stats import estimate_tokens
+from .prompt_builder import compact_json
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+DEFAULT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "6"))
+
+class ContextManager:
+    """
+    Splits a villager's memory into the last K turns (sent verbatim) and a rolling
+    summary of everything older.
+
+    The summary lives on the GameState (`summary_of(npc_name)`) and only
+    ever grows by folding in the turns that just aged out of the verbatim window, so
+    the cost of a turn does not depend on how long the conversation has been going.
+    When the summary itself outgrows its share of the budget, its oldest lines are
+    collapsed into a single "earlier exchanges" counter.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, recent_turns: int = DEFAULT_RECENT_TURNS,
+                 player_chars: int = 80, npc_chars: int = 140):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.player_chars = player_chars
+        self.npc_chars = npc_chars
+        # (unbounded_tokens, bounded_tokens) for recent prompts.
+        self.samples = deque(maxlen=1024)
+        self.prompts = 0
+        self.tokens_saved = 0
+
+    def build_history(self, game_state, npc_name: str):
+        """Returns (recent_messages, summary_text) for the villager's next prompt."""
+        memory = game_state.memory_of(npc_name)
+        summary = game_state.summary_of(npc_name)
+
+        keep = self.recent_turns * 2
+        self._fold(summary, memory, len(memory) - keep)
+
+        # Still over budget: shorten the verbatim window first, then the summary.
+        recent = memory.as_messages(summary.folded)
+        while recent and self._tokens(recent, summary) > self.token_budget:
+            self._fold(summary, memory, summary.folded + 2)
+            recent = memory.as_messages(summary.folded)
+        while summary.lines and self._tokens(recent, summary) > self.token_budget:
+            summary.lines.pop(0)
+            summary.omitted += 1
+
+        self._record(memory, recent, summary)
+        return recent, self.render_summary(summary)
+
+    def _fold(self, summary, memory, upto: int):
+        # Memory is always appended as (player, npc) pairs, so fold whole turns.
+        index = summary.folded
+        contents = memory.contents
+        while index + 2 <= min(upto, len(memory)):
+            summary.lines.append(self._summarize_turn(contents[index], contents[index + 1]))
+            index += 2
+        summary.folded = index
+
+    def _summarize_turn(self, player: str, npc: str) -> str:
+        parts = []
+        if player:
+            parts.append("Player: " + _clip(player, self.player_chars))
+        if npc:
+            parts.append("You: " + _clip(_first_sentence(npc), self.npc_chars))
+        return " | ".join(parts)
+
+    def render_summary(self, summary) -> str:
+        lines = []
+        if summary.omitted:
+            lines.append(f"({summary.omitted} earlier exchanges omitted)")
+        lines.extend(summary.lines)
+        return "\n".join(lines)
+
+    def _tokens(self, recent, summary) -> int:
+        return _history_tokens(recent) + sum(estimate_tokens(line) + 1 for line in summary.lines)
+
+    def _record(self, memory, recent, summary):
+        # What the prompt would have carried without the budget, kept as a running total.
+        for message in memory.as_messages(summary.measured):
+            summary.memory_tokens += _history_tokens([message])
+        summary.measured = len(memory)
+
+        unbounded = summary.memory_tokens
+        bounded = _history_tokens(recent) + estimate_tokens(self.render_summary(summary))
+        self.samples.append((unbounded, bounded))
+        self.prompts += 1
+        self.tokens_saved += max(0, unbounded - bounded)
+
+    def stats(self) -> dict:
+        if not self.samples:
+            return {"prompts": 0}
+        unbounded = [u for u, _ in self.samples]
+        bounded = [b for _, b in self.samples]
+        return {
+            "prompts": self.prompts,
+            "token_budget": self.token_budget,
+            "recent_turns": self.recent_turns,
+            "history_tokens_unbounded": {"mean": round(sum(unbounded) / len(unbounded), 1), "max": max(unbounded)},
+            "history_tokens_bounded": {"mean": round(sum(bounded) / len(bounded), 1), "max": max(bounded)},
+            "tokens_saved_total": self.tokens_saved,
+        }
+
+def _history_tokens(messages) -> int:
+    return estimate_tokens(compact_json(messages))
+
+def _first_sentence(text: str) -> str:
+    cuts = [i for i in (text.find(". "), text.find("! "), text.find("? ")) if i != -1]
+    return text[:min(cuts) + 1] if cuts else text
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
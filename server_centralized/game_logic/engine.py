@@ -2,23 +2,53 @@
 # The core GameEngine that manages the entire game lifecycle.
 
 import json
+import time
+import asyncio
 import traceback
-from .state_manager import GameState
+from .state_manager import GameState, Role, INITIAL_KNOWLEDGE_SUMMARY, MAX_FAMILIARITY
 from .llm_calls import GeminiAPI
+from .world_pool import WorldPool
+from .stream_parser import DialogueStreamParser
+from .stats import LatencyTracker
+from .context_manager import ContextManager
+from .quest_graph import QuestGraph
+from .response_bank import ResponseBank, ResponseBankStats, BANK_KINDS, DEFAULT_BANK_LINES
+from .opening_lines import OPENING_PROMPTS, OpeningLineStats, parse_opening_lines
+from .speculation import Speculator
+from .metrics import hot_path
+from .events import EventLog, GameCreated, Turn, ClueRevealed
 from config import VILLAGER_ROSTER, FAMILIARITY_LEVELS
 
 class GameEngine:
-    def __init__(self, api_key: str):
-        self.llm_api = GeminiAPI(api_key)
+    def __init__(self, api_key: str, llm_max_concurrency: int = None, world_pool_size: int = None, llm_backend: str = None,
+                 event_log: EventLog = None, journal=None):
+        self.llm_api = GeminiAPI(api_key, max_concurrency=llm_max_concurrency, backend=llm_backend)
+        if world_pool_size is None:
+            self.world_pool = WorldPool(self.generate_world)
+        else:
+            self.world_pool = WorldPool(self.generate_world, target_size=world_pool_size)
+        # Perceived latency of the streaming dialogue path.
+        self.stream_ttft = LatencyTracker()
+        self.stream_total = LatencyTracker()
+        self.context_manager = ContextManager()
+        self.response_bank_stats = ResponseBankStats()
+        self.opening_line_stats = OpeningLineStats()
+        self.speculator = Speculator(self.llm_api)
+        self.events = EventLog() if event_log is None else event_log
+        self.journal = journal  # TurnJournal of the session store, when sessions are crash-safe
 
-    def start_new_game(self, game_id: str, num_inaccessible_locations: int, difficulty: str) -> GameState:
-        game_state = GameState(game_id, difficulty)
-        
+    async def generate_world(self, num_inaccessible_locations: int, difficulty: str):
+        """
+        Runs the StoryGenerator call, then the WorldBuilder, ResponseBank and OpeningLines
+        calls side by side, and returns (story_idea, quest_network, response_bank_data,
+        opening_lines_data). The last two are optional: if either call fails it is None
+        and the turns it would have covered use the LLM.
+        """
         # 1. Generate the core story idea
         try:
             print("Attempting to generate story idea...")
             story_context = {"num_inaccessible_locations": num_inaccessible_locations}
-            story_idea_json = self.llm_api.generate_content("StoryGenerator", story_context)
+            story_idea_json = await self.llm_api.generate_content_async("StoryGenerator", story_context)
             story_idea = json.loads(story_idea_json)
             print("Story idea generated successfully.")
         except (json.JSONDecodeError, ValueError, KeyError) as e:
@@ -26,110 +56,303 @@ class GameEngine:
             traceback.print_exc()
             raise Exception("Could not initialize game story.") from e
 
-        game_state.story_theme = story_idea.get("story_theme")
-        game_state.inaccessible_locations = story_idea.get("inaccessible_locations", [])
-        game_state.correct_location = story_idea.get("correct_location")
-        
-        game_state.player_state["knowledge_summary"] = "You've just woken up in a cozy cottage. A kind old man named Arthur tells you he found you unconscious by a car wreck on the edge of the woods. He says he searched the area but saw no sign of your friends. As he speaks, you remember a faint, desperate call in your mind: 'Help us... find us...' You've just thanked him and stepped outside into the village square to begin your search."
-        
-        game_state.villagers = VILLAGER_ROSTER
-        
-        # Initialize state for all villagers
-        for v in game_state.villagers:
-            game_state.full_npc_memory[v["name"]] = []
-            game_state.player_state["familiarity"][v["name"]] = 0
-            # BUG FIX: Re-added initialization for unproductive_turns
-            game_state.player_state["unproductive_turns"][v["name"]] = 0
-
-        # 2. Build the detailed Quest Network
+        # 2. Build the detailed Quest Network (pre-written lines are generated meanwhile)
+        bank_task = asyncio.ensure_future(self._generate_response_bank(story_idea))
+        openings_task = asyncio.ensure_future(self._generate_opening_lines(story_idea))
         try:
             print("Attempting to generate quest network...")
             world_context = {
-                "correctLocation": game_state.correct_location,
-                "villagers": game_state.villagers,
+                "correctLocation": story_idea.get("correct_location"),
+                "villagers": VILLAGER_ROSTER,
                 "difficulty": difficulty,
-                "story_theme": game_state.story_theme
+                "story_theme": story_idea.get("story_theme")
             }
-            quest_network_json = self.llm_api.generate_content("WorldBuilder", world_context)
-            game_state.quest_network = json.loads(quest_network_json)
-            if not game_state.quest_network.get("nodes"):
+            quest_network_json = await self.llm_api.generate_content_async("WorldBuilder", world_context)
+            quest_network = json.loads(quest_network_json)
+            if not quest_network.get("nodes"):
                  raise ValueError("Generated quest network is missing the 'nodes' list.")
             print("Quest network generated successfully.")
-            
-            print("\n\n" + "="*20 + " GENERATED QUEST NETWORK (SPOILERS) " + "="*20)
-            print(json.dumps(game_state.quest_network, indent=2))
-            print("="*70 + "\n\n")
 
         except (json.JSONDecodeError, ValueError, KeyError) as e:
+            bank_task.cancel()
+            openings_task.cancel()
             print(f"--- CRITICAL ERROR: Failed to generate or parse quest network. Error: {e} ---")
             traceback.print_exc()
             raise Exception("Could not initialize game world.") from e
 
+        return story_idea, quest_network, await bank_task, await openings_task
+
+    async def _generate_response_bank(self, story_idea: dict):
+        try:
+            bank_context = {
+                "villagers": VILLAGER_ROSTER,
+                "story_theme": story_idea.get("story_theme"),
+                "lines_per_band": DEFAULT_BANK_LINES,
+            }
+            bank_data = json.loads(await self.llm_api.generate_content_async("ResponseBank", bank_context))
+            if not bank_data.get("villagers"):
+                raise ValueError("Generated response bank is missing the 'villagers' list.")
+            return bank_data
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            self.response_bank_stats.build_failures += 1
+            print(f"--- WARNING: Response bank unavailable, closing turns will use the LLM. Error: {e} ---")
+            return None
+
+    async def _generate_opening_lines(self, story_idea: dict):
+        try:
+            openings_context = {
+                "villagers": VILLAGER_ROSTER,
+                "story_theme": story_idea.get("story_theme"),
+                "player_knowledge_summary": INITIAL_KNOWLEDGE_SUMMARY,
+            }
+            openings_data = json.loads(await self.llm_api.generate_content_async("OpeningLines", openings_context))
+            if not openings_data.get("villagers"):
+                raise ValueError("Generated opening lines are missing the 'villagers' list.")
+            return openings_data
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            self.opening_line_stats.build_failures += 1
+            print(f"--- WARNING: Opening lines unavailable, first conversations will use the LLM. Error: {e} ---")
+            return None
+
+    async def start_new_game(self, game_id: str, num_inaccessible_locations: int, difficulty: str) -> GameState:
+        world = self.world_pool.take(difficulty, num_inaccessible_locations)
+        from_pool = world is not None
+        if world is None:
+            world = await self.generate_world(num_inaccessible_locations, difficulty)
+        else:
+            print(f"Using pre-generated world from pool for ({difficulty}, {num_inaccessible_locations}).")
+        story_idea, quest_network, bank_data, openings_data = world
+
+        game_state = GameState(game_id, difficulty)
+        game_state.story_theme = story_idea.get("story_theme")
+        game_state.inaccessible_locations = tuple(story_idea.get("inaccessible_locations", []))
+        game_state.correct_location = story_idea.get("correct_location")
+        game_state.quest_network = quest_network
+        game_state.quest_graph = QuestGraph(quest_network)
+        if bank_data:
+            game_state.response_bank = ResponseBank.from_llm(bank_data, game_state.villagers)
+            self.response_bank_stats.banks_built += 1
+        if openings_data:
+            game_state.opening_lines = parse_opening_lines(openings_data, game_state.villagers)
+            self.opening_line_stats.batches_built += 1
+        # The quest network is a spoiler; it is only logged at debug verbosity.
+        self.events.emit(GameCreated(game_id, difficulty, num_inaccessible_locations, len(quest_network.get("nodes", [])),
+                                     from_pool, quest_network if self.events.debug else None))
         return game_state
     
+    def quest_graph(self, game_state: GameState) -> QuestGraph:
+        if game_state.quest_graph is None:
+            game_state.quest_graph = QuestGraph.from_state(game_state.quest_network, game_state.player_state.discovered_nodes)
+        return game_state.quest_graph
+
     def get_villager_clue_status(self, game_state: GameState, npc_name: str):
-        undiscovered_nodes = [
-            node for node in game_state.quest_network.get("nodes", [])
-            if node["villager_name"] == npc_name and node["node_id"] not in game_state.player_state["discovered_nodes"]
-        ]
+        with hot_path("clue_status"):
+            familiarity = game_state.familiarity_of(npc_name)
+            return self.quest_graph(game_state).clue_status(npc_name, familiarity)
 
-        if not undiscovered_nodes:
-            return "PERMANENTLY_EXHAUSTED", None
+    def frustration_of(self, game_state: GameState, npc_name: str) -> dict:
+        return {"friends": sum(1 for content in game_state.memory_of(npc_name).contents
+                               if content and "friend" in content.lower())}
 
-        sorted_nodes = sorted(undiscovered_nodes, key=lambda x: x.get('priority', 0), reverse=True)
+    async def _reply_without_llm(self, game_state: GameState, npc_name: str, player_input: str):
+        """A pre-written or prefetched reply for this turn, or None to ask the LLM."""
+        dialogue_data = self._prewritten_reply(game_state, npc_name, player_input)
+        if dialogue_data is not None:
+            self.speculator.discard(game_state.game_id)
+            return dialogue_data
+        dialogue_turn = await self.speculator.take(game_state, npc_name, player_input)
+        if dialogue_turn is None:
+            return None
+        try:
+            return json.loads(dialogue_turn)
+        except json.JSONDecodeError:
+            return None
 
-        for node in sorted_nodes:
-            preconditions_met = all(p in game_state.player_state["discovered_nodes"] for p in node.get("preconditions", []))
-            current_familiarity = game_state.player_state["familiarity"].get(npc_name, 0)
-            required_familiarity = node.get("required_familiarity")
-            familiarity_met = required_familiarity is None or current_familiarity >= required_familiarity
+    def _speculate_next_turn(self, game_state: GameState, npc_name: str, dialogue_data: dict):
+        if not self.speculator.enabled:
+            return
+        clue_status, _ = self.get_villager_clue_status(game_state, npc_name)
+        if clue_status in BANK_KINDS:
+            return  # The next turn would be a closing line; the bank may answer it for free.
+        frustration = self.frustration_of(game_state, npc_name)
+        self.speculator.launch(
+            game_state, npc_name, dialogue_data.get("player_responses"),
+            lambda player_input: self._build_interaction_context(game_state, npc_name, player_input, frustration),
+        )
 
-            if preconditions_met and familiarity_met:
-                return "CAN_REVEAL", node
+    def _prewritten_reply(self, game_state: GameState, npc_name: str, player_input: str):
+        """A pre-generated opening or closing line for this turn, or None to ask the LLM."""
+        return self._opening_reply(game_state, npc_name, player_input) or self._bank_reply(game_state, npc_name)
 
-        return "HAS_LOCKED_CLUES", sorted_nodes[0]
+    def _opening_reply(self, game_state: GameState, npc_name: str, player_input: str):
+        index = game_state.villager_index(npc_name)
+        if player_input not in OPENING_PROMPTS or len(game_state.full_npc_memory[index]):
+            return None
+        opening = game_state.opening_lines[index] if game_state.opening_lines else None
+        if opening is None:
+            self.opening_line_stats.fallbacks += 1
+            return None
+        game_state.opening_lines[index] = None
+        self.opening_line_stats.served += 1
+        npc_dialogue, player_responses, familiarity = opening
+        return {
+            "npc_dialogue": npc_dialogue,
+            "player_responses": list(player_responses),
+            "node_revealed_id": None,
+            "new_familiarity_level": familiarity,
+        }
 
-    def process_interaction_turn(self, game_state: GameState, npc_name: str, player_input: str, frustration: dict):
+    def _bank_reply(self, game_state: GameState, npc_name: str):
+        """Serves a closing turn from the game's response bank. None means: ask the LLM."""
+        clue_status, _ = self.get_villager_clue_status(game_state, npc_name)
+        if clue_status not in BANK_KINDS:
+            return None
+        stats = self.response_bank_stats
+        stats.eligible += 1
+        start = time.perf_counter()
+        familiarity = game_state.familiarity_of(npc_name)
+        line = None
+        if game_state.response_bank is not None:
+            line = game_state.response_bank.take(game_state.villager_index(npc_name), clue_status, familiarity)
+        if line is None:
+            stats.fallbacks += 1
+            return None
+        npc_dialogue, closing_option = line
+        stats.hits += 1
+        stats.serve_seconds += time.perf_counter() - start
+        return {
+            "npc_dialogue": npc_dialogue,
+            "player_responses": [closing_option],
+            "node_revealed_id": None,
+            # The most _apply_dialogue_turn lets an LLM turn raise it by, so a clue gated on
+            # required_familiarity unlocks after as many turns as it would without the bank.
+            "new_familiarity_level": min(familiarity + 1, MAX_FAMILIARITY),
+        }
+
+    def _build_interaction_context(self, game_state: GameState, npc_name: str, player_input: str, frustration: dict):
+        with hot_path("interaction_context"):
+            return self._interaction_context(game_state, npc_name, player_input, frustration)
+
+    def _interaction_context(self, game_state: GameState, npc_name: str, player_input: str, frustration: dict):
         clue_status, context_node = self.get_villager_clue_status(game_state, npc_name)
 
-        villager_profile = next((v for v in game_state.villagers if v["name"] == npc_name), None)
+        villager_profile = game_state.villagers[game_state.villager_index(npc_name)]
         
-        familiarity = game_state.player_state["familiarity"].get(npc_name, 0)
+        familiarity = game_state.familiarity_of(npc_name)
+        recent_history, history_summary = self.context_manager.build_history(game_state, npc_name)
         
-        dialogue_turn = self.llm_api.generate_content("Interaction", {
+        return {
+            "gameId": game_state.game_id,
+            "difficulty": game_state.difficulty,
             "villagerProfile": villager_profile,
-            "chatHistory": game_state.full_npc_memory.get(npc_name, []),
+            "chatHistory": recent_history,
+            "historySummary": history_summary,
             "player_last_response": player_input,
             "conversational_status": clue_status,
             "context_node": context_node,
             "frustration": frustration,
-            "player_knowledge_summary": game_state.player_state["knowledge_summary"],
+            "player_knowledge_summary": game_state.player_state.knowledge_summary,
             "familiarity_level": familiarity,
             "familiarity_description": FAMILIARITY_LEVELS.get(familiarity, "Unknown"),
-        })
-        
-        dialogue_data = json.loads(dialogue_turn)
-        
-        game_state.full_npc_memory[npc_name].append({"role": "player", "content": player_input})
-        game_state.full_npc_memory[npc_name].append({"role": "npc", "content": dialogue_data.get("npc_dialogue")})
-        
-        # LOGIC FIX: Enforce the "+1" familiarity rule in the engine
-        new_familiarity = dialogue_data.get("new_familiarity_level")
-        if new_familiarity is not None:
-            old_familiarity = game_state.player_state["familiarity"].get(npc_name, 0)
-            # Cap the increase at a maximum of 1
-            if new_familiarity > old_familiarity + 1:
-                new_familiarity = old_familiarity + 1
-            game_state.player_state["familiarity"][npc_name] = new_familiarity
-
-        revealed_node_id = dialogue_data.get("node_revealed_id")
-        if revealed_node_id and revealed_node_id not in game_state.player_state["discovered_nodes"]:
-            game_state.player_state["discovered_nodes"].append(revealed_node_id)
-            all_discovered_content = [node['content'] for node in game_state.quest_network.get('nodes', []) if node['node_id'] in game_state.player_state['discovered_nodes']]
-            game_state.player_state["knowledge_summary"] = "Key points discovered so far: " + "; ".join(all_discovered_content)
-
-        print("\n\n" + "-"*20 + " CURRENT PLAYER STATE " + "-"*20)
-        print(json.dumps(game_state.player_state, indent=2, default=str))
-        print("-"*60 + "\n\n")
-
-        return dialogue_data
\ No newline at end of file
+        }
+
+    def _apply_dialogue_turn(self, game_state: GameState, npc_name: str, player_input: str, dialogue_data: dict):
+        with hot_path("apply_turn"):
+            game_state.state_version += 1
+            memory = game_state.memory_of(npc_name)
+            memory.append(Role.PLAYER, player_input)
+            memory.append(Role.NPC, dialogue_data.get("npc_dialogue"))
+
+            # LOGIC FIX: Enforce the "+1" familiarity rule in the engine
+            new_familiarity = dialogue_data.get("new_familiarity_level")
+            if isinstance(new_familiarity, (int, float)):
+                old_familiarity = game_state.familiarity_of(npc_name)
+                # Cap the increase at a maximum of 1
+                game_state.set_familiarity(npc_name, min(int(new_familiarity), old_familiarity + 1))
+
+            revealed_node_id = dialogue_data.get("node_revealed_id")
+            if revealed_node_id and self.quest_graph(game_state).reveal(revealed_node_id):
+                game_state.player_state.discovered_nodes.append(revealed_node_id)
+                game_state.player_state.knowledge_summary = game_state.quest_graph.knowledge_summary()
+                self.events.emit(ClueRevealed(game_state.game_id, npc_name, revealed_node_id,
+                                              revealed_node_id in game_state.quest_graph.key_clue_ids,
+                                              game_state.state_version))
+            else:
+                revealed_node_id = None
+
+            if self.journal is not None:
+                self.journal.record_turn(game_state, game_state.villager_index(npc_name), player_input,
+                                         dialogue_data.get("npc_dialogue"), revealed_node_id)
+        self._emit_turn(game_state, npc_name)
+
+    async def commit(self):
+        """Waits until the turns and new sessions applied so far are in the journal on disk."""
+        if self.journal is not None:
+            await self.journal.sync()
+
+    def _emit_turn(self, game_state: GameState, npc_name: str):
+        player_state = game_state.player_state
+        debug_state = None
+        if self.events.debug:
+            debug_state = {
+                "discovered_nodes": list(player_state.discovered_nodes),
+                "knowledge_summary": player_state.knowledge_summary,
+                "familiarity": dict(zip((v.name for v in game_state.villagers), player_state.familiarity)),
+            }
+        self.events.emit(Turn(game_state.game_id, npc_name, game_state.state_version, game_state.familiarity_of(npc_name),
+                              len(player_state.discovered_nodes), debug_state))
+
+    async def process_interaction_turn(self, game_state: GameState, npc_name: str, player_input: str, frustration: dict):
+        dialogue_data = await self._reply_without_llm(game_state, npc_name, player_input)
+        if dialogue_data is None:
+            interaction_context = self._build_interaction_context(game_state, npc_name, player_input, frustration)
+            dialogue_turn = await self.llm_api.generate_content_async("Interaction", interaction_context)
+            dialogue_data = json.loads(dialogue_turn)
+            if not dialogue_data:
+                return None  # The LLM call gave up ("{}"); the caller fails the request and the game is untouched.
+        self._apply_dialogue_turn(game_state, npc_name, player_input, dialogue_data)
+        self._speculate_next_turn(game_state, npc_name, dialogue_data)
+        await self.commit()
+
+        return dialogue_data
+
+    async def stream_interaction_turn(self, game_state: GameState, npc_name: str, player_input: str, frustration: dict):
+        """
+        Async generator over ("dialogue", {"delta": str}) events while the model is still
+        writing, then one ("final", {"dialogue": dialogue_data, "ttft_ms": ...}) event. A model reply only mutates the
+        game state once it has been parsed in full, so an abandoned stream changes nothing; a pre-written reply is
+        consumed when it is picked, so it is applied and committed before its line is sent.
+        """
+        start = time.perf_counter()
+        dialogue_data = await self._reply_without_llm(game_state, npc_name, player_input)
+        if dialogue_data is not None:
+            self._apply_dialogue_turn(game_state, npc_name, player_input, dialogue_data)
+            self._speculate_next_turn(game_state, npc_name, dialogue_data)
+            await self.commit()
+            yield "dialogue", {"delta": dialogue_data.get("npc_dialogue") or ""}
+            elapsed = time.perf_counter() - start
+            self.stream_ttft.record(elapsed)
+            self.stream_total.record(elapsed)
+            yield "final", {"dialogue": dialogue_data, "ttft_ms": round(elapsed * 1000, 2)}
+            return
+
+        interaction_context = self._build_interaction_context(game_state, npc_name, player_input, frustration)
+        parser = DialogueStreamParser("npc_dialogue")
+        first_token_at = None
+
+        async for chunk in self.llm_api.generate_content_stream_async("Interaction", interaction_context):
+            delta = parser.feed(chunk)
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    self.stream_ttft.record(first_token_at - start)
+                yield "dialogue", {"delta": delta}
+
+        dialogue_data = json.loads(self.llm_api._clean_json_response(parser.text))
+        self._apply_dialogue_turn(game_state, npc_name, player_input, dialogue_data)
+        self._speculate_next_turn(game_state, npc_name, dialogue_data)
+        await self.commit()
+        self.stream_total.record(time.perf_counter() - start)
+
+        ttft_ms = None if first_token_at is None else round((first_token_at - start) * 1000, 2)
+        yield "final", {"dialogue": dialogue_data, "ttft_ms": ttft_ms}
@@ -0,0 +1,260 @@
+# game_logic/events.py
+# Structured per-game events. The request path builds a small typed event and appends it
+# to a bounded in-memory queue; a background thread batches the queue into rotating JSONL
+# files. When the queue is full events are dropped and counted rather than slowing a turn.
+
+import os
+import json
+import time
+import zlib
+import atexit
+import threading
+from collections import deque
+from .stats import LatencyTracker
+
+def parse_sample_rates(spec: str) -> dict:
+    """"turn=0.1,guess=1" -> {"turn": 0.1, "guess": 1.0}"""
+    rates = {}
+    for part in spec.split(","):
+        kind, _, rate = part.partition("=")
+        if kind.strip() and rate.strip():
+            rates[kind.strip()] = float(rate)
+    return rates
+
+DEFAULT_EVENT_LOG_ENABLED = os.getenv("EVENT_LOG_ENABLED", "1") != "0"
+DEFAULT_EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "events")
+DEFAULT_EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "10000"))
+DEFAULT_EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "500"))
+DEFAULT_EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", "1.0"))
+DEFAULT_EVENT_FILE_MAX_BYTES = int(os.getenv("EVENT_FILE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_EVENT_FILE_BACKUPS = int(os.getenv("EVENT_FILE_BACKUPS", "10"))
+# Event type -> fraction of games whose events of that type are kept (default 1).
+DEFAULT_EVENT_SAMPLE_RATES = parse_sample_rates(os.getenv("EVENT_SAMPLE_RATES", ""))
+# "debug" adds the spoiler payloads the server used to print: the full quest network on
+# game_created and the player's knowledge on every turn.
+DEFAULT_EVENT_VERBOSITY = os.getenv("EVENT_VERBOSITY", "info")
+
+class Event:
+    """Base for typed events. `fields` are written in order; `debug_fields` only when set."""
+    __slots__ = ("at", "game_id")
+    kind = ""
+    fields = ()
+    debug_fields = ()
+
+    def __init__(self, game_id: str):
+        self.at = time.time()
+        self.game_id = game_id
+
+    def record(self) -> dict:
+        record = {"type": self.kind, "at": round(self.at, 6), "game_id": self.game_id}
+        for name in self.fields:
+            record[name] = getattr(self, name)
+        for name in self.debug_fields:
+            value = getattr(self, name)
+            if value is not None:
+                record[name] = value
+        return record
+
+class GameCreated(Event):
+    __slots__ = ("difficulty", "num_locations", "num_nodes", "from_pool", "quest_network")
+    kind = "game_created"
+    fields = ("difficulty", "num_locations", "num_nodes", "from_pool")
+    debug_fields = ("quest_network",)
+
+    def __init__(self, game_id: str, difficulty: str, num_locations: int, num_nodes: int, from_pool: bool,
+                 quest_network: dict = None):
+        super().__init__(game_id)
+        self.difficulty = difficulty
+        self.num_locations = num_locations
+        self.num_nodes = num_nodes
+        self.from_pool = from_pool
+        self.quest_network = quest_network
+
+class Turn(Event):
+    __slots__ = ("villager", "state_version", "familiarity", "discovered", "player_state")
+    kind = "turn"
+    fields = ("villager", "state_version", "familiarity", "discovered")
+    debug_fields = ("player_state",)
+
+    def __init__(self, game_id: str, villager: str, state_version: int, familiarity: int, discovered: int,
+                 player_state: dict = None):
+        super().__init__(game_id)
+        self.villager = villager
+        self.state_version = state_version
+        self.familiarity = familiarity
+        self.discovered = discovered
+        self.player_state = player_state
+
+class ClueRevealed(Event):
+    __slots__ = ("villager", "node_id", "key_clue", "state_version")
+    kind = "clue_revealed"
+    fields = ("villager", "node_id", "key_clue", "state_version")
+
+    def __init__(self, game_id: str, villager: str, node_id: str, key_clue: bool, state_version: int):
+        super().__init__(game_id)
+        self.villager = villager
+        self.node_id = node_id
+        self.key_clue = key_clue
+        self.state_version = state_version
+
+class Guess(Event):
+    __slots__ = ("location", "correct", "true_ending", "discovered")
+    kind = "guess"
+    fields = ("location", "correct", "true_ending", "discovered")
+
+    def __init__(self, game_id: str, location: str, correct: bool, true_ending: bool, discovered: int):
+        super().__init__(game_id)
+        self.location = location
+        self.correct = correct
+        self.true_ending = true_ending
+        self.discovered = discovered
+
+class EventLog:
+    """
+    emit() is the only call on the request path: a sampling check and a deque append. The
+    writer thread wakes every flush_interval (or as soon as a batch is ready), serialises up
+    to batch_size events per write and rotates the file RotatingFileHandler-style. Each
+    process writes its own events-<pid>.jsonl so workers never interleave lines.
+    """
+
+    def __init__(self, directory: str = DEFAULT_EVENT_LOG_DIR, enabled: bool = DEFAULT_EVENT_LOG_ENABLED,
+                 queue_size: int = DEFAULT_EVENT_QUEUE_SIZE, batch_size: int = DEFAULT_EVENT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_EVENT_FLUSH_INTERVAL, max_bytes: int = DEFAULT_EVENT_FILE_MAX_BYTES,
+                 backups: int = DEFAULT_EVENT_FILE_BACKUPS, sample_rates: dict = None,
+                 verbosity: str = DEFAULT_EVENT_VERBOSITY):
+        self.enabled = enabled
+        self.path = os.path.join(directory, f"events-{os.getpid()}.jsonl")
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rates = DEFAULT_EVENT_SAMPLE_RATES if sample_rates is None else sample_rates
+        self.debug = verbosity == "debug"
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = None
+        self._file = None
+        self._size = 0
+        self._processed = 0  # Events taken off the queue, written or not
+        self.emitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.write_latency = LatencyTracker()
+
+    def sampled(self, kind: str, game_id: str) -> bool:
+        """Sampling is by game, so a kept game keeps every event of that type."""
+        rate = self.sample_rates.get(kind, 1.0)
+        if rate >= 1.0:
+            return True
+        return (zlib.crc32(game_id.encode()) & 0xFFFF) < rate * 0x10000
+
+    def emit(self, event: Event):
+        if not self.enabled:
+            return
+        if not self.sampled(event.kind, event.game_id):
+            self.sampled_out += 1
+            return
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(event)
+        self.emitted += 1
+        if self._thread is None:
+            self._start()
+        elif len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+            if self._closing:
+                self._drain()
+                break
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        queue = self._queue
+        while queue:
+            batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+            start = time.perf_counter()
+            data = "".join(json.dumps(e.record(), separators=(",", ":"), default=str) + "\n" for e in batch)
+            try:
+                self._write(data)
+            except OSError as e:
+                self.write_errors += 1
+                print(f"--- WARNING: Dropped {len(batch)} game events, event log write failed: {e} ---")
+            else:
+                self.written += len(batch)
+                self.batches += 1
+                self.write_latency.record(time.perf_counter() - start)
+            self._processed += len(batch)
+
+    def _write(self, data: str):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._size = self._file.tell()
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._size = 0
+        self.rotations += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wakes the writer and waits until everything queued so far has been written."""
+        if self._thread is None:
+            return
+        target = self._processed + len(self._queue)
+        deadline = time.monotonic() + timeout
+        while self._processed < target and time.monotonic() < deadline:
+            self._wake.set()
+            time.sleep(0.005)
+
+    def close(self, timeout: float = 5.0):
+        if self._thread is None or self._closing:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "verbosity": "debug" if self.debug else "info",
+            "queue_depth": len(self._queue),
+            "emitted": self.emitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+            "batch_write_latency": self.write_latency.summary(),
+        }
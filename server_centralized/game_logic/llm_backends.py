@@ -0,0 +1,445 @@
+# game_logic/llm_backends.py
+# Interchangeable model backends behind GeminiAPI. Each one has the same shape as
+# genai.GenerativeModel (generate_content / generate_content_async with stream=True),
+# so GeminiAPI keeps doing prompt building, concurrency limits and JSON cleanup.
+#
+#   LLM_BACKEND=gemini   the real model (needs GOOGLE_API_KEY)
+#   LLM_BACKEND=fake     local, schema-valid stand-in with simulated latency and faults
+#   LLM_BACKEND=record   the real model, with every call appended to LLM_RECORDING_PATH
+#   LLM_BACKEND=replay   serves LLM_RECORDING_PATH byte for byte, no network
+
+import os
+import re
+import json
+import queue
+import atexit
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from config import VILLAGER_ROSTER
+from .prompt_builder import (
+    STORY_GENERATOR_PREFIX, WORLD_BUILDER_RULES, INTERACTION_RULES, RESPONSE_BANK_RULES,
+    OPENING_LINES_RULES, _TURN_OBJECTIVES, _CLOSING_JSON_TASK,
+)
+
+DEFAULT_LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+DEFAULT_GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+DEFAULT_RECORDING_PATH = os.getenv("LLM_RECORDING_PATH", "llm_recording.jsonl")
+DEFAULT_REPLAY_TIMING = os.getenv("LLM_REPLAY_TIMING", "recorded")  # or "instant"
+
+DEFAULT_FAKE_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:0.8,0.35")
+DEFAULT_FAKE_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+DEFAULT_FAKE_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))
+DEFAULT_FAKE_NODES = int(os.getenv("FAKE_LLM_NODES", "0"))  # 0 = follow the difficulty's node count
+DEFAULT_FAKE_SEED = int(os.getenv("FAKE_LLM_SEED", "1"))
+# Per-model latency for the fake, so model routing can be exercised offline:
+# "gemini-2.5-flash=lognormal:2,0.3;gemini-2.5-flash-lite=lognormal:0.8,0.3"
+DEFAULT_FAKE_MODEL_LATENCIES = dict(
+    part.split("=", 1) for part in os.getenv("FAKE_LLM_MODEL_LATENCIES", "").split(";") if "=" in part)
+
+def backend_requires_api_key(backend: str) -> bool:
+    return backend in ("gemini", "record")
+
+class _Response:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+class SimulatedLLMError(Exception):
+    """Stands in for a transient API failure (timeouts, 429/503)."""
+
+class ReplayMissError(Exception):
+    """The recording has no call with this prompt."""
+
+def prompt_kind(prompt: str) -> str:
+    """Recovers the prompt type from the static prefix the PromptBuilder put first."""
+    for prefix, kind in ((STORY_GENERATOR_PREFIX, "StoryGenerator"), (WORLD_BUILDER_RULES, "WorldBuilder"),
+                         (INTERACTION_RULES, "Interaction"), (RESPONSE_BANK_RULES, "ResponseBank"),
+                         (OPENING_LINES_RULES, "OpeningLines")):
+        if prompt.startswith(prefix):
+            return kind
+    return "Unknown"
+
+def _prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+# ================= LATENCY PROFILES ================= #
+class LatencyProfile:
+    """
+    Parsed from "fixed:S", "uniform:LO,HI", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA"
+    (seconds). An optional ";tail=P,X" multiplies a fraction P of samples by X, e.g.
+    "lognormal:0.8,0.3;tail=0.02,6" for a 2% slow tail.
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        body, _, tail = spec.partition(";tail=")
+        self.kind, _, params = body.partition(":")
+        self.params = [float(p) for p in params.split(",") if p]
+        self.tail_rate, self.tail_factor = (float(p) for p in tail.split(",")) if tail else (0.0, 1.0)
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == "normal":
+            value = rng.gauss(self.params[0], self.params[1])
+        else:
+            value = self.params[0] * rng.lognormvariate(0.0, self.params[1])
+        if self.tail_rate and rng.random() < self.tail_rate:
+            value *= self.tail_factor
+        return max(0.0, value)
+
+# ================= FAKE MODEL ================= #
+class FakeModel:
+    """
+    Offline stand-in that answers every prompt type with schema-valid JSON. Content is a
+    pure function of (seed, prompt), so the same game replays identically; latency,
+    errors and malformed output are drawn from a separate seeded stream.
+    """
+
+    def __init__(self, latency: str = DEFAULT_FAKE_LATENCY, error_rate: float = DEFAULT_FAKE_ERROR_RATE,
+                 malformed_rate: float = DEFAULT_FAKE_MALFORMED_RATE, num_nodes: int = DEFAULT_FAKE_NODES,
+                 seed: int = DEFAULT_FAKE_SEED):
+        self.latency = LatencyProfile(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.num_nodes = num_nodes
+        self.seed = seed
+        self._faults = random.Random(seed)
+        self.calls = defaultdict(int)
+
+    # --- content ---
+    def reply(self, prompt: str) -> str:
+        kind = prompt_kind(prompt)
+        self.calls[kind] += 1
+        rng = random.Random(f"{self.seed}:{_prompt_key(prompt)}")
+        builders = {
+            "StoryGenerator": self._story,
+            "WorldBuilder": self._quest_network,
+            "Interaction": self._interaction,
+            "ResponseBank": self._response_bank,
+            "OpeningLines": self._opening_lines,
+        }
+        builder = builders.get(kind)
+        return json.dumps(builder(prompt, rng) if builder else {})
+
+    def _story(self, prompt, rng):
+        match = re.search(r"A list of (\d+) unique", prompt)
+        count = int(match.group(1)) if match else 3
+        places = ["Old Mill", "Chapel Crypt", "Dry Well", "Salt Barn", "Bell Tower", "Root Cellar", "Quarry Pit", "Ferry House"]
+        rng.shuffle(places)
+        locations = places[:count]
+        return {
+            "story_theme": rng.choice([
+                "The elders trade outsiders' memories to keep their own from fading.",
+                "A fungus beneath the chapel binds the villagers into one quiet mind.",
+                "The river spirit takes one traveller every harvest in exchange for rain.",
+            ]),
+            "inaccessible_locations": locations,
+            "correct_location": rng.choice(locations),
+        }
+
+    def _quest_network(self, prompt, rng):
+        location = re.search(r"The correct location is: \*\*(.+?)\*\*", prompt)
+        location = location.group(1) if location else "the chapel"
+        node_count = self.num_nodes
+        if not node_count:
+            match = re.search(r"Generate a network of \*\*(\d+)", prompt)
+            node_count = int(match.group(1)) if match else 25
+        match = re.search(r"exactly (\d+) nodes\*\* as `key_clue: true`", prompt)
+        key_clues = min(node_count, int(match.group(1)) if match else 3)
+        # The final clue always points at the correct location and counts as one of the key clues.
+        key_indices = set(rng.sample(range(node_count - 1), key_clues - 1))
+        nodes = []
+        for i in range(node_count):
+            villager = VILLAGER_ROSTER[i % len(VILLAGER_ROSTER)]
+            final = i == node_count - 1
+            preconditions = [f"node{rng.randrange(1, i + 1)}"] if i and rng.random() < 0.4 else []
+            nodes.append({
+                "node_id": f"node{i + 1}",
+                "villager_name": villager["name"],
+                "content": (f"{villager['name']} saw lantern light moving toward {location} the night your friends vanished."
+                            if final else f"{villager['name']} remembers something odd near {villager['location']}."),
+                "type": "Information" if final or rng.random() < 0.7 else "TalkToVillager",
+                "priority": 5 if final else rng.randint(1, 5),
+                "key_clue": final or i in key_indices,
+                "preconditions": preconditions,
+                "required_familiarity": rng.choice([None, None, 1, 2, 3]),
+            })
+        return {"nodes": nodes}
+
+    def _interaction(self, prompt, rng):
+        familiarity = re.search(r"- Familiarity level: (\d+)", prompt)
+        familiarity = int(familiarity.group(1)) if familiarity else 0
+        node = None
+        if _TURN_OBJECTIVES["CAN_REVEAL"] in prompt:
+            match = re.search(r"- Current clue node \(if any\): (\{.*\})$", prompt, re.MULTILINE)
+            node = json.loads(match.group(1)) if match else None
+        closing = _CLOSING_JSON_TASK in prompt
+        if node:
+            dialogue = f"Listen closely. {node.get('content', '')}"
+        elif closing:
+            dialogue = rng.choice(["I've nothing more for you today. Mind the mist.", "Not now, stranger. Perhaps another time."])
+        else:
+            dialogue = rng.choice(["The mist rolls in early these days.", "You ask a lot of questions for a stranger."])
+        responses = ["Goodbye for now."] if closing else rng.sample(
+            ["Ask about the chapel.", "Ask who else might know.", "Ask about the mist.", "Goodbye."], rng.randint(1, 3))
+        return {
+            "npc_dialogue": dialogue,
+            "player_responses": responses,
+            "node_revealed_id": node.get("node_id") if node else None,
+            "new_familiarity_level": min(5, familiarity + 1),
+        }
+
+    def _response_bank(self, prompt, rng):
+        lines = re.search(r"Write \*\*(\d+) lines\*\*", prompt)
+        lines = int(lines.group(1)) if lines else 3
+        def band(name, kind, level):
+            return [{"npc_dialogue": f"{name} shakes their head ({kind}, {level}, {i + 1}). The mist is thick tonight.",
+                     "player_response": "Goodbye for now."} for i in range(lines)]
+        return {"villagers": [
+            {"name": v["name"], **{kind: {level: band(v["name"], kind, level) for level in ("low", "mid", "high")}
+                                   for kind in ("farewell", "not_yet")}}
+            for v in VILLAGER_ROSTER
+        ]}
+
+    def _opening_lines(self, prompt, rng):
+        return {"villagers": [
+            {"name": v["name"], "npc_dialogue": f"I'm {v['name']}. Not many strangers find their way here.",
+             "player_responses": ["Nice to meet you.", "What happened here?"], "new_familiarity_level": 1}
+            for v in VILLAGER_ROSTER
+        ]}
+
+    # --- faults and timing ---
+    def _draw(self):
+        """(latency, fail, malformed) for one call."""
+        return (self.latency.sample(self._faults), self._faults.random() < self.error_rate,
+                self._faults.random() < self.malformed_rate)
+
+    def _malform(self, text: str) -> str:
+        cut = self._faults.choice(["truncate", "fence", "prose"])
+        if cut == "truncate":
+            return text[: max(1, len(text) // 2)]
+        if cut == "fence":
+            return "```json\n" + text
+        return "Sure! Here is the JSON you asked for: " + text
+
+    def _result(self, prompt, fail, malformed):
+        if fail:
+            raise SimulatedLLMError("503 Simulated backend error")
+        text = self.reply(prompt)
+        return self._malform(text) if malformed else text
+
+    def generate_content(self, prompt, generation_config=None):
+        latency, fail, malformed = self._draw()
+        time.sleep(latency)
+        return _Response(self._result(prompt, fail, malformed))
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        latency, fail, malformed = self._draw()
+        if stream:
+            return self._stream(prompt, latency, fail, malformed)
+        await asyncio.sleep(latency)
+        return _Response(self._result(prompt, fail, malformed))
+
+    async def _stream(self, prompt, latency, fail, malformed, chunk_size: int = 16):
+        # A fifth of the latency goes to the first chunk, the rest is spread evenly.
+        await asyncio.sleep(latency * 0.2)
+        text = self._result(prompt, fail, malformed)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        per_chunk = latency * 0.8 / max(1, len(chunks))
+        for chunk in chunks:
+            yield _Response(chunk)
+            await asyncio.sleep(per_chunk)
+
+# ================= RECORD / REPLAY ================= #
+class _RecordingWriter:
+    """Appends queued lines to one recording file from a background thread, in call order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="llm-recording-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def put(self, line: str):
+        self._queue.put(line)
+
+    def _run(self):
+        f = None
+        while True:
+            lines = [self._queue.get()]
+            while not self._queue.empty():
+                lines.append(self._queue.get_nowait())
+            try:
+                if f is None:
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write("".join(lines))
+                f.flush()
+            except OSError as e:
+                print(f"--- WARNING: Dropped {len(lines)} recorded LLM calls, write to {self.path} failed: {e} ---")
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every line queued so far is in the file."""
+        self._queue.join()
+
+_recording_writers = {}
+_recording_writers_lock = threading.Lock()
+
+def _recording_writer(path: str) -> _RecordingWriter:
+    # Shared per file: every routed model's recorder appends to the same recording.
+    with _recording_writers_lock:
+        writer = _recording_writers.get(path)
+        if writer is None:
+            writer = _recording_writers[path] = _RecordingWriter(path)
+        return writer
+
+class RecordingModel:
+    """
+    Wraps a model and appends every call (prompt hash, output, timing, errors) to a JSONL
+    file. Records are written by a background thread; `flush()` waits for them.
+    """
+
+    def __init__(self, inner, path: str = DEFAULT_RECORDING_PATH, model_name: str = None):
+        self.inner = inner
+        self.path = path
+        self.model_name = model_name
+        self._writer = _recording_writer(path)
+
+    def _write(self, record: dict):
+        self._writer.put(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._writer.flush()
+
+    def _record(self, prompt, stream, start, text=None, chunks=None, error=None):
+        record = {"key": _prompt_key(prompt), "kind": prompt_kind(prompt), "model": self.model_name,
+                  "stream": stream, "latency_s": round(time.perf_counter() - start, 4)}
+        if error is not None:
+            record["error"] = error
+        elif stream:
+            record["chunks"] = chunks
+        else:
+            record["text"] = text
+        self._write(record)
+
+    def generate_content(self, prompt, generation_config=None):
+        start = time.perf_counter()
+        try:
+            response = self.inner.generate_content(prompt, generation_config=generation_config)
+        except Exception as e:
+            self._record(prompt, False, start, error=str(e))
+            raise
+        self._record(prompt, False, start, text=response.text)
+        return response
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        start = time.perf_counter()
+        if stream:
+            return self._stream(prompt, generation_config, start)
+        try:
+            response = await self.inner.generate_content_async(prompt, generation_config=generation_config)
+        except Exception as e:
+            self._record(prompt, False, start, error=str(e))
+            raise
+        self._record(prompt, False, start, text=response.text)
+        return response
+
+    async def _stream(self, prompt, generation_config, start):
+        chunks = []
+        try:
+            response = await self.inner.generate_content_async(prompt, generation_config=generation_config, stream=True)
+            async for chunk in response:
+                chunks.append([round(time.perf_counter() - start, 4), chunk.text])
+                yield chunk
+        except Exception as e:
+            self._record(prompt, True, start, error=str(e))
+            raise
+        self._record(prompt, True, start, chunks=chunks)
+
+class ReplayModel:
+    """
+    Serves a recording made by RecordingModel, whichever model each call was routed to.
+    Calls with the same prompt are replayed in recorded order (the last one repeats once
+    they run out); recorded errors are raised again. With timing="recorded" the original
+    latencies, including chunk spacing, are reproduced; "instant" skips them.
+    """
+
+    def __init__(self, path: str = DEFAULT_RECORDING_PATH, timing: str = DEFAULT_REPLAY_TIMING):
+        self.path = path
+        self.timing = timing
+        self._records = defaultdict(list)
+        self._cursors = defaultdict(int)
+        self.misses = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[(record["key"], record["stream"])].append(record)
+
+    def _next(self, prompt, stream):
+        ident = (_prompt_key(prompt), stream)
+        records = self._records.get(ident)
+        if not records:
+            self.misses += 1
+            raise ReplayMissError(f"No recorded {prompt_kind(prompt)} call for this prompt in {self.path}")
+        index = min(self._cursors[ident], len(records) - 1)
+        self._cursors[ident] += 1
+        return records[index]
+
+    def generate_content(self, prompt, generation_config=None):
+        record = self._next(prompt, False)
+        if self.timing == "recorded":
+            time.sleep(record["latency_s"])
+        if "error" in record:
+            raise SimulatedLLMError(record["error"])
+        return _Response(record["text"])
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        record = self._next(prompt, stream)
+        if stream:
+            return self._stream(record)
+        if self.timing == "recorded":
+            await asyncio.sleep(record["latency_s"])
+        if "error" in record:
+            raise SimulatedLLMError(record["error"])
+        return _Response(record["text"])
+
+    async def _stream(self, record):
+        elapsed = 0.0
+        for offset, text in record.get("chunks", []):
+            if self.timing == "recorded":
+                await asyncio.sleep(max(0.0, offset - elapsed))
+                elapsed = offset
+            yield _Response(text)
+        if "error" in record:
+            raise SimulatedLLMError(record["error"])
+
+_replay_models = {}
+
+def create_model(backend: str, api_key: str = None, model_name: str = DEFAULT_GEMINI_MODEL):
+    if backend in ("gemini", "record"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(model_name)
+        return RecordingModel(model, model_name=model_name) if backend == "record" else model
+    if backend == "fake":
+        return FakeModel(latency=DEFAULT_FAKE_MODEL_LATENCIES.get(model_name, DEFAULT_FAKE_LATENCY))
+    if backend == "replay":
+        # One recording serves every model name, with a single cursor per prompt.
+        if DEFAULT_RECORDING_PATH not in _replay_models:
+            _replay_models[DEFAULT_RECORDING_PATH] = ReplayModel()
+        return _replay_models[DEFAULT_RECORDING_PATH]
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
@@ -1,18 +1,77 @@
 # game_logic/llm_calls.py
-# Contains the GeminiAPI class and all prompt engineering logic.
-
-import json
-import google.generativeai as genai
+# Contains the GeminiAPI class. Prompt text lives in prompt_builder.py.
+
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from .prompt_builder import PromptBuilder
+from .llm_backends import DEFAULT_LLM_BACKEND, create_model
+from .resilience import ResilientCaller, CircuitOpenError, MalformedOutputError, validate_output
+from .model_router import ModelRouter
+from .metrics import (
+    hot_path, LLM_ATTEMPT_SECONDS, LLM_CALL_SECONDS, LLM_PROMPT_TOKENS, LLM_RESPONSE_TOKENS, LLM_PARSE_FAILURES,
+)
+from .stats import estimate_tokens
+
+# Upper bound on Gemini calls in flight at once per process. Requests beyond this
+# wait on the semaphore instead of piling onto the API and tripping rate limits.
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
 
 class GeminiAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, max_concurrency: int = None, backend: str = None):
+        self.backend = backend or DEFAULT_LLM_BACKEND
+        self._api_key = api_key
+        self.router = ModelRouter()
+        self._routed_models = {}
         try:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
-            print("✅ Gemini API configured successfully.")
+            self.model = create_model(self.backend, api_key, self.router.default_model)
+            print(f"✅ LLM backend '{self.backend}' configured successfully.")
         except Exception as e:
-            print(f"❌ Error configuring Gemini API: {e}")
+            print(f"❌ Error configuring LLM backend '{self.backend}': {e}")
             self.model = None
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0  # Calls currently holding a concurrency slot
+        self.prompt_builder = PromptBuilder()
+        self.resilience = ResilientCaller(self._semaphore)
+
+    @asynccontextmanager
+    async def _slot(self):
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def free_slots(self) -> int:
+        """Concurrency slots no call is holding right now."""
+        return max(0, self.max_concurrency - self.in_flight)
+
+    def _model_for(self, model_name):
+        """`self.model` serves the default model; other routed models are created on first use."""
+        if model_name == self.router.default_model:
+            return self.model
+        model = self._routed_models.get(model_name)
+        if model is None:
+            model = self._routed_models[model_name] = create_model(self.backend, self._api_key, model_name)
+        return model
+
+    def _record_attempt(self, prompt_type, model_name, seconds, outcome):
+        self.router.record(prompt_type, model_name, seconds, outcome)
+        LLM_ATTEMPT_SECONDS.labels(prompt_type, model_name, outcome).observe(seconds)
+        if outcome == "malformed":
+            LLM_PARSE_FAILURES.labels(prompt_type).inc()
+
+    def _record_answer(self, prompt_type, model_name, seconds, text):
+        LLM_RESPONSE_TOKENS.labels(prompt_type).inc(estimate_tokens(text))
+        try:
+            validate_output(prompt_type, text)
+        except MalformedOutputError:
+            self._record_attempt(prompt_type, model_name, seconds, "malformed")
+            raise
+        self._record_attempt(prompt_type, model_name, seconds, "valid")
 
     def _clean_json_response(self, text_response):
         text_response = text_response.strip()
@@ -22,215 +81,101 @@ class GeminiAPI:
             text_response = text_response[:-3]
         return text_response.strip()
 
-    def generate_content(self, prompt_type, context):
-        if not self.model: return "{}"
-        print(f"\n--- 🤖 Live Gemini API Call ({prompt_type}) ---")
-        
-        prompts = {
-            "StoryGenerator": self._create_story_generator_prompt,
-            "WorldBuilder": self._create_world_builder_prompt,
-            "Interaction": self._create_interaction_prompt,
-        }
-        prompt = prompts.get(prompt_type, lambda _: "")(context)
-        if not prompt: 
+    def _build_prompt(self, prompt_type, context):
+        with hot_path("prompt_build"):
+            compiled = self.prompt_builder.build(prompt_type, context)
+        if compiled is None:
             print(f"--- ERROR: No prompt found for type '{prompt_type}' ---")
-            return "{}"
+            return ""
+        return compiled.text
+
+    async def generate_content_async(self, prompt_type, context, usage: dict = None):
+        """
+        Builds the prompt and calls the routed model without blocking the event loop. Goes through
+        the resilience policy (deadline, retries, hedging, circuit breaker) and returns "{}"
+        only once that gives up. If `usage` is given it receives estimated prompt_tokens
+        (before the call) and output_tokens.
+        """
+        if not self.model: return "{}"
+        print(f"\n--- 🤖 Live Gemini API Call ({prompt_type}, async) ---")
 
-        print("--- Sending Prompt to Gemini... (This may take a moment) ---")
+        prompt = self._build_prompt(prompt_type, context)
+        if not prompt:
+            return "{}"
+        prompt_tokens = estimate_tokens(prompt)
+        if usage is not None:
+            usage["prompt_tokens"] = prompt_tokens
+
+        difficulty = context.get("difficulty")
+
+        async def attempt():
+            # Routed per attempt, so retries and hedges move to the faster tier too.
+            model_name = self.router.route(prompt_type, difficulty)
+            model = self._model_for(model_name)
+            LLM_PROMPT_TOKENS.labels(prompt_type).inc(prompt_tokens)
+            async with self._slot():
+                start = time.perf_counter()
+                try:
+                    response = await model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"})
+                except Exception:
+                    self._record_attempt(prompt_type, model_name, time.perf_counter() - start, "error")
+                    raise
+            text = self._clean_json_response(response.text)
+            self._record_answer(prompt_type, model_name, time.perf_counter() - start, text)
+            return text
+
+        start = time.perf_counter()
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            return self._clean_json_response(response.text)
+            text = await self.resilience.call(prompt_type, attempt)
         except Exception as e:
+            LLM_CALL_SECONDS.labels(prompt_type, "failed").observe(time.perf_counter() - start)
             print(f"❌ An error occurred during the API call: {e}")
             return "{}"
+        LLM_CALL_SECONDS.labels(prompt_type, "ok").observe(time.perf_counter() - start)
+        if usage is not None:
+            usage["output_tokens"] = estimate_tokens(text)
+        return text
 
-    def _create_story_generator_prompt(self, context):
-        return f"""
-        You are a master storyteller and mystery writer for the game "Village of Echoes".
-
-        **The Fixed Premise:**
-        The player's story ALWAYS begins this way: Their car crashes in a mysterious forest after a tree falls. They awaken in the cottage of a kind old man, Arthur Hobbs lives northwest of the village. He tells them he found them unconscious but saw no sign of their friends. During their unconsciousness, the player heard a desperate, psychic cry from their friends: 'Help us... find us...' The game begins as the player steps outside to search the village.
-
-        **Your Task:**
-        Your job is to generate the secret, underlying mystery of the village that the player will uncover. You must create a unique reason for the friends' disappearance that fits the dark, psychological mystery theme of the game.
-
-        **10 Story Theme Examples for Inspiration:**
-        1. A sentient, ancient tree in the woods caused the crash to lure people in for a seasonal ritual.
-        2. The friends stumbled upon a hidden, Cold War-era government experiment in an old mine.
-        3. A parasitic fungus that creates a hive-mind has infected the village.
-        4. The village is trapped in a time loop, and the friends were taken by entities that maintain it.
-        5. The villagers are all ghosts, re-enacting their final days and want the friends to join them.
-        6. The village is a cult that worships a "founder" who promised them eternal life.
-        7. A rare, hallucinogenic flower in the valley traps the villagers in a collective delusion.
-        8. The psychic cry the player heard was a trap, created by a predatory entity that feeds on hope.
-        9. The villagers "harvest" memories from outsiders to keep their own fading memories alive.
-        10. There are no villagers. They are all constructs created by a single, powerful psychic child (Nia).
-
-        **Your Goal:**
-        Based on this premise and the examples, generate a NEW, unique JSON object with three keys:
-        1.  `story_theme`: A string describing the core secret of the village for this playthrough.
-        2.  `inaccessible_locations`: A list of {context['num_inaccessible_locations']} unique, thematic location names you invented that tie into your new story theme, the names shouldn't absurd of fancy ones, generate the simple ones only.
-        3.  `correct_location`: A string containing one of the names from your `inaccessible_locations` list where the friends are actually being held.
-
-        Output ONLY the raw JSON object.
+    async def generate_content_stream_async(self, prompt_type, context):
         """
-
-    def _create_world_builder_prompt(self, context):
-        difficulty = context.get('difficulty', 'Medium')
-        if difficulty == 'Very Easy':
-            node_count = "8"
-            key_clue_count = 2
-            final_clue_instruction = "The final clue must be extremely direct and explicitly state where to go."
-            difficulty_instructions = "Clues must be direct and obvious. Avoid riddles or metaphors."
-            type_instruction = "Generate **exactly 2 nodes** of type 'TalkToVillager' to guide the player. The rest should be 'Information'."
-        elif difficulty == 'Easy':
-            node_count = "15-20"
-            key_clue_count = 3
-            final_clue_instruction = "The final clue should be a strong hint, making the answer clear."
-            difficulty_instructions = "Clues should be mostly straightforward."
-            type_instruction = "You may use a mix of 'Information' and 'TalkToVillager' nodes."
-        elif difficulty == 'Hard':
-            node_count = "35-40"
-            key_clue_count = 6
-            final_clue_instruction = "The final clue must be extremely cryptic, requiring significant deduction."
-            difficulty_instructions = "Clues must be cryptic and often misleading. Use riddles and metaphors."
-            type_instruction = "Create a complex web using many 'TalkToVillager' nodes to interconnect clues."
-        else: # Medium
-            node_count = "25-30"
-            key_clue_count = 4
-            final_clue_instruction = "The final clue must be cryptic. Do not state the answer directly."
-            difficulty_instructions = "Clues should require some thought and interpretation."
-            type_instruction = "Create a web-like structure with a good mix of 'Information' and 'TalkToVillager' nodes."
-
-        return f"""
-        You are a world-class narrative designer generating a "Quest Network" for the game "Village of Echoes".
-
-        The correct location is: **{context['correctLocation']}**.
-        The difficulty is: **{difficulty.upper()}**.
-        The core secret of the village is: **{context['story_theme']}**
-
-        **Guiding Principles:**
-        - **Clarity of Content is Paramount:** The `content` field must be written to be as clear as possible for the player.
-            - If `type` is `Information`, the `content` is a direct clue the player learns with complete brief of clue history, direction and reason.
-            - If `type` is `TalkToVillager`, the `content` **MUST** explicitly name the villager to talk to and give a clear reason and also where they will be found/ are. **Bad example:** 'The river holds many secrets.' **Good example:** 'You should go speak with Old Mara by the river; she knows things about the recent disappearances.'
-        - **Character-Driven:** Clues must originate from the villager's personality and their role in the secret.
-        - **Difficulty:** {difficulty_instructions}
-
-        **Node Structure:**
-        -   `node_id`: A simple, unique, sequential string, like "node1", "node2", "node3", etc.
-        -   `villager_name`: Who provides this node.
-        -   `content`: The core information or clue, written according to the Clarity of Content principle.
-        -   `type`: "Information" or "TalkToVillager".
-        -   `priority`: Importance order (1=Minor, 5=Major), higher the priority it should be given considered first for the story.
-        -   `key_clue`: A boolean (true/false).
-        -   `preconditions`: List of `node_id` strings required.
-        -   `required_familiarity`: An integer from 1-5, or `null`.
-
-        **Generation Requirements ({difficulty.upper()}):**
-        -   Generate a network of **{node_count} nodes**.
-        -   Designate **exactly {key_clue_count} nodes** as `key_clue: true`.
-        -   {type_instruction}
-        -   **{final_clue_instruction}**
-
-        **Game Data for Context:**
-        -   Villagers: {json.dumps(context['villagers'], indent=2)}
-
-        Output ONLY the raw JSON object containing the "nodes" list.
-        """
-
-     # ================= INTERACTION ================= #
-    def _create_interaction_prompt(self, context):
-        conversational_status = context.get('conversational_status')
-        context_node = context.get('context_node')
-        turn_objective = ""
-        
-        json_task_instruction = "Generate a JSON object with: npc_dialogue (string), player_responses (list of 1–3 options), node_revealed_id (string or null), new_familiarity_level (0–5)."
-
-        if conversational_status == "PERMANENTLY_EXHAUSTED":
-            turn_objective = "You can no longer provide new clues. Deliver a final, reflective farewell."
-            json_task_instruction = "Generate a JSON object with: npc_dialogue (string), player_responses (EXACTLY ONE polite closing option), node_revealed_id (null), new_familiarity_level (0–5)."
-        elif conversational_status == "HAS_LOCKED_CLUES":
-            turn_objective = "You cannot yet reveal a clue. Hint gently why (trust, timing, secrecy) and end politely."
-            json_task_instruction = "Generate a JSON object with: npc_dialogue (string), player_responses (EXACTLY ONE polite closing option), node_revealed_id (null), new_familiarity_level (0–5)."
-        elif conversational_status == "CAN_REVEAL":
-            turn_objective = "MANDATORY: Reveal the current clue NOW. Integrate the content naturally into your dialogue, and set node_revealed_id. This is not optional."
-
-        return f"""
-        You are both a **villager actor** and a **game director** in the horror game "Village of Echoes".  
-        Your goal: deliver immersive dialogue that feels authentic *while progressing the game*.  
-
-        --- DIRECTOR'S RULES (Unbreakable) ---
-        1. Roleplay naturally as {context['villagerProfile']['name']}.  
-        2. Stay immersive: Do NOT break character or mention the "game system."  
-        3. Never mention the player's "friends" unless the player explicitly brings them up.  
-        4. Keep responses smooth and natural: ~2 sentences, with tone matching the villager.  
-        5. Adjust tone based on familiarity level: {context['familiarity_level']} ({context['familiarity_description']}).  
-           - If "Unknown", introduce yourself naturally.  
-        6. Do not repeat information the player already knows: `{context['player_knowledge_summary']}`.  
-        7. If a clue is revealed, weave it in *naturally with flavor*, not as a raw fact dump.
-
-        **NOTE: Whenver mentioned this is the staring prompt of the conversation, then just introduce yourself if familarity:Unknown or talk about the recent thing that you discoverd with that villager from the knowledges-summary**
-
-        --- HOW TO REPLY (Concrete patterns and expectations) ---
-        Follow these reply patterns exactly — they describe *how* your npc_dialogue, suggestions, and player_responses should be structured:
-
-        1) VOICE + LENGTH
-           - Speak *in-character* and briefly (1–2 sentences). Use contractions and small quirks that match the villager's profile.
-           - Never narrate like an omniscient storyteller (avoid "The moss is important because..."). Use personal observations, gossip, or memory instead.
-           Example: "That moss chills me—I've seen children staring at it at dusk, eyes half-closed, like they heard a lullaby."
-
-        2) UNKNOWN FAMILIARITY
-           - If familiarity == "Unknown", begin with a short introduction: name + relation to village + one-line signal of trust or suspicion.
-           Example: "I'm Arthur, I cut wood here. I don't like to meddle, but you'll want to hear this."
-
-        3) CLUE TONE & CONTENT (Hints)
-           - When hinting (not fully revealing), include:
-             a) A sensory detail (smell, sound, sight) or small scene,
-             b) Why it matters for the story,
-             c) One concrete next action (who to talk to OR where to search).
-           Example pattern: "<sensory detail>. It suggests <why it matters>. You should <next action>."
-
-        4) CLUE REVELATION (CAN_REVEAL rule)
-           - MUST integrate the exact `content` from the `context_node` naturally into npc_dialogue (do not paste raw JSON).
-           - After revealing, give **1–2 concrete next actions** (specific villager names or locations) the player can take to follow up.
-           - Provide 1–3 player_responses that map directly to those actions (or to a polite closing).
-           Example: "\"That torn ribbon in the chapel—I've seen it on the tailor's counter.\" → Next actions: ask the tailor / search the chapel loft."
-
-        5) GUIDANCE WHEN STUCK
-           - If the player seems stuck, offer prioritized options (2–3), with a short reason for each (ranked by usefulness).
-           - Use phrasing like: "If you're unsure, first X (because...), otherwise Y."
-
-        6) HOSTILITY / BRIBES / EMOTIONAL STATES
-           - Hostile player: de-escalate, offer a guarded hint or refuse to help. Offer responses that let the player back down or press.
-           - Bribe/plea: consult `villagerProfile` morality/traits and act accordingly (accept with consequences, or refuse and give a hint).
-           - Frightened player: reassure and give a safe next step (e.g., "Find the doctor; he'll come with you.").
-
-        7) REPETITION & CLARIFICATION
-           - If the player repeats or asks for confirmation, restate only the new, useful piece of info (do NOT rehash everything).
-           - If asked "Where are my friends?" respond per status: reveal if allowed; otherwise give the best directional hint + next action.
-
-        8) EXHAUSTION / LOCKED CLUES
-           - PERMANENTLY_EXHAUSTED: provide a short, reflective farewell and EXACTLY ONE polite closing player option.
-           - HAS_LOCKED_CLUES: explain briefly why a clue can't be revealed (trust, danger, ritual), and provide EXACTLY ONE polite closing option.
-
-        9) FORMAT & FOLLOW-UP
-           - Always include 1–3 realistic `player_responses` (e.g., "Ask Old Mara by the river.", "Search the Ossified Grove.", "Goodbye.").
-           - Ensure any suggested action is actionable within the game (name a villager or a specific place/thing).
-           - If you suggest a search, indicate *what to look for* (e.g., "check under the millstones for footprints").
-    
-
-        --- BACKGROUND KNOWLEDGE ---
-        Current clue node (if any): {json.dumps(context_node)}
-
-        --- CONVERSATION HISTORY ---
-        {json.dumps(context['chatHistory'], indent=2)}
-
-        --- THIS TURN ---
-        - Objective: {turn_objective}  
-        - The player’s last line: "{context['player_last_response']}"
-
-        --- OUTPUT ---
-        {json_task_instruction}  
-
-        Respond ONLY with the raw JSON object.
+        Yields raw text chunks as Gemini produces them. Errors propagate to the caller. A
+        half-sent stream cannot be retried or hedged, so only the circuit breaker applies.
         """
+        if not self.model:
+            raise RuntimeError("Gemini model is not configured.")
+        print(f"\n--- 🤖 Live Gemini API Call ({prompt_type}, streaming) ---")
+
+        prompt = self._build_prompt(prompt_type, context)
+        if not prompt:
+            raise ValueError(f"No prompt found for type '{prompt_type}'")
+        breaker = self.resilience.breaker
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open, {prompt_type} stream rejected")
+
+        model_name = self.router.route(prompt_type, context.get("difficulty"))
+        model = self._model_for(model_name)
+        LLM_PROMPT_TOKENS.labels(prompt_type).inc(estimate_tokens(prompt))
+        parts = []
+        start = time.perf_counter()
+        try:
+            async with self._slot():
+                start = time.perf_counter()
+                response = await model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"}, stream=True)
+                async for chunk in response:
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+        except (GeneratorExit, asyncio.CancelledError):
+            breaker.release()  # Abandoned by the client, not failed.
+            raise
+        except Exception:
+            breaker.record_failure()
+            self._record_attempt(prompt_type, model_name, time.perf_counter() - start, "error")
+            LLM_CALL_SECONDS.labels(prompt_type, "failed").observe(time.perf_counter() - start)
+            raise
+        breaker.record_success()
+        LLM_CALL_SECONDS.labels(prompt_type, "ok").observe(time.perf_counter() - start)
+        try:
+            self._record_answer(prompt_type, model_name, time.perf_counter() - start, self._clean_json_response("".join(parts)))
+        except MalformedOutputError:
+            pass  # Counted against the model; the caller reports its own parse failure.
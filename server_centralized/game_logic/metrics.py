@@ -0,0 +1,229 @@
+# game_logic/metrics.py
+# Dependency-free Prometheus metrics. Recording is a dict lookup, a bisect and two adds, so
+# it stays on under full load; gauges are callbacks evaluated only when /metrics is scraped.
+# Output follows the Prometheus text exposition format (version 0.0.4).
+
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+HOT_PATH_BUCKETS = (1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 1e-2)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self.header()
+        for values, child in self._children.items():
+            lines.append(f"{self.name}{_label_text(self.labelnames, values)} {_number(child.value)}")
+        return lines
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        return _HistogramTimer(self)
+
+class _HistogramTimer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self.header()
+        bucket_names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(bucket_names, values + (_number(bound),))} {cumulative}")
+            labels = _label_text(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Gauge(_Metric):
+    """Read at scrape time from `callback()`, which returns a number or {label values tuple: number}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def render(self):
+        lines = self.header()
+        value = self.callback()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for values, number in samples:
+            if number is not None:
+                lines.append(f"{self.name}{_label_text(self.labelnames, values)} {_number(number)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        return self.register(Gauge(name, help_text, callback, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken gauge must not take the whole scrape down.
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+LLM_ATTEMPT_SECONDS = REGISTRY.histogram(
+    "llm_attempt_duration_seconds", "Latency of single model attempts.", ("prompt_type", "model", "outcome"), LLM_BUCKETS)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "llm_call_duration_seconds", "Latency of whole LLM calls, retries and hedges included.", ("prompt_type", "outcome"), LLM_BUCKETS)
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "llm_prompt_tokens_total", "Estimated prompt tokens sent, per attempt.", ("prompt_type",))
+LLM_RESPONSE_TOKENS = REGISTRY.counter(
+    "llm_response_tokens_total", "Estimated response tokens received, per attempt.", ("prompt_type",))
+LLM_PARSE_FAILURES = REGISTRY.counter(
+    "llm_json_parse_failures_total", "Model answers that were not the expected JSON.", ("prompt_type",))
+HOT_PATH_SECONDS = REGISTRY.histogram(
+    "engine_hot_path_duration_seconds", "Time spent in the engine's per-turn hot paths.", ("path",), HOT_PATH_BUCKETS)
+
+class HTTPMetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering) recording one latency
+    observation per HTTP request, labelled with the route template rather than the raw path
+    so game IDs do not create new series. Streaming responses are timed to their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._templates = None  # endpoint -> route path, built on first request
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._templates is None:
+            self._templates = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._templates.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], self._route(scope), status).observe(time.perf_counter() - start)
+
+def hot_path(name: str):
+    """Timer for one engine hot path: `with hot_path("clue_status"): ...`"""
+    return HOT_PATH_SECONDS.labels(name).time()
+
+def render() -> str:
+    return REGISTRY.render()
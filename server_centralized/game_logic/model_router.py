@@ -0,0 +1,165 @@
+# game_logic/model_router.py
+# Chooses which model serves each LLM attempt. Routes are configured per prompt type and
+# optionally per difficulty; when the routed model's recent latency for a prompt type goes
+# over that type's budget, attempts move to its faster tier until it recovers.
+
+import os
+import time
+from collections import deque
+from .stats import LatencyTracker
+from .llm_backends import DEFAULT_GEMINI_MODEL
+
+def parse_routes(spec: str) -> dict:
+    """
+    "WorldBuilder:Hard=gemini-2.5-flash,Interaction=gemini-2.5-flash-lite" ->
+    {("WorldBuilder", "Hard"): "gemini-2.5-flash", ("Interaction", None): "gemini-2.5-flash-lite"}
+    """
+    routes = {}
+    for part in spec.split(","):
+        target, _, model = part.partition("=")
+        if not target.strip() or not model.strip():
+            continue
+        prompt_type, _, difficulty = target.strip().partition(":")
+        routes[(prompt_type, difficulty or None)] = model.strip()
+    return routes
+
+def _parse_pairs(spec: str) -> dict:
+    return dict(part.strip().split("=", 1) for part in spec.split(",") if "=" in part)
+
+DEFAULT_MODEL_ROUTES = parse_routes(os.getenv("LLM_MODEL_ROUTES", ""))
+# Model -> faster model to fall back to when it is over budget.
+DEFAULT_MODEL_TIERS = _parse_pairs(os.getenv("LLM_MODEL_TIERS", ""))
+# Prompt type -> seconds; the routed model's p90 attempt latency must stay under it.
+DEFAULT_LATENCY_BUDGETS = {k: float(v) for k, v in _parse_pairs(os.getenv(
+    "LLM_LATENCY_BUDGETS", "StoryGenerator=10,WorldBuilder=30,Interaction=4,ResponseBank=20,OpeningLines=15")).items()}
+DEFAULT_BUDGET_PERCENTILE = float(os.getenv("LLM_BUDGET_PERCENTILE", "90"))
+# While downgraded, every Nth attempt still goes to the routed model so recovery is noticed.
+DEFAULT_PROBE_EVERY = int(os.getenv("LLM_ROUTER_PROBE_EVERY", "5"))
+
+class _ModelStats:
+    """One model serving one prompt type."""
+
+    def __init__(self, window: int):
+        self.attempts = 0
+        self.valid = 0
+        self.malformed = 0
+        self.errors = 0
+        self.latency = LatencyTracker()
+        self.recent = LatencyTracker(window=window)  # Short window that drives downgrade decisions
+
+    def summary(self) -> dict:
+        answered = self.valid + self.malformed
+        return {
+            "attempts": self.attempts,
+            "valid": self.valid,
+            "malformed": self.malformed,
+            "errors": self.errors,
+            "valid_rate": round(self.valid / answered, 4) if answered else None,
+            "latency": self.latency.summary(),
+        }
+
+class ModelRouter:
+    def __init__(self, default_model: str = DEFAULT_GEMINI_MODEL, routes: dict = None, tiers: dict = None,
+                 latency_budgets: dict = None, budget_percentile: float = DEFAULT_BUDGET_PERCENTILE,
+                 probe_every: int = DEFAULT_PROBE_EVERY, min_samples: int = 10, recovery_samples: int = 5,
+                 window: int = 50, decision_log: int = 50):
+        self.default_model = default_model
+        self.routes = DEFAULT_MODEL_ROUTES if routes is None else routes
+        self.tiers = DEFAULT_MODEL_TIERS if tiers is None else tiers
+        self.latency_budgets = DEFAULT_LATENCY_BUDGETS if latency_budgets is None else latency_budgets
+        self.budget_percentile = budget_percentile
+        self.probe_every = probe_every
+        self.min_samples = min_samples
+        self.recovery_samples = recovery_samples
+        self.window = window
+        self._models = {}  # (prompt_type, model) -> _ModelStats
+        self._decisions = {}  # (prompt_type, model, reason) -> count
+        self._downgraded = {}  # (prompt_type, model) -> attempts routed since the downgrade began
+        self.recent_decisions = deque(maxlen=decision_log)
+
+    def primary(self, prompt_type: str, difficulty: str = None) -> str:
+        return (self.routes.get((prompt_type, difficulty))
+                or self.routes.get((prompt_type, None))
+                or self.routes.get(("*", None))
+                or self.default_model)
+
+    def _stats_for(self, prompt_type: str, model: str) -> _ModelStats:
+        key = (prompt_type, model)
+        stats = self._models.get(key)
+        if stats is None:
+            stats = self._models[key] = _ModelStats(self.window)
+        return stats
+
+    def _recent_percentile(self, prompt_type: str, model: str, min_samples: int, last: int = None):
+        """Budget percentile over the recent window (or only its `last` samples), once there are enough."""
+        stats = self._models.get((prompt_type, model))
+        if stats is None or len(stats.recent.samples) < min_samples:
+            return None
+        samples = list(stats.recent.samples)
+        if last:
+            samples = samples[-last:]
+        samples.sort()
+        return samples[min(len(samples) - 1, int(round(self.budget_percentile / 100.0 * (len(samples) - 1))))]
+
+    def route(self, prompt_type: str, difficulty: str = None) -> str:
+        model = self.primary(prompt_type, difficulty)
+        reason = "route"
+        fallback = self.tiers.get(model)
+        budget = self.latency_budgets.get(prompt_type)
+        if fallback and budget is not None:
+            key = (prompt_type, model)
+            calls = self._downgraded.get(key)
+            if calls is None:
+                latency = self._recent_percentile(prompt_type, model, self.min_samples)
+                if latency is not None and latency > budget:
+                    calls = 0
+            else:
+                # Recovery is judged on the latest probes only, and the slow samples are then
+                # dropped so they cannot trip the downgrade again straight away.
+                latency = self._recent_percentile(prompt_type, model, self.recovery_samples, last=self.recovery_samples)
+                if latency is not None and latency <= budget:
+                    calls, reason = None, "recovered"
+                    self._models[key].recent.samples.clear()
+            if calls is None:
+                self._downgraded.pop(key, None)
+            else:
+                calls += 1
+                self._downgraded[key] = calls
+                if calls % self.probe_every:
+                    model, reason = fallback, "over_budget"
+                else:
+                    reason = "probe"
+        key = (prompt_type, model, reason)
+        self._decisions[key] = self._decisions.get(key, 0) + 1
+        if reason != "route":
+            self.recent_decisions.append({"at": round(time.time(), 3), "prompt_type": prompt_type,
+                                          "difficulty": difficulty, "model": model, "reason": reason})
+        return model
+
+    def record(self, prompt_type: str, model: str, seconds: float, outcome: str):
+        """outcome is "valid", "malformed" or "error"; only answers count towards latency."""
+        stats = self._stats_for(prompt_type, model)
+        stats.attempts += 1
+        if outcome == "error":
+            stats.errors += 1
+            return
+        if outcome == "valid":
+            stats.valid += 1
+        else:
+            stats.malformed += 1
+        stats.latency.record(seconds)
+        stats.recent.record(seconds)
+
+    def stats(self) -> dict:
+        models = {}
+        for (prompt_type, model), stats in self._models.items():
+            models.setdefault(model, {})[prompt_type] = stats.summary()
+        decisions = {}
+        for (prompt_type, model, reason), count in self._decisions.items():
+            decisions.setdefault(prompt_type, {}).setdefault(model, {})[reason] = count
+        return {
+            "downgraded": [f"{prompt_type}/{model}" for prompt_type, model in self._downgraded],
+            "decisions": decisions,
+            "models": models,
+            "recent_decisions": list(self.recent_decisions),
+        }
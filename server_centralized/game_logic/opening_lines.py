@@ -0,0 +1,47 @@
+# game_logic/opening_lines.py
+# Every villager's first line of a game, written in one batched LLM call while the world
+# is built, so the first conversation with each villager starts without a model call.
+
+from .state_manager import MAX_FAMILIARITY
+
+# Player inputs that mean "start the conversation" rather than a specific question.
+OPENING_PROMPTS = frozenset({
+    "This is the starting prompt of the conversation.",
+    "I'd like to talk.",
+})
+
+def parse_opening_lines(data: dict, villagers) -> list:
+    """
+    One entry per roster index: (npc_dialogue, player_responses, new_familiarity_level),
+    or None where the model gave nothing usable for that villager.
+    """
+    openings = [None] * len(villagers)
+    for entry in data.get("villagers") or []:
+        index = villagers.index_of(entry.get("name")) if isinstance(entry, dict) else None
+        if index is None:
+            continue
+        dialogue = entry.get("npc_dialogue")
+        responses = [r for r in entry.get("player_responses") or [] if isinstance(r, str) and r.strip()]
+        if not isinstance(dialogue, str) or not dialogue.strip() or not responses:
+            continue
+        familiarity = entry.get("new_familiarity_level")
+        familiarity = int(familiarity) if isinstance(familiarity, (int, float)) else 1
+        openings[index] = (dialogue, tuple(responses[:3]), max(0, min(MAX_FAMILIARITY, familiarity)))
+    return openings
+
+class OpeningLineStats:
+    def __init__(self):
+        self.served = 0
+        self.fallbacks = 0
+        self.batches_built = 0
+        self.build_failures = 0
+
+    def stats(self) -> dict:
+        first_turns = self.served + self.fallbacks
+        return {
+            "served": self.served,
+            "llm_fallbacks": self.fallbacks,
+            "hit_rate": round(self.served / first_turns, 4) if first_turns else None,
+            "batches_built": self.batches_built,
+            "build_failures": self.build_failures,
+        }
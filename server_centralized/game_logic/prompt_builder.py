@@ -0,0 +1,377 @@
+# game_logic/prompt_builder.py
+# Compiles the StoryGenerator / WorldBuilder / Interaction prompts. Static rule text is
+# dedented and built once at import; per-villager persona sections are built once per
+# game; only the per-turn parts are rendered on each call, in compact JSON.
+
+import json
+import hashlib
+import textwrap
+from collections import OrderedDict
+from .stats import estimate_tokens
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def _block(text: str) -> str:
+    return textwrap.dedent(text).strip("\n")
+
+class CompiledPrompt:
+    """
+    A prompt split into a cacheable `prefix` and a per-call `dynamic` tail.
+
+    The prefix is byte-identical across every call that shares it (all StoryGenerator
+    calls, all WorldBuilder calls for a roster, all turns with one villager in one game),
+    so it can be registered once with provider-side context caching under `cache_key`.
+    """
+    __slots__ = ("prompt_type", "prefix", "dynamic", "cache_key")
+
+    def __init__(self, prompt_type: str, prefix: str, dynamic: str, cache_key: str):
+        self.prompt_type = prompt_type
+        self.prefix = prefix
+        self.dynamic = dynamic
+        self.cache_key = cache_key
+
+    @property
+    def text(self) -> str:
+        return self.prefix + "\n\n" + self.dynamic
+
+def _cache_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+# ================= STORY GENERATOR ================= #
+STORY_GENERATOR_PREFIX = _block("""
+    You are a master storyteller and mystery writer for the game "Village of Echoes".
+
+    **The Fixed Premise:**
+    The player's story ALWAYS begins this way: Their car crashes in a mysterious forest after a tree falls. They awaken in the cottage of a kind old man, Arthur Hobbs lives northwest of the village. He tells them he found them unconscious but saw no sign of their friends. During their unconsciousness, the player heard a desperate, psychic cry from their friends: 'Help us... find us...' The game begins as the player steps outside to search the village.
+
+    **Your Task:**
+    Your job is to generate the secret, underlying mystery of the village that the player will uncover. You must create a unique reason for the friends' disappearance that fits the dark, psychological mystery theme of the game.
+
+    **10 Story Theme Examples for Inspiration:**
+    1. A sentient, ancient tree in the woods caused the crash to lure people in for a seasonal ritual.
+    2. The friends stumbled upon a hidden, Cold War-era government experiment in an old mine.
+    3. A parasitic fungus that creates a hive-mind has infected the village.
+    4. The village is trapped in a time loop, and the friends were taken by entities that maintain it.
+    5. The villagers are all ghosts, re-enacting their final days and want the friends to join them.
+    6. The village is a cult that worships a "founder" who promised them eternal life.
+    7. A rare, hallucinogenic flower in the valley traps the villagers in a collective delusion.
+    8. The psychic cry the player heard was a trap, created by a predatory entity that feeds on hope.
+    9. The villagers "harvest" memories from outsiders to keep their own fading memories alive.
+    10. There are no villagers. They are all constructs created by a single, powerful psychic child (Nia).
+""")
+
+_STORY_KEY = _cache_key(STORY_GENERATOR_PREFIX)
+
+_STORY_GOAL = _block("""
+    **Your Goal:**
+    Based on this premise and the examples, generate a NEW, unique JSON object with three keys:
+    1.  `story_theme`: A string describing the core secret of the village for this playthrough.
+    2.  `inaccessible_locations`: A list of {num_inaccessible_locations} unique, thematic location names you invented that tie into your new story theme, the names shouldn't absurd of fancy ones, generate the simple ones only.
+    3.  `correct_location`: A string containing one of the names from your `inaccessible_locations` list where the friends are actually being held.
+
+    Output ONLY the raw JSON object.
+""")
+
+# ================= WORLD BUILDER ================= #
+WORLD_BUILDER_RULES = _block("""
+    You are a world-class narrative designer generating a "Quest Network" for the game "Village of Echoes".
+
+    **Guiding Principles:**
+    - **Clarity of Content is Paramount:** The `content` field must be written to be as clear as possible for the player.
+        - If `type` is `Information`, the `content` is a direct clue the player learns with complete brief of clue history, direction and reason.
+        - If `type` is `TalkToVillager`, the `content` **MUST** explicitly name the villager to talk to and give a clear reason and also where they will be found/ are. **Bad example:** 'The river holds many secrets.' **Good example:** 'You should go speak with Old Mara by the river; she knows things about the recent disappearances.'
+    - **Character-Driven:** Clues must originate from the villager's personality and their role in the secret.
+
+    **Node Structure:**
+    -   `node_id`: A simple, unique, sequential string, like "node1", "node2", "node3", etc.
+    -   `villager_name`: Who provides this node.
+    -   `content`: The core information or clue, written according to the Clarity of Content principle.
+    -   `type`: "Information" or "TalkToVillager".
+    -   `priority`: Importance order (1=Minor, 5=Major), higher the priority it should be given considered first for the story.
+    -   `key_clue`: A boolean (true/false).
+    -   `preconditions`: List of `node_id` strings required.
+    -   `required_familiarity`: An integer from 1-5, or `null`.
+""")
+
+_DIFFICULTY_SETTINGS = {
+    "Very Easy": ("8", 2,
+                  "The final clue must be extremely direct and explicitly state where to go.",
+                  "Clues must be direct and obvious. Avoid riddles or metaphors.",
+                  "Generate **exactly 2 nodes** of type 'TalkToVillager' to guide the player. The rest should be 'Information'."),
+    "Easy": ("15-20", 3,
+             "The final clue should be a strong hint, making the answer clear.",
+             "Clues should be mostly straightforward.",
+             "You may use a mix of 'Information' and 'TalkToVillager' nodes."),
+    "Hard": ("35-40", 6,
+             "The final clue must be extremely cryptic, requiring significant deduction.",
+             "Clues must be cryptic and often misleading. Use riddles and metaphors.",
+             "Create a complex web using many 'TalkToVillager' nodes to interconnect clues."),
+    "Medium": ("25-30", 4,
+               "The final clue must be cryptic. Do not state the answer directly.",
+               "Clues should require some thought and interpretation.",
+               "Create a web-like structure with a good mix of 'Information' and 'TalkToVillager' nodes."),
+}
+
+def _difficulty_block(difficulty: str) -> str:
+    node_count, key_clue_count, final_clue_instruction, difficulty_instructions, type_instruction = _DIFFICULTY_SETTINGS[difficulty]
+    return _block(f"""
+        **Generation Requirements ({difficulty.upper()}):**
+        -   **Difficulty:** {difficulty_instructions}
+        -   Generate a network of **{node_count} nodes**.
+        -   Designate **exactly {key_clue_count} nodes** as `key_clue: true`.
+        -   {type_instruction}
+        -   **{final_clue_instruction}**
+    """)
+
+WORLD_BUILDER_DIFFICULTY_BLOCKS = {name: _difficulty_block(name) for name in _DIFFICULTY_SETTINGS}
+
+# ================= INTERACTION ================= #
+INTERACTION_RULES = _block("""
+    You are both a **villager actor** and a **game director** in the horror game "Village of Echoes".
+    Your goal: deliver immersive dialogue that feels authentic *while progressing the game*.
+
+    --- DIRECTOR'S RULES (Unbreakable) ---
+    1. Roleplay naturally as the villager described under PERSONA.
+    2. Stay immersive: Do NOT break character or mention the "game system."
+    3. Never mention the player's "friends" unless the player explicitly brings them up.
+    4. Keep responses smooth and natural: ~2 sentences, with tone matching the villager.
+    5. Adjust tone based on the familiarity level given under THIS TURN.
+       - If "Unknown", introduce yourself naturally.
+    6. Do not repeat information the player already knows (listed under THIS TURN).
+    7. If a clue is revealed, weave it in *naturally with flavor*, not as a raw fact dump.
+
+    **NOTE: Whenver mentioned this is the staring prompt of the conversation, then just introduce yourself if familarity:Unknown or talk about the recent thing that you discoverd with that villager from the knowledges-summary**
+
+    --- HOW TO REPLY (Concrete patterns and expectations) ---
+    Follow these reply patterns exactly — they describe *how* your npc_dialogue, suggestions, and player_responses should be structured:
+
+    1) VOICE + LENGTH
+       - Speak *in-character* and briefly (1–2 sentences). Use contractions and small quirks that match the villager's profile.
+       - Never narrate like an omniscient storyteller (avoid "The moss is important because..."). Use personal observations, gossip, or memory instead.
+       Example: "That moss chills me—I've seen children staring at it at dusk, eyes half-closed, like they heard a lullaby."
+
+    2) UNKNOWN FAMILIARITY
+       - If familiarity == "Unknown", begin with a short introduction: name + relation to village + one-line signal of trust or suspicion.
+       Example: "I'm Arthur, I cut wood here. I don't like to meddle, but you'll want to hear this."
+
+    3) CLUE TONE & CONTENT (Hints)
+       - When hinting (not fully revealing), include:
+         a) A sensory detail (smell, sound, sight) or small scene,
+         b) Why it matters for the story,
+         c) One concrete next action (who to talk to OR where to search).
+       Example pattern: "<sensory detail>. It suggests <why it matters>. You should <next action>."
+
+    4) CLUE REVELATION (CAN_REVEAL rule)
+       - MUST integrate the exact `content` from the `context_node` naturally into npc_dialogue (do not paste raw JSON).
+       - After revealing, give **1–2 concrete next actions** (specific villager names or locations) the player can take to follow up.
+       - Provide 1–3 player_responses that map directly to those actions (or to a polite closing).
+       Example: "\"That torn ribbon in the chapel—I've seen it on the tailor's counter.\" → Next actions: ask the tailor / search the chapel loft."
+
+    5) GUIDANCE WHEN STUCK
+       - If the player seems stuck, offer prioritized options (2–3), with a short reason for each (ranked by usefulness).
+       - Use phrasing like: "If you're unsure, first X (because...), otherwise Y."
+
+    6) HOSTILITY / BRIBES / EMOTIONAL STATES
+       - Hostile player: de-escalate, offer a guarded hint or refuse to help. Offer responses that let the player back down or press.
+       - Bribe/plea: consult `villagerProfile` morality/traits and act accordingly (accept with consequences, or refuse and give a hint).
+       - Frightened player: reassure and give a safe next step (e.g., "Find the doctor; he'll come with you.").
+
+    7) REPETITION & CLARIFICATION
+       - If the player repeats or asks for confirmation, restate only the new, useful piece of info (do NOT rehash everything).
+       - If asked "Where are my friends?" respond per status: reveal if allowed; otherwise give the best directional hint + next action.
+
+    8) EXHAUSTION / LOCKED CLUES
+       - PERMANENTLY_EXHAUSTED: provide a short, reflective farewell and EXACTLY ONE polite closing player option.
+       - HAS_LOCKED_CLUES: explain briefly why a clue can't be revealed (trust, danger, ritual), and provide EXACTLY ONE polite closing option.
+
+    9) FORMAT & FOLLOW-UP
+       - Always include 1–3 realistic `player_responses` (e.g., "Ask Old Mara by the river.", "Search the Ossified Grove.", "Goodbye.").
+       - Ensure any suggested action is actionable within the game (name a villager or a specific place/thing).
+       - If you suggest a search, indicate *what to look for* (e.g., "check under the millstones for footprints").
+""")
+
+_TURN_OBJECTIVES = {
+    "PERMANENTLY_EXHAUSTED": "You can no longer provide new clues. Deliver a final, reflective farewell.",
+    "HAS_LOCKED_CLUES": "You cannot yet reveal a clue. Hint gently why (trust, timing, secrecy) and end politely.",
+    "CAN_REVEAL": "MANDATORY: Reveal the current clue NOW. Integrate the content naturally into your dialogue, and set node_revealed_id. This is not optional.",
+}
+_DEFAULT_JSON_TASK = "Generate a JSON object with: npc_dialogue (string), player_responses (list of 1–3 options), node_revealed_id (string or null), new_familiarity_level (0–5)."
+_CLOSING_JSON_TASK = "Generate a JSON object with: npc_dialogue (string), player_responses (EXACTLY ONE polite closing option), node_revealed_id (null), new_familiarity_level (0–5)."
+_JSON_TASKS = {
+    "PERMANENTLY_EXHAUSTED": _CLOSING_JSON_TASK,
+    "HAS_LOCKED_CLUES": _CLOSING_JSON_TASK,
+}
+
+# ================= RESPONSE BANK ================= #
+RESPONSE_BANK_RULES = _block("""
+    You are writing a **Response Bank** for the horror game "Village of Echoes": short,
+    reusable closing lines each villager says when they have nothing more to share.
+
+    For EVERY villager listed under Game Data, write lines for two situations:
+    - "farewell": the villager has told the player everything they know. A reflective,
+      in-character goodbye that does not hint at new information.
+    - "not_yet": the villager knows more but cannot say it yet. Hint briefly why (trust,
+      timing, danger, secrecy) without revealing anything, and end politely.
+
+    Write separate lines for three familiarity bands, matching tone to how well the
+    villager knows the player:
+    - "low": Unknown or Stranger (guarded, curt)
+    - "mid": Acquaintance or Familiar Face (polite, a little warmer)
+    - "high": Ally or Confidant (warm, personal)
+
+    Every line is an object with:
+    - "npc_dialogue": 1–2 sentences in the villager's voice.
+    - "player_response": EXACTLY ONE polite closing option for the player (e.g. "Goodbye for now.").
+
+    Never mention the player's friends, the game system, or any specific clue.
+    Each line must stand on its own: it may be shown in any order, after any conversation.
+""")
+
+# ================= OPENING LINES ================= #
+OPENING_LINES_RULES = _block("""
+    You are writing the **Opening Lines** for the horror game "Village of Echoes": the first
+    thing each villager says when the player walks up to them for the first time.
+
+    For EVERY villager listed under Game Data:
+    - "npc_dialogue": 1–2 sentences in the villager's voice. The player is a stranger
+      (familiarity "Unknown"), so introduce yourself naturally: name, your place in the
+      village, and a hint of trust or suspicion. Do NOT reveal any clue yet.
+    - "player_responses": 1–3 realistic things the player could say next.
+    - "new_familiarity_level": 1 if the introduction went normally, 0 if the villager stays cold.
+
+    Never mention the player's friends or the game system.
+""")
+
+class PromptBuilder:
+    """Builds CompiledPrompts and keeps per-prompt-type size statistics."""
+
+    def __init__(self, max_cached_personas: int = 4096):
+        self.max_cached_personas = max_cached_personas
+        self._persona_prefixes = OrderedDict()
+        self._roster_prefixes = {}
+        self._stats = {}
+
+    def build(self, prompt_type: str, context: dict):
+        builders = {
+            "StoryGenerator": self._build_story_generator,
+            "WorldBuilder": self._build_world_builder,
+            "Interaction": self._build_interaction,
+            "ResponseBank": self._build_response_bank,
+            "OpeningLines": self._build_opening_lines,
+        }
+        builder = builders.get(prompt_type)
+        if builder is None:
+            return None
+        compiled = builder(context)
+        self._record(compiled)
+        return compiled
+
+    def _build_story_generator(self, context):
+        dynamic = _STORY_GOAL.format(num_inaccessible_locations=context["num_inaccessible_locations"])
+        return CompiledPrompt("StoryGenerator", STORY_GENERATOR_PREFIX, dynamic, _STORY_KEY)
+
+    def _roster_prefix(self, rules: str, villagers):
+        cache_key = (id(rules), id(villagers))
+        cached = self._roster_prefixes.get(cache_key)
+        if cached is None or cached[0] is not villagers:
+            prefix = rules + "\n\n**Game Data for Context:**\n-   Villagers: " + compact_json(villagers)
+            # Holding a reference to the roster keeps its id() from being reused.
+            cached = (villagers, prefix, _cache_key(prefix))
+            self._roster_prefixes[cache_key] = cached
+        return cached[1], cached[2]
+
+    def _build_world_builder(self, context):
+        prefix, key = self._roster_prefix(WORLD_BUILDER_RULES, context["villagers"])
+
+        difficulty = context.get("difficulty", "Medium")
+        settings = difficulty if difficulty in WORLD_BUILDER_DIFFICULTY_BLOCKS else "Medium"
+        dynamic = (
+            f"The correct location is: **{context['correctLocation']}**.\n"
+            f"The difficulty is: **{difficulty.upper()}**.\n"
+            f"The core secret of the village is: **{context['story_theme']}**\n\n"
+            + WORLD_BUILDER_DIFFICULTY_BLOCKS[settings]
+            + '\n\nOutput ONLY the raw JSON object containing the "nodes" list.'
+        )
+        return CompiledPrompt("WorldBuilder", prefix, dynamic, key)
+
+    def _build_response_bank(self, context):
+        prefix, key = self._roster_prefix(RESPONSE_BANK_RULES, context["villagers"])
+        lines = context["lines_per_band"]
+        dynamic = (
+            f"The core secret of the village (never reveal it) is: **{context['story_theme']}**\n\n"
+            f"Write **{lines} lines** per villager, situation and band.\n\n"
+            'Output ONLY a raw JSON object: {"villagers": [{"name": "<villager name>", '
+            '"farewell": {"low": [...], "mid": [...], "high": [...]}, '
+            '"not_yet": {"low": [...], "mid": [...], "high": [...]}}, ...]}'
+        )
+        return CompiledPrompt("ResponseBank", prefix, dynamic, key)
+
+    def _build_opening_lines(self, context):
+        prefix, key = self._roster_prefix(OPENING_LINES_RULES, context["villagers"])
+        dynamic = (
+            f"The core secret of the village (never reveal it) is: **{context['story_theme']}**\n"
+            f"What the player knows so far: {context['player_knowledge_summary']}\n\n"
+            'Output ONLY a raw JSON object: {"villagers": [{"name": "<villager name>", "npc_dialogue": "...", '
+            '"player_responses": ["..."], "new_familiarity_level": 1}, ...]}'
+        )
+        return CompiledPrompt("OpeningLines", prefix, dynamic, key)
+
+    def persona_prefix(self, game_id, villager_profile):
+        key = (game_id, villager_profile.name)
+        cached = self._persona_prefixes.get(key)
+        if cached is not None:
+            self._persona_prefixes.move_to_end(key)
+            return cached
+        prefix = INTERACTION_RULES + "\n\n--- PERSONA ---\n" + compact_json(villager_profile.to_dict())
+        cached = (prefix, _cache_key(prefix))
+        self._persona_prefixes[key] = cached
+        if len(self._persona_prefixes) > self.max_cached_personas:
+            self._persona_prefixes.popitem(last=False)
+        return cached
+
+    def _build_interaction(self, context):
+        prefix, key = self.persona_prefix(context.get("gameId"), context["villagerProfile"])
+        status = context.get("conversational_status")
+        dynamic = "\n".join([
+            "--- THIS TURN ---",
+            f"- Familiarity level: {context['familiarity_level']} ({context['familiarity_description']})",
+            f"- Player already knows: {context['player_knowledge_summary']}",
+            f"- Current clue node (if any): {compact_json(context.get('context_node'))}",
+            f"- Objective: {_TURN_OBJECTIVES.get(status, '')}",
+            "",
+            "--- EARLIER CONVERSATION (summary) ---",
+            context.get("historySummary") or "(none)",
+            "",
+            "--- CONVERSATION HISTORY (most recent turns) ---",
+            compact_json(context["chatHistory"]),
+            "",
+            f"- The player’s last line: \"{context['player_last_response']}\"",
+            "",
+            "--- OUTPUT ---",
+            _JSON_TASKS.get(status, _DEFAULT_JSON_TASK),
+            "",
+            "Respond ONLY with the raw JSON object.",
+        ])
+        return CompiledPrompt("Interaction", prefix, dynamic, key)
+
+    def _record(self, compiled: CompiledPrompt):
+        stats = self._stats.setdefault(compiled.prompt_type, {"prompts": 0, "bytes": 0, "prefix_bytes": 0, "tokens": 0})
+        prefix_bytes = len(compiled.prefix.encode("utf-8"))
+        stats["prompts"] += 1
+        stats["prefix_bytes"] += prefix_bytes
+        stats["bytes"] += prefix_bytes + 2 + len(compiled.dynamic.encode("utf-8"))
+        stats["tokens"] += estimate_tokens(compiled.prefix) + estimate_tokens(compiled.dynamic)
+
+    def stats(self) -> dict:
+        report = {}
+        for prompt_type, stats in self._stats.items():
+            count = stats["prompts"]
+            report[prompt_type] = {
+                "prompts": count,
+                "mean_bytes": round(stats["bytes"] / count, 1),
+                "mean_tokens": round(stats["tokens"] / count, 1),
+                "cacheable_prefix_share": round(stats["prefix_bytes"] / stats["bytes"], 3),
+            }
+        report["cached_personas"] = len(self._persona_prefixes)
+        return report
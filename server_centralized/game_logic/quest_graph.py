@@ -0,0 +1,135 @@
+# game_logic/quest_graph.py
+# Indexed view of a quest network, compiled once per game, so per-turn clue lookups and
+# reveals do not rescan every node.
+
+import heapq
+from collections import defaultdict
+
+SUMMARY_PREFIX = "Key points discovered so far: "
+SEPARATOR = "; "
+
+class QuestGraph:
+    """
+    Answers the same questions as a linear scan over quest_network["nodes"]:
+
+    - which clue a villager can reveal next (highest priority first, ties in network
+      order, preconditions and familiarity satisfied),
+    - the knowledge summary of everything discovered, in network order,
+    - whether every key clue has been found.
+
+    Each villager keeps one heap of undiscovered nodes and, per required familiarity
+    level, a heap of nodes whose preconditions are all met. Discovered nodes are
+    dropped lazily when they surface at the top of a heap. Revealing a node decrements
+    an unmet-precondition counter on its dependents and pushes newly unlocked ones.
+
+    The knowledge summary is kept as a string and each reveal splices its clue in at
+    the right place. A Fenwick tree over the summary width of every discovered node
+    gives the splice offset in O(log n), so no reveal re-joins the clues found before it.
+    """
+
+    def __init__(self, quest_network: dict):
+        self.entries = list(quest_network.get("nodes", []))
+        self.discovered = set()
+        self.indices_by_id = defaultdict(list)
+        self.dependents = defaultdict(list)
+        self.unmet = []
+        self.remaining = defaultdict(int)
+        self.pending = defaultdict(list)
+        self.ready = defaultdict(dict)
+        self.key_clue_ids = set()
+        self.key_clues_found = 0
+        self._widths = [0] * (len(self.entries) + 1)  # Fenwick tree, 1-based
+        self._summary = SUMMARY_PREFIX
+
+        for index, node in enumerate(self.entries):
+            node_id = node["node_id"]
+            villager = node["villager_name"]
+            self.indices_by_id[node_id].append(index)
+            preconditions = set(node.get("preconditions") or [])
+            for precondition in preconditions:
+                self.dependents[precondition].append(index)
+            self.unmet.append(len(preconditions))
+            self.remaining[villager] += 1
+            heapq.heappush(self.pending[villager], self._heap_key(index))
+            if not preconditions:
+                self._push_ready(index)
+            if node.get("key_clue"):
+                self.key_clue_ids.add(node_id)
+
+    @classmethod
+    def from_state(cls, quest_network: dict, discovered_nodes):
+        graph = cls(quest_network)
+        for node_id in discovered_nodes:
+            graph.reveal(node_id)
+        return graph
+
+    def _heap_key(self, index):
+        return (-(self.entries[index].get("priority") or 0), index)
+
+    def _push_ready(self, index):
+        node = self.entries[index]
+        buckets = self.ready[node["villager_name"]]
+        heapq.heappush(buckets.setdefault(node.get("required_familiarity"), []), self._heap_key(index))
+
+    def _peek(self, heap):
+        while heap and self.entries[heap[0][1]]["node_id"] in self.discovered:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def clue_status(self, villager_name: str, familiarity: int):
+        if not self.remaining.get(villager_name):
+            return "PERMANENTLY_EXHAUSTED", None
+
+        best = None
+        for required, heap in self.ready.get(villager_name, {}).items():
+            if required is not None and familiarity < required:
+                continue
+            top = self._peek(heap)
+            if top is not None and (best is None or top < best):
+                best = top
+        if best is not None:
+            return "CAN_REVEAL", self.entries[best[1]]
+
+        return "HAS_LOCKED_CLUES", self.entries[self._peek(self.pending[villager_name])[1]]
+
+    def reveal(self, node_id: str) -> bool:
+        """Marks a node as discovered. Returns False if it already was."""
+        if node_id in self.discovered:
+            return False
+        self.discovered.add(node_id)
+        for index in self.indices_by_id.get(node_id, []):
+            self.remaining[self.entries[index]["villager_name"]] -= 1
+            self._add_to_summary(index)
+        if node_id in self.key_clue_ids:
+            self.key_clues_found += 1
+        for index in self.dependents.get(node_id, []):
+            self.unmet[index] -= 1
+            if self.unmet[index] == 0 and self.entries[index]["node_id"] not in self.discovered:
+                self._push_ready(index)
+        return True
+
+    def _add_to_summary(self, index):
+        content = self.entries[index]["content"]
+        # Width of the clues discovered before this one, each counted with a leading separator.
+        before, i = 0, index
+        while i > 0:
+            before += self._widths[i]
+            i -= i & -i
+        i = index + 1
+        while i < len(self._widths):
+            self._widths[i] += len(SEPARATOR) + len(content)
+            i += i & -i
+        summary = self._summary
+        if before:
+            at = len(SUMMARY_PREFIX) + before - len(SEPARATOR)
+            self._summary = summary[:at] + SEPARATOR + content + summary[at:]
+        elif len(summary) > len(SUMMARY_PREFIX):
+            self._summary = SUMMARY_PREFIX + content + SEPARATOR + summary[len(SUMMARY_PREFIX):]
+        else:
+            self._summary = SUMMARY_PREFIX + content
+
+    def knowledge_summary(self) -> str:
+        return self._summary
+
+    def all_key_clues_found(self) -> bool:
+        return self.key_clues_found == len(self.key_clue_ids)
@@ -0,0 +1,162 @@
+# game_logic/request_coalescer.py
+# Serializes turns per game and de-duplicates retried /interact requests, so a double
+# click or a client retry never pays for a second LLM call or appends a second turn.
+
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+DEFAULT_IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+DEFAULT_IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+class IdempotencyKeyReused(ValueError):
+    """The same idempotency key was sent with a different request body."""
+
+class Claim:
+    """Handed to the caller of InteractionCoalescer.claim(). If `replayed` is set, `result`
+    already holds the response; otherwise the caller runs the turn and stores it in `result`."""
+    __slots__ = ("result", "replayed")
+
+    def __init__(self):
+        self.result = None
+        self.replayed = False
+
+class InteractionCoalescer:
+    """
+    Per-game asyncio locks plus an idempotency-key table.
+
+    - Requests for the same game run one at a time, in arrival order.
+    - A request whose key is still in flight waits for that request's result.
+    - A request whose key already completed gets the stored response.
+
+    Only results are replayed: if the request in flight fails or is cancelled (its
+    client went away), a request waiting on its key runs the turn itself, and a retry
+    after an error runs again. This is per
+    worker; duplicates that reach different workers are caught by the session
+    backend's version check instead.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_IDEMPOTENCY_TTL, max_entries: int = DEFAULT_IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._locks = {}  # game_id -> [asyncio.Lock, users]
+        self._inflight = {}  # (game_id, key) -> (future, fingerprint)
+        self._completed = OrderedDict()  # (game_id, key) -> (result, fingerprint, expires_at)
+        self.requests = 0
+        self.keyed_requests = 0
+        self.serialized_waits = 0
+        self.coalesced_inflight = 0
+        self.replayed_completed = 0
+
+    @asynccontextmanager
+    async def claim(self, game_id: str, key: str = None, fingerprint=None):
+        self.requests += 1
+        claim = Claim()
+        if key is None:
+            async with self._game_lock(game_id):
+                yield claim
+            return
+
+        self.keyed_requests += 1
+        ident = (game_id, key)
+        while True:
+            completed = self._completed_result(ident, fingerprint)
+            if completed is not None:
+                self.replayed_completed += 1
+                claim.result, claim.replayed = completed[0], True
+                yield claim
+                return
+            pending = self._inflight.get(ident)
+            if pending is None:
+                break
+            self._check_fingerprint(pending[1], fingerprint)
+            try:
+                result = await asyncio.shield(pending[0])
+            except asyncio.CancelledError:
+                if not pending[0].cancelled() or asyncio.current_task().cancelling():
+                    raise  # This request was cancelled, not the one it was waiting on.
+                self._drop_inflight(ident, pending[0])
+                continue  # The original was abandoned mid-turn: run the turn here.
+            except Exception:
+                self._drop_inflight(ident, pending[0])
+                continue  # The original failed; failures are not replayed.
+            self.coalesced_inflight += 1
+            claim.result, claim.replayed = result, True
+            yield claim
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[ident] = (future, fingerprint)
+        try:
+            async with self._game_lock(game_id):
+                yield claim
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                future.exception()  # Marks it retrieved when nobody was waiting.
+            raise
+        else:
+            future.set_result(claim.result)
+            self._store(ident, claim.result, fingerprint)
+        finally:
+            self._drop_inflight(ident, future)
+
+    def _drop_inflight(self, ident, future):
+        # A waiter may already have taken over the key with a future of its own.
+        entry = self._inflight.get(ident)
+        if entry is not None and entry[0] is future:
+            del self._inflight[ident]
+
+    @asynccontextmanager
+    async def _game_lock(self, game_id):
+        entry = self._locks.get(game_id)
+        if entry is None:
+            entry = self._locks[game_id] = [asyncio.Lock(), 0]
+        if entry[0].locked():
+            self.serialized_waits += 1
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[game_id]
+
+    @staticmethod
+    def _check_fingerprint(expected, actual):
+        if expected != actual:
+            raise IdempotencyKeyReused("Idempotency key was already used for a different request.")
+
+    def _completed_result(self, ident, fingerprint):
+        entry = self._completed.get(ident)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            del self._completed[ident]
+            return None
+        self._check_fingerprint(entry[1], fingerprint)
+        return entry
+
+    def _store(self, ident, result, fingerprint):
+        self._completed[ident] = (result, fingerprint, time.monotonic() + self.ttl)
+        self._completed.move_to_end(ident)
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "keyed_requests": self.keyed_requests,
+            "serialized_waits": self.serialized_waits,
+            "coalesced_inflight": self.coalesced_inflight,
+            "replayed_completed": self.replayed_completed,
+            "llm_calls_saved": self.coalesced_inflight + self.replayed_completed,
+            "games_locked": len(self._locks),
+            "inflight_keys": len(self._inflight),
+            "stored_responses": len(self._completed),
+        }
@@ -0,0 +1,311 @@
+# game_logic/resilience.py
+# The policy around every buffered LLM call: a deadline per prompt type, retries with
+# exponential backoff on transient and parse errors, a hedged duplicate request when the
+# first one is slower than usual, and a circuit breaker that fails fast while the backend
+# is down. Everything is counted per prompt type for /stats.
+
+import os
+import json
+import time
+import random
+import asyncio
+from .stats import LatencyTracker
+
+def parse_deadlines(spec: str) -> dict:
+    """"Interaction=12,WorldBuilder=60" -> {"Interaction": 12.0, "WorldBuilder": 60.0}"""
+    deadlines = {}
+    for part in spec.split(","):
+        name, _, seconds = part.partition("=")
+        if name.strip() and seconds.strip():
+            deadlines[name.strip()] = float(seconds)
+    return deadlines
+
+# Whole-call budgets in seconds, retries and hedges included.
+DEFAULT_LLM_DEADLINES = parse_deadlines(os.getenv(
+    "LLM_DEADLINES", "StoryGenerator=30,WorldBuilder=90,Interaction=15,ResponseBank=60,OpeningLines=45"))
+DEFAULT_LLM_DEADLINE = float(os.getenv("LLM_DEFAULT_DEADLINE", "30"))
+DEFAULT_LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+DEFAULT_LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.25"))
+DEFAULT_LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+# Hedging: once a call has run longer than this percentile of recent attempt latencies for
+# its prompt type, a duplicate is sent and the first valid answer wins.
+DEFAULT_HEDGE_TYPES = frozenset(t for t in os.getenv("LLM_HEDGE_TYPES", "StoryGenerator,Interaction").split(",") if t)
+DEFAULT_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+DEFAULT_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "3"))  # Until enough samples exist
+DEFAULT_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.1"))
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # Consecutive failed attempts
+DEFAULT_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Output that must be present for a reply to count as valid. Anything else is a parse error.
+REQUIRED_KEYS = {
+    "StoryGenerator": ("story_theme", "inaccessible_locations", "correct_location"),
+    "WorldBuilder": ("nodes",),
+    "Interaction": ("npc_dialogue",),
+    "ResponseBank": ("villagers",),
+    "OpeningLines": ("villagers",),
+}
+
+# google.api_core exception names that will fail the same way on every retry.
+_PERMANENT_ERRORS = frozenset({
+    "InvalidArgument", "PermissionDenied", "Unauthenticated", "NotFound", "FailedPrecondition", "ReplayMissError",
+})
+
+class LLMCallError(Exception):
+    """The call failed for good: retries exhausted, deadline passed, or circuit open."""
+
+class CircuitOpenError(LLMCallError):
+    pass
+
+class MalformedOutputError(ValueError):
+    pass
+
+def validate_output(prompt_type: str, text: str) -> str:
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MalformedOutputError(f"not JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise MalformedOutputError("not a JSON object")
+    missing = [key for key in REQUIRED_KEYS.get(prompt_type, ()) if key not in data]
+    if missing:
+        raise MalformedOutputError(f"missing {', '.join(missing)}")
+    return text
+
+def _is_retryable(error: BaseException) -> bool:
+    return type(error).__name__ not in _PERMANENT_ERRORS
+
+class CircuitBreaker:
+    """
+    Closed until `threshold` attempts in a row fail, then open: calls are rejected without
+    touching the backend for `reset_after` seconds. After that one probe call at a time is
+    let through (half-open); its success closes the breaker, its failure reopens it.
+    Parse errors do not count, since they say nothing about whether the backend is up.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, reset_after: float = DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_after:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probing = False
+        self.state = "closed"
+
+    def release(self):
+        """For a call that ended without an outcome (abandoned by its caller)."""
+        self._probing = False
+
+    def record_failure(self):
+        self._probing = False
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures,
+                "opens": self.opens, "rejected": self.rejected}
+
+class _CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.parse_errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.rejected = 0
+        self.latency = LatencyTracker()  # Whole calls, as the caller saw them
+        self.attempt_latency = LatencyTracker()  # Single successful attempts; drives the hedge delay
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "parse_errors": self.parse_errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "rejected_by_breaker": self.rejected,
+            "latency": self.latency.summary(),
+            "attempt_latency": self.attempt_latency.summary(),
+        }
+
+class ResilientCaller:
+    """
+    Runs `attempt()` (a coroutine factory returning the cleaned model text) under the
+    policy for `prompt_type`. Hedges are only sent while the LLM semaphore has free slots,
+    so they never queue behind real calls; the losing request is cancelled.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore = None, deadlines: dict = None,
+                 default_deadline: float = DEFAULT_LLM_DEADLINE, retries: int = DEFAULT_LLM_RETRIES,
+                 backoff_base: float = DEFAULT_LLM_BACKOFF_BASE, backoff_max: float = DEFAULT_LLM_BACKOFF_MAX,
+                 hedge_types=DEFAULT_HEDGE_TYPES, hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 hedge_initial_delay: float = DEFAULT_HEDGE_INITIAL_DELAY, hedge_min_delay: float = DEFAULT_HEDGE_MIN_DELAY,
+                 breaker: CircuitBreaker = None, hedge_min_samples: int = 20):
+        self.semaphore = semaphore
+        self.deadlines = DEFAULT_LLM_DEADLINES if deadlines is None else deadlines
+        self.default_deadline = default_deadline
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_types = frozenset(hedge_types)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._stats = {}
+        self._rng = random.Random()
+
+    def _stats_for(self, prompt_type: str) -> _CallStats:
+        stats = self._stats.get(prompt_type)
+        if stats is None:
+            stats = self._stats[prompt_type] = _CallStats()
+        return stats
+
+    def hedge_delay(self, prompt_type: str):
+        if prompt_type not in self.hedge_types:
+            return None
+        tracker = self._stats_for(prompt_type).attempt_latency
+        if len(tracker.samples) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, tracker.percentile(self.hedge_percentile))
+
+    def _backoff(self, retry: int) -> float:
+        # Full jitter keeps retries from many games from arriving in lockstep.
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    async def call(self, prompt_type: str, attempt) -> str:
+        stats = self._stats_for(prompt_type)
+        stats.calls += 1
+        start = time.perf_counter()
+        deadline = start + self.deadlines.get(prompt_type, self.default_deadline)
+        last_error = None
+        try:
+            for retry in range(self.retries + 1):
+                if retry:
+                    stats.retries += 1
+                    pause = self._backoff(retry - 1)
+                    if time.perf_counter() + pause >= deadline:
+                        break
+                    await asyncio.sleep(pause)
+                if not self.breaker.allow():
+                    stats.rejected += 1
+                    raise CircuitOpenError(f"circuit open, {prompt_type} call rejected") from last_error
+                try:
+                    text = await self._hedged_round(prompt_type, attempt, deadline, stats)
+                except asyncio.TimeoutError as e:
+                    last_error = e
+                    break  # The round used up the deadline; nothing left to retry with.
+                except Exception as e:
+                    last_error = e
+                    if not _is_retryable(e):
+                        break
+                    continue
+                stats.succeeded += 1
+                return text
+        finally:
+            stats.latency.record(time.perf_counter() - start)
+        stats.failed += 1
+        raise LLMCallError(f"{prompt_type} failed: {last_error!r}") from last_error
+
+    async def _attempt(self, prompt_type: str, attempt, stats: _CallStats) -> str:
+        stats.attempts += 1
+        start = time.perf_counter()
+        try:
+            text = validate_output(prompt_type, await attempt())
+        except MalformedOutputError:
+            stats.parse_errors += 1
+            self.breaker.record_success()  # The backend answered; it just answered badly.
+            raise
+        except asyncio.CancelledError:
+            # Abandoned (hedge loser, dropped speculation, client gone), not failed. If this was
+            # the half-open probe, let the next call probe instead of rejecting calls forever.
+            self.breaker.release()
+            raise
+        except Exception:
+            stats.errors += 1
+            self.breaker.record_failure()
+            raise
+        stats.attempt_latency.record(time.perf_counter() - start)
+        self.breaker.record_success()
+        return text
+
+    async def _hedged_round(self, prompt_type: str, attempt, deadline: float, stats: _CallStats) -> str:
+        """One try, plus at most one hedge. Raises the last failure, or TimeoutError at the deadline."""
+        hedge_at = self.hedge_delay(prompt_type)
+        round_start = time.perf_counter()
+        primary = asyncio.ensure_future(self._attempt(prompt_type, attempt, stats))
+        pending = {primary}
+        hedge = None
+        last_error = None
+        try:
+            while pending:
+                now = time.perf_counter()
+                remaining = deadline - now
+                if remaining <= 0:
+                    stats.timeouts += 1
+                    self.breaker.record_failure()
+                    raise asyncio.TimeoutError()
+                wait = remaining
+                if hedge is None and hedge_at is not None:
+                    wait = min(wait, max(0.0, round_start + hedge_at - now))
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            stats.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                if hedge is None and hedge_at is not None and pending \
+                        and time.perf_counter() - round_start >= hedge_at:
+                    if self.semaphore is not None and self.semaphore.locked():
+                        stats.hedges_skipped += 1
+                    else:
+                        stats.hedges += 1
+                        hedge = asyncio.ensure_future(self._attempt(prompt_type, attempt, stats))
+                        pending.add(hedge)
+                    hedge_at = None  # One decision per round
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "by_prompt_type": {name: stats.summary() for name, stats in self._stats.items()},
+        }
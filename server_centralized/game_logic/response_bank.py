@@ -0,0 +1,87 @@
+# game_logic/response_bank.py
+# Pre-generated farewell and "not yet" lines per villager and familiarity band, so turns
+# with nothing to reveal are answered locally instead of with a full LLM round trip.
+
+import os
+
+DEFAULT_BANK_LINES = int(os.getenv("RESPONSE_BANK_LINES", "3"))
+
+# Clue statuses whose turns only need a closing line, and the bank section that serves them.
+BANK_KINDS = {"PERMANENTLY_EXHAUSTED": "farewell", "HAS_LOCKED_CLUES": "not_yet"}
+
+# Familiarity 0-5 folded into three tones.
+BANDS = ("low", "mid", "high")
+
+def familiarity_band(level: int) -> str:
+    return BANDS[min(2, max(0, level) // 2)]
+
+class ResponseBank:
+    """
+    One game's bank. `lines` maps (villager_index, kind, band) to a tuple of
+    (npc_dialogue, closing_option) pairs and is never mutated; `used` counts how many
+    of each have been served, so a line is not repeated within a game.
+    """
+    __slots__ = ("lines", "used")
+
+    def __init__(self, lines: dict):
+        self.lines = lines
+        self.used = {}
+
+    @classmethod
+    def from_llm(cls, data: dict, villagers):
+        """Keeps only well-formed entries for villagers in the roster."""
+        lines = {}
+        for entry in data.get("villagers") or []:
+            index = villagers.index_of(entry.get("name")) if isinstance(entry, dict) else None
+            if index is None:
+                continue
+            for kind in BANK_KINDS.values():
+                bands = entry.get(kind) or {}
+                for band in BANDS:
+                    pairs = tuple(
+                        (line["npc_dialogue"], line["player_response"])
+                        for line in bands.get(band) or []
+                        if isinstance(line, dict) and isinstance(line.get("npc_dialogue"), str)
+                        and line["npc_dialogue"].strip() and isinstance(line.get("player_response"), str)
+                    )
+                    if pairs:
+                        lines[(index, kind, band)] = pairs
+        return cls(lines)
+
+    def take(self, villager_index: int, clue_status: str, familiarity: int):
+        """Returns the next unused (npc_dialogue, closing_option) pair, or None."""
+        kind = BANK_KINDS.get(clue_status)
+        if kind is None:
+            return None
+        key = (villager_index, kind, familiarity_band(familiarity))
+        pairs = self.lines.get(key, ())
+        used = self.used.get(key, 0)
+        if used >= len(pairs):
+            return None
+        self.used[key] = used + 1
+        return pairs[used]
+
+    def remaining(self) -> int:
+        return sum(len(pairs) for pairs in self.lines.values()) - sum(self.used.values())
+
+class ResponseBankStats:
+    """Hit rate of bank-eligible turns across all games."""
+
+    def __init__(self):
+        self.eligible = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.banks_built = 0
+        self.build_failures = 0
+        self.serve_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "eligible_turns": self.eligible,
+            "hits": self.hits,
+            "llm_fallbacks": self.fallbacks,
+            "hit_rate": round(self.hits / self.eligible, 4) if self.eligible else None,
+            "banks_built": self.banks_built,
+            "build_failures": self.build_failures,
+            "serve_mean_us": round(self.serve_seconds / self.hits * 1e6, 2) if self.hits else None,
+        }
@@ -0,0 +1,98 @@
+# game_logic/roster.py
+# Immutable villager roster shared by every session. Sessions refer to villagers by
+# index; a session that needs to change a villager gets its own copy of the roster.
+
+from types import MappingProxyType
+from config import VILLAGER_ROSTER
+
+class Villager:
+    """Read-only villager record. Supports both attribute and mapping access."""
+    __slots__ = ("index", "name", "title", "location", "backstory", "personality_traits")
+    FIELDS = ("name", "title", "location", "backstory", "personality_traits")
+
+    def __init__(self, index: int, name: str, title: str, location: str, backstory: str, personality_traits):
+        set_field = object.__setattr__
+        set_field(self, "index", index)
+        set_field(self, "name", name)
+        set_field(self, "title", title)
+        set_field(self, "location", location)
+        set_field(self, "backstory", backstory)
+        set_field(self, "personality_traits", MappingProxyType(dict(personality_traits)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Villager is immutable; use Roster.replace() to change a session's copy.")
+
+    def __reduce__(self):
+        return (Villager, (self.index, self.name, self.title, self.location, self.backstory, dict(self.personality_traits)))
+
+    def keys(self):
+        return self.FIELDS
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "title": self.title,
+            "location": self.location,
+            "backstory": self.backstory,
+            "personality_traits": dict(self.personality_traits),
+        }
+
+_SHARED_ROSTERS = {}
+
+def shared_roster(key: str):
+    return _SHARED_ROSTERS[key]
+
+class Roster:
+    """Tuple of Villagers with a name -> index map."""
+    __slots__ = ("villagers", "index_by_name", "shared_key")
+
+    def __init__(self, villagers, shared_key: str = None):
+        self.villagers = tuple(villagers)
+        self.index_by_name = MappingProxyType({v.name: v.index for v in self.villagers})
+        self.shared_key = shared_key
+        if shared_key is not None:
+            _SHARED_ROSTERS[shared_key] = self
+
+    @classmethod
+    def from_dicts(cls, villagers, shared_key: str = None):
+        return cls((Villager(i, **{f: v[f] for f in Villager.FIELDS}) for i, v in enumerate(villagers)), shared_key)
+
+    def __reduce__(self):
+        # Shared rosters pickle as a reference, so hibernated sessions don't carry a copy.
+        if self.shared_key is not None:
+            return (shared_roster, (self.shared_key,))
+        return (Roster, (self.villagers,))
+
+    @property
+    def is_shared(self) -> bool:
+        return self.shared_key is not None
+
+    def __len__(self):
+        return len(self.villagers)
+
+    def __iter__(self):
+        return iter(self.villagers)
+
+    def __getitem__(self, index):
+        return self.villagers[index]
+
+    def index_of(self, name: str):
+        return self.index_by_name.get(name)
+
+    def replace(self, index: int, **changes) -> "Roster":
+        """Returns an unshared roster with one villager's fields changed."""
+        current = self.villagers[index]
+        fields = {f: changes.get(f, getattr(current, f)) for f in Villager.FIELDS}
+        villagers = list(self.villagers)
+        villagers[index] = Villager(index, **fields)
+        return Roster(villagers)
+
+DEFAULT_ROSTER = Roster.from_dicts(VILLAGER_ROSTER, shared_key="default")
@@ -0,0 +1,421 @@
+# game_logic/session_store.py
+# Bounded store for live GameState objects. Idle or least-recently-used sessions are
+# hibernated to a compressed on-disk archive and transparently loaded back on access.
+# Pickling and archive I/O happen on a writer thread (hibernation) or a worker thread
+# (rehydration), never on the event loop.
+
+import os
+import time
+import zlib
+import pickle
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from .stats import LatencyTracker
+
+DEFAULT_MAX_RESIDENT = int(os.getenv("SESSION_MAX_RESIDENT", "1000"))
+DEFAULT_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "900"))
+DEFAULT_ARCHIVE_PATH = os.getenv("SESSION_ARCHIVE_PATH", "sessions.sqlite3")
+DEFAULT_ARCHIVE_MAX_AGE = float(os.getenv("SESSION_ARCHIVE_MAX_AGE", str(7 * 24 * 3600)))
+
+def dump_session(game_state) -> bytes:
+    return zlib.compress(pickle.dumps(game_state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+
+def load_session(blob: bytes):
+    return pickle.loads(zlib.decompress(blob))
+
+class SessionArchive(ABC):
+    """
+    Where hibernated sessions go. Implementations store opaque compressed blobs and must
+    be safe to call from any thread.
+    """
+
+    @abstractmethod
+    def save(self, game_id: str, blob: bytes):
+        ...
+
+    @abstractmethod
+    def load(self, game_id: str):
+        ...
+
+    @abstractmethod
+    def delete(self, game_id: str):
+        ...
+
+    @abstractmethod
+    def contains(self, game_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def purge(self, max_age: float) -> int:
+        return 0
+
+class SQLiteSessionArchive(SessionArchive):
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hibernated_sessions ("
+            " game_id TEXT PRIMARY KEY, data BLOB NOT NULL, hibernated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_hibernated_at ON hibernated_sessions (hibernated_at)")
+
+    def save(self, game_id, blob):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hibernated_sessions (game_id, data, hibernated_at) VALUES (?, ?, ?)",
+                (game_id, blob, time.time()),
+            )
+
+    def load(self, game_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM hibernated_sessions WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, game_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM hibernated_sessions WHERE game_id = ?", (game_id,))
+
+    def contains(self, game_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM hibernated_sessions WHERE game_id = ?", (game_id,)).fetchone() is not None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM hibernated_sessions").fetchone()[0]
+
+    def purge(self, max_age):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM hibernated_sessions WHERE hibernated_at < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+class SessionStore:
+    """
+    Dict-like store of live sessions (`in`, `[]`, `get`, `pop`, `len`), plus `fetch`,
+    `add` and `checkout` for use on the event loop.
+
+    At most `max_resident` sessions are kept in memory; the least recently used one is
+    hibernated when a new session pushes the store over the limit, and `evict_idle`
+    hibernates anything untouched for `idle_ttl` seconds. Sessions checked out with
+    `checkout()` are pinned and never hibernated mid-request, so no turn is applied to
+    an object that has already been written to the archive.
+
+    Hibernating only moves a session to a hand-off table and queues it; a writer thread
+    pickles it and writes it to the archive. A session asked for again before its write
+    starts is taken straight back from the hand-off table. `fetch` and `checkout` read
+    and unpickle archived sessions on a worker thread, one load per game at a time. The
+    plain dict methods do the same work inline and are meant for callers off the loop.
+
+    With a `journal` (TurnJournal), sessions in memory are also crash-safe: each one is
+    snapshotted to the journal when it enters memory, the engine journals its turns, and
+    `recover()` rebuilds them on startup. Leaving memory is journaled as well (by the
+    writer, once the archive holds the session), so recovery only restores sessions the
+    archive holds no copy of, or an older one.
+    """
+
+    def __init__(self, max_resident: int = DEFAULT_MAX_RESIDENT, idle_ttl: float = DEFAULT_IDLE_TTL,
+                 archive: SessionArchive = None, journal=None):
+        self.max_resident = max_resident
+        self.idle_ttl = idle_ttl
+        self.archive = archive if archive is not None else SQLiteSessionArchive()
+        self.journal = journal
+        self._resident = OrderedDict()  # game_id -> (game_state, last_access)
+        self._pins = {}
+        self._loading = {}  # game_id -> task of an in-progress fetch
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._hibernating = {}  # game_id -> (ticket, game_state) queued for (or being written to) the archive
+        self._queue = deque()  # ("save" | "delete", game_id, ticket), in order
+        self._tickets = 0
+        self._writing = None
+        self._thread = None
+        self.lru_evictions = 0
+        self.ttl_evictions = 0
+        self.rehydrations = 0
+        self.reclaimed = 0
+        self.write_errors = 0
+        self.archived = None  # Archive row count as of the last len(); stats() never counts
+        self.rehydration_latency = LatencyTracker()
+        self.hibernation_latency = LatencyTracker()
+
+    def __contains__(self, game_id):
+        if game_id in self._resident or game_id in self._hibernating:
+            return True
+        return self.archive.contains(game_id)
+
+    def __getitem__(self, game_id):
+        game_state = self.get(game_id)
+        if game_state is None:
+            raise KeyError(game_id)
+        return game_state
+
+    def __setitem__(self, game_id, game_state):
+        if self.journal is not None:
+            self.journal.snapshot(game_id, game_state)
+        self._resident[game_id] = (game_state, time.monotonic())
+        self._resident.move_to_end(game_id)
+        self._enforce_limit(keep=game_id)
+
+    def __len__(self):
+        self.archived = self.archive.count()
+        return len(self._resident) + len(self._hibernating) + self.archived
+
+    async def add(self, game_id, game_state):
+        self[game_id] = game_state
+
+    def _touch(self, game_id):
+        entry = self._resident.get(game_id)
+        if entry is None:
+            return None
+        self._resident[game_id] = (entry[0], time.monotonic())
+        self._resident.move_to_end(game_id)
+        return entry[0]
+
+    def get(self, game_id, default=None):
+        """Blocking lookup; on the event loop use `fetch`."""
+        game_state = self._touch(game_id)
+        if game_state is None:
+            game_state = self._install(game_id, self._read(game_id))
+        return default if game_state is None else game_state
+
+    async def fetch(self, game_id, default=None):
+        """The session (or `default`), rehydrating it from the archive off the event loop."""
+        game_state = self._touch(game_id)
+        if game_state is not None:
+            return game_state
+        loading = self._loading.get(game_id)
+        if loading is None:
+            # A task of its own, so a cancelled caller cannot drop a session it already took back.
+            loading = self._loading[game_id] = asyncio.ensure_future(self._load(game_id))
+        game_state = await asyncio.shield(loading)
+        return default if game_state is None else game_state
+
+    async def _load(self, game_id):
+        try:
+            return self._install(game_id, await asyncio.to_thread(self._read, game_id))
+        finally:
+            del self._loading[game_id]
+
+    def pop(self, game_id, default=None):
+        game_state = self._touch(game_id)
+        if game_state is None:
+            game_state = self._install(game_id, self._read(game_id), resident=False)
+            if game_state is None:
+                return default
+        self._resident.pop(game_id, None)
+        self._enqueue("delete", game_id)
+        if self.journal is not None:
+            self.journal.forget(game_id)
+        return game_state
+
+    @asynccontextmanager
+    async def checkout(self, game_id):
+        """Yields the session (or None) and keeps it resident until the block exits."""
+        game_state = await self.fetch(game_id)
+        if game_state is None:
+            yield None
+            return
+        self._pins[game_id] = self._pins.get(game_id, 0) + 1
+        try:
+            yield game_state
+        finally:
+            self._pins[game_id] -= 1
+            if not self._pins[game_id]:
+                del self._pins[game_id]
+            if game_id in self._resident:
+                self._resident[game_id] = (game_state, time.monotonic())
+
+    # ---- Rehydration ----
+
+    def _read(self, game_id):
+        """
+        Takes the session back from the hand-off table, or loads it from the archive.
+        Returns (game_state, from_archive, seconds) or None. Safe off the event loop.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            # A session mid-write is left to the writer, then read back from the archive.
+            self._idle.wait_for(lambda: self._writing != game_id)
+            entry = self._hibernating.pop(game_id, None)
+        if entry is not None:
+            return entry[1], False, time.perf_counter() - start
+        blob = self.archive.load(game_id)
+        if blob is None:
+            return None
+        return load_session(blob), True, time.perf_counter() - start
+
+    def _install(self, game_id, loaded, resident: bool = True):
+        """Makes a `_read` result resident again. Runs on the caller's (event loop) thread."""
+        if loaded is None:
+            return None
+        game_state, from_archive, seconds = loaded
+        if from_archive:
+            # Queued ahead of any later hibernation of this game. The writer deletes the
+            # archived copy once the journal's snapshot of it (taken below) is on disk.
+            self._enqueue("delete", game_id)
+        if resident:
+            self[game_id] = game_state
+        if from_archive:
+            self.rehydration_latency.record(seconds)
+            self.rehydrations += 1
+        else:
+            self.reclaimed += 1
+        return game_state
+
+    # ---- Hibernation (writer thread) ----
+
+    def _hibernate(self, game_id):
+        game_state, _ = self._resident.pop(game_id)
+        with self._lock:
+            self._tickets += 1
+            # Only the save queued with this ticket may write it; an older save still queued
+            # for the same game (taken back and hibernated again since) is skipped.
+            self._hibernating[game_id] = (self._tickets, game_state)
+            ticket = self._tickets
+        self._enqueue("save", game_id, ticket)
+
+    def _enqueue(self, op: str, game_id, ticket=None):
+        with self._lock:
+            self._queue.append((op, game_id, ticket))
+            self._wake.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-archive-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wake.wait()
+                op, game_id, ticket = self._queue.popleft()
+                entry = self._hibernating.get(game_id) if op == "save" else None
+                if op == "save" and (entry is None or entry[0] != ticket):
+                    self._idle.notify_all()
+                    continue  # Taken back before the write started.
+                self._writing = game_id
+            try:
+                if op == "save":
+                    self._write(game_id, entry[1])
+                else:
+                    if self.journal is not None:
+                        self.journal.flush()
+                    self.archive.delete(game_id)
+            except Exception as e:
+                # A session that failed to save stays in the hand-off table (and in the journal).
+                self.write_errors += 1
+                print(f"--- WARNING: Session archive {op} failed for {game_id}: {e} ---")
+                with self._lock:
+                    self._writing = None
+                    self._idle.notify_all()
+                continue
+            with self._lock:
+                if op == "save" and self._hibernating.get(game_id) is entry:
+                    del self._hibernating[game_id]
+                self._writing = None
+                self._idle.notify_all()
+
+    def _write(self, game_id, game_state):
+        start = time.perf_counter()
+        self.archive.save(game_id, dump_session(game_state))
+        if self.journal is not None:
+            self.journal.forget(game_id)
+        self.hibernation_latency.record(time.perf_counter() - start)
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Blocks until every queued hibernation and delete has reached the archive."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queue and self._writing is None, timeout)
+
+    def _enforce_limit(self, keep=None):
+        if len(self._resident) <= self.max_resident:
+            return
+        for game_id in list(self._resident):
+            if len(self._resident) <= self.max_resident:
+                break
+            if game_id not in self._pins and game_id != keep:
+                self._hibernate(game_id)
+                self.lru_evictions += 1
+
+    def evict_idle(self) -> int:
+        """Hibernates every unpinned session idle for longer than idle_ttl."""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [game_id for game_id, (_, last_access) in self._resident.items()
+                if last_access < cutoff and game_id not in self._pins]
+        for game_id in idle:
+            self._hibernate(game_id)
+        self.ttl_evictions += len(idle)
+        return len(idle)
+
+    def hibernate_all(self):
+        """Hibernates every unpinned session and waits for the writes (shutdown)."""
+        for game_id in [g for g in self._resident if g not in self._pins]:
+            self._hibernate(game_id)
+        self.flush()
+
+    def purge(self, max_age: float) -> int:
+        return self.archive.purge(max_age)
+
+    def recover(self) -> int:
+        """Restores the sessions that were in memory when the process last stopped."""
+        if self.journal is None:
+            return 0
+        stale = []
+
+        def archived_newer(game_id, state_version):
+            # A row left behind by a crash or a failed delete must not shadow newer journaled turns.
+            blob = self.archive.load(game_id)
+            if blob is None:
+                return False
+            if load_session(blob).state_version >= state_version:
+                return True
+            stale.append(game_id)
+            return False
+
+        recovered = self.journal.recover(skip=archived_newer)
+        now = time.monotonic()
+        for game_id, game_state in recovered:
+            self._resident[game_id] = (game_state, now)
+        for game_id in stale:
+            self._enqueue("delete", game_id)
+        self._enforce_limit()
+        return len(recovered)
+
+    def resident_count(self) -> int:
+        return len(self._resident)
+
+    def sample_resident(self, limit: int) -> list:
+        """Up to `limit` in-memory sessions, most recently used first (for size estimates)."""
+        states = []
+        for entry in reversed(self._resident.values()):
+            if len(states) >= limit:
+                break
+            states.append(entry[0])
+        return states
+
+    def stats(self) -> dict:
+        return {
+            "resident": len(self._resident),
+            "hibernated": self.archived,
+            "hibernating": len(self._hibernating),
+            "pinned": len(self._pins),
+            "max_resident": self.max_resident,
+            "idle_ttl_s": self.idle_ttl,
+            "lru_evictions": self.lru_evictions,
+            "ttl_evictions": self.ttl_evictions,
+            "rehydrations": self.rehydrations,
+            "reclaimed_before_write": self.reclaimed,
+            "archive_write_errors": self.write_errors,
+            "rehydration_latency": self.rehydration_latency.summary(),
+            "hibernation_latency": self.hibernation_latency.summary(),
+            "journal": self.journal.stats() if self.journal is not None else None,
+        }
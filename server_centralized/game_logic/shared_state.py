@@ -0,0 +1,404 @@
+# game_logic/shared_state.py
+# Session storage shared by every worker process. The backend holds the authoritative,
+# versioned copy of each session; each worker keeps a read-through cache of hot sessions
+# and detects concurrent writes with optimistic version checks.
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from .stats import LatencyTracker
+from .turn_journal import TurnJournal, DEFAULT_JOURNAL_ENABLED
+from .session_store import (
+    SessionStore, dump_session, load_session,
+    DEFAULT_MAX_RESIDENT, DEFAULT_IDLE_TTL, DEFAULT_ARCHIVE_PATH, DEFAULT_ARCHIVE_MAX_AGE,
+)
+
+# "local" keeps sessions in this process (single worker). "sqlite" or "sqlite:///path"
+# and "redis://host:port/db" share them between workers and hosts.
+DEFAULT_SESSION_BACKEND = os.getenv("SESSION_BACKEND", "local")
+
+class VersionConflict(Exception):
+    """Another worker saved the session after we loaded it."""
+
+    def __init__(self, game_id: str, expected: int, actual: int):
+        super().__init__(f"Session {game_id} is at version {actual}, expected {expected}")
+        self.game_id = game_id
+        self.expected = expected
+        self.actual = actual
+
+class SessionBackend(ABC):
+    """
+    Versioned blob storage. Version 0 means "does not exist"; every successful save
+    bumps the version by one and fails with VersionConflict if the stored version is
+    not the one the caller loaded. Implementations must be safe to call from any thread.
+    """
+
+    @abstractmethod
+    def load(self, game_id: str):
+        """Returns (version, blob) or None."""
+
+    @abstractmethod
+    def version(self, game_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def save(self, game_id: str, blob: bytes, expected_version: int) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, game_id: str):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def purge(self, max_age: float) -> int:
+        return 0
+
+class SQLiteSessionBackend(SessionBackend):
+    """WAL-mode SQLite file shared by the workers on one host."""
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH, busy_timeout_ms: int = 5000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=busy_timeout_ms / 1000)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_sessions ("
+            " game_id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_shared_updated_at ON shared_sessions (updated_at)")
+
+    def load(self, game_id):
+        with self._lock:
+            row = self._conn.execute("SELECT version, data FROM shared_sessions WHERE game_id = ?", (game_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def version(self, game_id):
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM shared_sessions WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0] if row else 0
+
+    def save(self, game_id, blob, expected_version):
+        with self._lock:
+            if expected_version == 0:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO shared_sessions (game_id, version, data, updated_at) VALUES (?, 1, ?, ?)",
+                    (game_id, blob, time.time()),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE shared_sessions SET version = version + 1, data = ?, updated_at = ?"
+                    " WHERE game_id = ? AND version = ?",
+                    (blob, time.time(), game_id, expected_version),
+                )
+            if cursor.rowcount == 1:
+                return expected_version + 1
+            row = self._conn.execute("SELECT version FROM shared_sessions WHERE game_id = ?", (game_id,)).fetchone()
+        raise VersionConflict(game_id, expected_version, row[0] if row else 0)
+
+    def delete(self, game_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM shared_sessions WHERE game_id = ?", (game_id,))
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM shared_sessions").fetchone()[0]
+
+    def purge(self, max_age):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM shared_sessions WHERE updated_at < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+class KeyValueSessionBackend(SessionBackend):
+    """
+    Sessions in any key-value server that speaks the Redis command subset used here:
+    GET, DEL, SCAN and EVAL of CAS_SCRIPT (a redis-py client, or a stand-in with the
+    same methods). Each session is two keys, `<prefix><id>:v` and `<prefix><id>:data`,
+    updated together by the script and expiring after `ttl` seconds.
+    """
+
+    CAS_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current ~= tonumber(ARGV[1]) then return -current - 1 end
+redis.call('SET', KEYS[1], current + 1)
+redis.call('SET', KEYS[2], ARGV[2])
+if tonumber(ARGV[3]) > 0 then
+  redis.call('EXPIRE', KEYS[1], ARGV[3])
+  redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return current + 1
+"""
+
+    def __init__(self, client, prefix: str = "session:", ttl: float = DEFAULT_ARCHIVE_MAX_AGE):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = int(ttl)
+
+    def _keys(self, game_id):
+        return f"{self.prefix}{game_id}:v", f"{self.prefix}{game_id}:data"
+
+    def load(self, game_id):
+        version_key, data_key = self._keys(game_id)
+        # Read the version on both sides of the data so a save landing in between is noticed.
+        for _ in range(3):
+            before = self.client.get(version_key)
+            blob = self.client.get(data_key)
+            if before is None or blob is None:
+                return None
+            if self.client.get(version_key) == before:
+                return int(before), blob
+        raise VersionConflict(game_id, int(before), int(self.client.get(version_key) or 0))
+
+    def version(self, game_id):
+        value = self.client.get(self._keys(game_id)[0])
+        return int(value) if value is not None else 0
+
+    def save(self, game_id, blob, expected_version):
+        result = int(self.client.eval(self.CAS_SCRIPT, 2, *self._keys(game_id), expected_version, blob, self.ttl))
+        if result < 0:
+            raise VersionConflict(game_id, expected_version, -result - 1)
+        return result
+
+    def delete(self, game_id):
+        self.client.delete(*self._keys(game_id))
+
+    def count(self):
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}*:v"))
+
+class SharedSessionStore:
+    """
+    SessionStore-compatible view of a SessionBackend for multi-worker deployments.
+
+    `checkout()` serves a cached session when the backend's version still matches the
+    one this worker last saw (one small read instead of a blob fetch and unpickle),
+    otherwise it reloads. When the block exits the session is written back with an
+    optimistic version check; if another worker saved in between, VersionConflict is
+    raised and the stale cache entry is dropped.
+
+    `fetch`, `add` and `checkout` run backend reads and writes, pickling included, on a
+    worker thread; the plain dict methods do them inline and are for callers off the loop.
+    """
+
+    def __init__(self, backend: SessionBackend, max_resident: int = DEFAULT_MAX_RESIDENT,
+                 idle_ttl: float = DEFAULT_IDLE_TTL):
+        self.backend = backend
+        self.max_resident = max_resident
+        self.idle_ttl = idle_ttl
+        self.journal = None  # Every checkout is already saved to the backend
+        self._cache = OrderedDict()  # game_id -> [game_state, version, last_access]
+        self._pins = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stale_reloads = 0
+        self.conflicts = 0
+        self.stored = None  # Backend count as of the last len(); stats() never counts (a Redis SCAN)
+        self.load_latency = LatencyTracker()
+        self.save_latency = LatencyTracker()
+
+    def __contains__(self, game_id):
+        return game_id in self._cache or self.backend.version(game_id) > 0
+
+    def __getitem__(self, game_id):
+        game_state = self.get(game_id)
+        if game_state is None:
+            raise KeyError(game_id)
+        return game_state
+
+    def __setitem__(self, game_id, game_state):
+        entry = self._cache.get(game_id)
+        version = self._save(game_id, game_state, entry[1] if entry else 0)
+        self._remember(game_id, game_state, version)
+
+    def __len__(self):
+        self.stored = self.backend.count()
+        return self.stored
+
+    async def add(self, game_id, game_state):
+        entry = self._cache.get(game_id)
+        version = await asyncio.to_thread(self._save, game_id, game_state, entry[1] if entry else 0)
+        self._remember(game_id, game_state, version)
+
+    def get(self, game_id, default=None):
+        entry = self._fresh_entry(game_id)
+        return default if entry is None else entry[0]
+
+    async def fetch(self, game_id, default=None):
+        entry = await self._fresh_entry_async(game_id)
+        return default if entry is None else entry[0]
+
+    def pop(self, game_id, default=None):
+        entry = self._fresh_entry(game_id)
+        if entry is None:
+            return default
+        self._cache.pop(game_id, None)
+        self.backend.delete(game_id)
+        return entry[0]
+
+    @asynccontextmanager
+    async def checkout(self, game_id):
+        """Yields the latest session (or None) and saves it back when the block exits."""
+        entry = await self._fresh_entry_async(game_id)
+        if entry is None:
+            yield None
+            return
+        self._pins[game_id] = self._pins.get(game_id, 0) + 1
+        try:
+            yield entry[0]
+        except BaseException:
+            # The turn may have half-applied; let the next request reload the saved copy.
+            if self._unpin(game_id):
+                self._cache.pop(game_id, None)
+            raise
+        self._unpin(game_id)
+        try:
+            entry[1] = await asyncio.to_thread(self._save, game_id, entry[0], entry[1])
+        except VersionConflict:
+            self._cache.pop(game_id, None)
+            raise
+
+    def _unpin(self, game_id) -> bool:
+        """Releases one pin; True if that was the last one."""
+        self._pins[game_id] -= 1
+        if self._pins[game_id]:
+            return False
+        del self._pins[game_id]
+        return True
+
+    def _fresh_entry(self, game_id):
+        entry = self._cache.get(game_id)
+        # Pinned sessions are mid-turn in this worker; the copy in memory is the newest.
+        if entry is not None and (game_id in self._pins or self.backend.version(game_id) == entry[1]):
+            return self._hit(game_id, entry)
+        return self._reloaded(game_id, entry, self._load(game_id))
+
+    async def _fresh_entry_async(self, game_id):
+        entry = self._cache.get(game_id)
+        if entry is not None:
+            if game_id in self._pins:
+                return self._hit(game_id, entry)
+            version = await asyncio.to_thread(self.backend.version, game_id)
+            if self._cache.get(game_id) is entry and version == entry[1]:
+                return self._hit(game_id, entry)
+        loaded = await asyncio.to_thread(self._load, game_id)
+        pinned = self._cache.get(game_id)
+        if pinned is not None and game_id in self._pins:
+            # Checked out while this load was in flight; that copy is mid-turn and newest.
+            return self._hit(game_id, pinned)
+        return self._reloaded(game_id, entry, loaded)
+
+    def _hit(self, game_id, entry):
+        self.cache_hits += 1
+        entry[2] = time.monotonic()
+        self._cache.move_to_end(game_id)
+        return entry
+
+    def _load(self, game_id):
+        """Reads and unpickles the stored session: (version, game_state, seconds) or None."""
+        start = time.perf_counter()
+        loaded = self.backend.load(game_id)
+        if loaded is None:
+            return None
+        version, blob = loaded
+        return version, load_session(blob), time.perf_counter() - start
+
+    def _reloaded(self, game_id, stale_entry, loaded):
+        if stale_entry is not None:
+            self.stale_reloads += 1
+        self.cache_misses += 1
+        if loaded is None:
+            self._cache.pop(game_id, None)
+            return None
+        version, game_state, seconds = loaded
+        self.load_latency.record(seconds)
+        return self._remember(game_id, game_state, version)
+
+    def _save(self, game_id, game_state, expected_version):
+        start = time.perf_counter()
+        try:
+            version = self.backend.save(game_id, dump_session(game_state), expected_version)
+        except VersionConflict:
+            self.conflicts += 1
+            raise
+        self.save_latency.record(time.perf_counter() - start)
+        return version
+
+    def _remember(self, game_id, game_state, version):
+        entry = [game_state, version, time.monotonic()]
+        self._cache[game_id] = entry
+        self._cache.move_to_end(game_id)
+        for cached_id in list(self._cache):
+            if len(self._cache) <= self.max_resident:
+                break
+            if cached_id not in self._pins:
+                del self._cache[cached_id]
+        return entry
+
+    def evict_idle(self) -> int:
+        """Drops unpinned sessions idle for longer than idle_ttl from this worker's cache."""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [game_id for game_id, entry in self._cache.items()
+                if entry[2] < cutoff and game_id not in self._pins]
+        for game_id in idle:
+            del self._cache[game_id]
+        return len(idle)
+
+    def hibernate_all(self):
+        # Every checkout already wrote its session back; only the cache needs clearing.
+        for game_id in [g for g in self._cache if g not in self._pins]:
+            del self._cache[game_id]
+
+    def purge(self, max_age: float) -> int:
+        return self.backend.purge(max_age)
+
+    def recover(self) -> int:
+        return 0
+
+    def resident_count(self) -> int:
+        return len(self._cache)
+
+    def sample_resident(self, limit: int) -> list:
+        """Up to `limit` cached sessions, most recently used first (for size estimates)."""
+        states = []
+        for entry in reversed(self._cache.values()):
+            if len(states) >= limit:
+                break
+            states.append(entry[0])
+        return states
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "cached": len(self._cache),
+            "stored": self.stored,
+            "pinned": len(self._pins),
+            "max_resident": self.max_resident,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "stale_reloads": self.stale_reloads,
+            "version_conflicts": self.conflicts,
+            "load_latency": self.load_latency.summary(),
+            "save_latency": self.save_latency.summary(),
+        }
+
+def create_session_store(spec: str = DEFAULT_SESSION_BACKEND):
+    """Builds the session store named by SESSION_BACKEND."""
+    if spec == "local":
+        return SessionStore(journal=TurnJournal() if DEFAULT_JOURNAL_ENABLED else None)
+    if spec == "sqlite" or spec.startswith("sqlite:///"):
+        return SharedSessionStore(SQLiteSessionBackend(spec[len("sqlite:///"):] or DEFAULT_ARCHIVE_PATH))
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND is a Redis URL but the 'redis' package is not installed.")
+        return SharedSessionStore(KeyValueSessionBackend(redis.Redis.from_url(spec)))
+    raise ValueError(f"Unknown SESSION_BACKEND: {spec}")
@@ -0,0 +1,162 @@
+# game_logic/speculation.py
+# Optional speculative prefetch: after a turn, generate the villager's reply to each of
+# the suggested player responses in the background, and commit one instantly if the
+# player picks it before anything else changes the game.
+
+import os
+import math
+import asyncio
+from collections import OrderedDict
+
+DEFAULT_SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "0").lower() in ("1", "true", "yes")
+DEFAULT_SPECULATION_BUDGET = int(os.getenv("SPECULATION_BUDGET", "30"))  # Speculative calls per game
+DEFAULT_SPECULATION_MAX_GAMES = int(os.getenv("SPECULATION_MAX_GAMES", "1000"))
+# Share of the LLM concurrency limit speculation always leaves free for real turns.
+DEFAULT_SPECULATION_HEADROOM = float(os.getenv("SPECULATION_HEADROOM", "0.25"))
+
+def _normalize(text) -> str:
+    return " ".join(str(text).split()).casefold()
+
+class _Speculation:
+    __slots__ = ("state_version", "npc_name", "tasks")
+
+    def __init__(self, state_version: int, npc_name: str):
+        self.state_version = state_version
+        self.npc_name = npc_name
+        self.tasks = {}  # normalized suggestion -> (task, usage)
+
+class Speculator:
+    """
+    At most one batch of speculative replies per game: the replies to the suggestions of
+    the game's latest turn. A batch is only used if the next turn is with the same
+    villager, its player_prompt matches a suggestion, and GameState.state_version has not
+    moved since the batch was launched; otherwise the whole batch is discarded and its
+    tokens are counted as wasted.
+
+    Speculative calls never crowd out real ones: a batch only launches as many calls as
+    there are free LLM slots beyond the headroom, counting speculative calls that are
+    still running (they may be between retries, or about to hedge) as holding one. The
+    rest of the batch is skipped, as is everything once the game has spent its budget.
+    """
+
+    def __init__(self, llm_api, enabled: bool = DEFAULT_SPECULATION_ENABLED,
+                 budget_per_game: int = DEFAULT_SPECULATION_BUDGET, max_games: int = DEFAULT_SPECULATION_MAX_GAMES,
+                 headroom: float = DEFAULT_SPECULATION_HEADROOM):
+        self.llm_api = llm_api
+        self.enabled = enabled
+        self.budget_per_game = budget_per_game
+        self.max_games = max_games
+        self.headroom = headroom
+        self.running = 0  # Speculative calls launched and not finished
+        self._pending = OrderedDict()  # game_id -> _Speculation
+        self._spent = OrderedDict()  # game_id -> speculative calls launched
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.skipped_budget = 0
+        self.skipped_busy = 0
+        self.wasted_calls = 0
+        self.wasted_tokens = 0
+        self.used_tokens = 0
+
+    def launch(self, game_state, npc_name: str, suggestions, build_context):
+        """Starts one background Interaction call per suggestion. `build_context(player_input)`
+        must return the interaction context for the current, just-committed state."""
+        if not self.enabled or not suggestions:
+            return
+        self.discard(game_state.game_id)
+        originals = {}
+        for suggestion in suggestions:
+            if isinstance(suggestion, str) and suggestion.strip():
+                originals.setdefault(_normalize(suggestion), suggestion)
+        keys = list(originals)
+        spent = self._spent.get(game_state.game_id, 0)
+        allowed = max(0, self.budget_per_game - spent)
+        if allowed < len(keys):
+            self.skipped_budget += len(keys) - allowed
+            keys = keys[:allowed]
+        if not keys:
+            return
+        reserved = math.ceil(self.llm_api.max_concurrency * self.headroom)
+        slots = max(0, self.llm_api.free_slots() - self.running - reserved)
+        if slots < len(keys):
+            self.skipped_busy += len(keys) - slots
+            keys = keys[:slots]
+        if not keys:
+            return
+
+        speculation = _Speculation(game_state.state_version, npc_name)
+        for key in keys:
+            usage = {}
+            context = build_context(originals[key])
+            task = asyncio.ensure_future(self.llm_api.generate_content_async("Interaction", context, usage=usage))
+            task.add_done_callback(self._finished)
+            speculation.tasks[key] = (task, usage)
+        self.running += len(speculation.tasks)
+        self.launched += len(speculation.tasks)
+        self._spent[game_state.game_id] = spent + len(speculation.tasks)
+        self._spent.move_to_end(game_state.game_id)
+        self._pending[game_state.game_id] = speculation
+        while len(self._pending) > self.max_games:
+            self.discard(next(iter(self._pending)))
+        while len(self._spent) > self.max_games * 4:
+            self._spent.popitem(last=False)
+
+    async def take(self, game_state, npc_name: str, player_input: str):
+        """The prefetched raw reply for this turn, or None. Always consumes the game's batch."""
+        speculation = self._pending.pop(game_state.game_id, None)
+        if speculation is None:
+            return None
+        if speculation.state_version != game_state.state_version or speculation.npc_name != npc_name:
+            self.stale += 1
+            self._waste(speculation.tasks.values())
+            return None
+        match = speculation.tasks.pop(_normalize(player_input), None)
+        self._waste(speculation.tasks.values())
+        if match is None:
+            self.misses += 1
+            return None
+        task, usage = match
+        reply = await task
+        if reply == "{}":
+            # The speculative call failed; let the caller make a real one.
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used_tokens += usage.get("prompt_tokens", 0) + usage.get("output_tokens", 0)
+        return reply
+
+    def _finished(self, task):
+        self.running -= 1
+
+    def discard(self, game_id: str):
+        speculation = self._pending.pop(game_id, None)
+        if speculation is not None:
+            self._waste(speculation.tasks.values())
+
+    def _waste(self, entries):
+        for task, usage in entries:
+            if not task.done():
+                task.cancel()
+            self.wasted_calls += 1
+            self.wasted_tokens += usage.get("prompt_tokens", 0) + usage.get("output_tokens", 0)
+
+    def stats(self) -> dict:
+        decided = self.hits + self.misses + self.stale
+        return {
+            "enabled": self.enabled,
+            "budget_per_game": self.budget_per_game,
+            "launched": self.launched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / decided, 4) if decided else None,
+            "skipped_budget": self.skipped_budget,
+            "skipped_busy": self.skipped_busy,
+            "running": self.running,
+            "pending_games": len(self._pending),
+            "wasted_calls": self.wasted_calls,
+            "wasted_tokens": self.wasted_tokens,
+            "used_tokens": self.used_tokens,
+        }
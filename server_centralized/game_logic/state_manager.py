@@ -1,19 +1,124 @@
 # game_logic/state_manager.py
 # Defines the GameState class, which holds all dynamic data for a single playthrough.
+# Per-villager data is stored in arrays indexed by the villager's roster position, and
+# the roster itself is shared between sessions until one needs to change it.
+
+import sys
+from array import array
+from enum import IntEnum
+from .roster import DEFAULT_ROSTER
+
+INITIAL_KNOWLEDGE_SUMMARY = "You've just woken up in a cozy cottage. A kind old man named Arthur tells you he found you unconscious by a car wreck on the edge of the woods. He says he searched the area but saw no sign of your friends. As he speaks, you remember a faint, desperate call in your mind: 'Help us... find us...' You've just thanked him and stepped outside into the village square to begin your search."
+
+MAX_FAMILIARITY = 5
+
+class Role(IntEnum):
+    PLAYER = 0
+    NPC = 1
+
+ROLE_NAMES = ("player", "npc")
+
+class TurnLog:
+    """One villager's conversation: speaker roles in a byte array, texts in a list."""
+    __slots__ = ("roles", "contents")
+
+    def __init__(self):
+        self.roles = array("b")
+        self.contents = []
+
+    def append(self, role: Role, content):
+        self.roles.append(role)
+        self.contents.append(content)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __iter__(self):
+        return zip(map(Role, self.roles), self.contents)
+
+    def as_messages(self, start: int = 0, end: int = None) -> list:
+        """The [{"role": ..., "content": ...}] form used in prompts."""
+        return [{"role": ROLE_NAMES[role], "content": content}
+                for role, content in zip(self.roles[start:end], self.contents[start:end])]
+
+class ConversationSummary:
+    """Rolling summary of the turns that have aged out of the prompt window."""
+    __slots__ = ("folded", "omitted", "lines", "measured", "memory_tokens")
+
+    def __init__(self):
+        self.folded = 0
+        self.omitted = 0
+        self.lines = []
+        self.measured = 0
+        self.memory_tokens = 0
+
+class PlayerState:
+    __slots__ = ("discovered_nodes", "knowledge_summary", "familiarity", "unproductive_turns")
+
+    def __init__(self, num_villagers: int):
+        self.discovered_nodes = []
+        self.knowledge_summary = INITIAL_KNOWLEDGE_SUMMARY
+        self.familiarity = array("b", bytes(num_villagers))
+        self.unproductive_turns = array("H", bytes(2 * num_villagers)) # Tracks turns since last clue for each villager
 
 class GameState:
-    def __init__(self, game_id: str, difficulty: str):
+    __slots__ = (
+        "game_id", "difficulty", "correct_location", "story_theme", "inaccessible_locations",
+        "quest_network", "quest_graph", "villagers", "player_state", "full_npc_memory",
+        "conversation_summaries", "response_bank", "opening_lines", "state_version",
+    )
+
+    def __init__(self, game_id: str, difficulty: str, villagers=DEFAULT_ROSTER):
         self.game_id = game_id
-        self.difficulty = difficulty
+        self.difficulty = sys.intern(difficulty)
         self.correct_location = ""
         self.story_theme = ""
-        self.inaccessible_locations = []
+        self.inaccessible_locations = ()
         self.quest_network = {"nodes": []}
-        self.villagers = [] # Each game session will store its own list of villagers
-        self.player_state = {
-            "discovered_nodes": [],
-            "knowledge_summary": "You've just woken up in a cozy cottage...",
-            "familiarity": {},
-            "unproductive_turns": {} # Tracks turns since last clue for each villager
-        }
-        self.full_npc_memory = {}
\ No newline at end of file
+        self.quest_graph = None # QuestGraph index over quest_network, built by the engine
+        self.villagers = villagers # Shared Roster; replaced by a private copy on first override
+        self.player_state = PlayerState(len(villagers))
+        self.full_npc_memory = tuple(TurnLog() for _ in villagers)
+        self.conversation_summaries = [None] * len(villagers) # ConversationSummary per villager, created lazily
+        self.response_bank = None # ResponseBank of pre-written closing lines, if the world came with one
+        self.opening_lines = None # Per-villager pre-written first turn; cleared once served
+        self.state_version = 0 # Bumped by every applied turn
+
+    def villager_index(self, npc_name: str) -> int:
+        index = self.villagers.index_of(npc_name)
+        if index is None:
+            raise KeyError(f"Unknown villager: {npc_name}")
+        return index
+
+    def memory_of(self, npc_name: str) -> TurnLog:
+        return self.full_npc_memory[self.villager_index(npc_name)]
+
+    def familiarity_of(self, npc_name: str) -> int:
+        index = self.villagers.index_of(npc_name)
+        return 0 if index is None else self.player_state.familiarity[index]
+
+    def set_familiarity(self, npc_name: str, level: int):
+        self.player_state.familiarity[self.villager_index(npc_name)] = max(0, min(MAX_FAMILIARITY, level))
+
+    def summary_of(self, npc_name: str) -> ConversationSummary:
+        index = self.villager_index(npc_name)
+        summary = self.conversation_summaries[index]
+        if summary is None:
+            summary = self.conversation_summaries[index] = ConversationSummary()
+        return summary
+
+    def override_villager(self, index: int, **changes):
+        """Copy-on-write: the first change gives this session its own roster."""
+        self.villagers = self.villagers.replace(index, **changes)
+
+    def __getstate__(self):
+        # The QuestGraph index is rebuilt from quest_network on demand; don't persist it.
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state["quest_graph"] = None
+        return state
+
+    def __setstate__(self, state):
+        for slot in self.__slots__:
+            setattr(self, slot, state.get(slot))
+        if self.state_version is None:
+            self.state_version = 0
@@ -0,0 +1,56 @@
+# game_logic/stats.py
+# Small, dependency-free helpers for recording latency samples and reporting percentiles.
+
+import time
+from collections import deque
+
+class LatencyTracker:
+    """Keeps a bounded window of recent samples (in seconds) plus lifetime count/total."""
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def time(self):
+        return _Timer(self)
+
+    def percentile(self, pct: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+class _Timer:
+    def __init__(self, tracker: LatencyTracker):
+        self.tracker = tracker
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracker.record(time.perf_counter() - self.start)
+        return False
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Gemini on English text)."""
+    return (len(text) + 3) // 4
@@ -0,0 +1,101 @@
+# game_logic/stream_parser.py
+# Incremental JSON scanner that surfaces one top-level string field while the model is
+# still producing the rest of the object.
+
+import json
+
+class DialogueStreamParser:
+    """
+    Feed raw model output chunks in; get back the newly decoded characters of `field`.
+
+    Only the top-level object is tracked. Anything before the first '{' (such as a
+    ```json fence) is ignored, and the full raw text is kept in `self.raw` so the
+    caller can still json.loads the complete object once the stream ends.
+    """
+
+    def __init__(self, field: str = "npc_dialogue"):
+        self.field = field
+        self.raw = []
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.string_is_key = False
+        self.emitting = False
+        self.expect_key = False
+        self.last_key = None
+        self.key_chars = []
+        self.escape = None  # pending escape sequence text, e.g. "\\u00"
+        self.field_complete = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw.append(chunk)
+        out = []
+        for ch in chunk:
+            if self.in_string:
+                self._consume_string_char(ch, out)
+                continue
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                    self.expect_key = True
+                continue
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = self.depth == 1 and self.expect_key
+                self.emitting = self.depth == 1 and not self.string_is_key and self.last_key == self.field
+                self.key_chars = []
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+            elif self.depth == 1 and ch == ":":
+                self.expect_key = False
+            elif self.depth == 1 and ch == ",":
+                self.expect_key = True
+        return "".join(out)
+
+    def _consume_string_char(self, ch, out):
+        if self.escape is not None:
+            self.escape += ch
+            decoded = self._decode_escape()
+            if decoded is not None:
+                self._emit(decoded, out)
+            return
+        if ch == "\\":
+            self.escape = "\\"
+            return
+        if ch == '"':
+            self.in_string = False
+            if self.string_is_key:
+                self.last_key = json.loads('"' + "".join(self.key_chars) + '"')
+            elif self.emitting:
+                self.emitting = False
+                self.field_complete = True
+            return
+        self._emit(ch, out)
+
+    def _decode_escape(self):
+        seq = self.escape
+        if seq[1] != "u":
+            if len(seq) < 2:
+                return None
+        elif len(seq) < 6:
+            return None
+        elif 0xD800 <= int(seq[2:6], 16) <= 0xDBFF and len(seq) < 12:
+            # High surrogate: wait for the low half so the pair decodes as one character.
+            return None
+        self.escape = None
+        if self.string_is_key:
+            return seq
+        return json.loads('"' + seq + '"')
+
+    def _emit(self, text, out):
+        if self.string_is_key:
+            self.key_chars.append(text)
+        elif self.emitting:
+            out.append(text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.raw)
@@ -0,0 +1,381 @@
+# game_logic/turn_journal.py
+# Write-ahead journal for live sessions held in this process. Every applied turn appends a
+# small delta record, and every game is snapshotted when it enters memory and again every
+# few turns. A writer thread commits whatever has queued up with one write and one fsync
+# (group commit). After a crash, the latest snapshot of each game plus the deltas after it
+# rebuild the session.
+
+import os
+import time
+import zlib
+import pickle
+import struct
+import asyncio
+import threading
+from collections import deque
+from .stats import LatencyTracker
+from .quest_graph import QuestGraph
+from .state_manager import Role
+
+DEFAULT_JOURNAL_ENABLED = os.getenv("TURN_JOURNAL_ENABLED", "1") != "0"
+DEFAULT_JOURNAL_DIR = os.getenv("TURN_JOURNAL_DIR", "journal")
+# A game is snapshotted again after this many journaled turns, bounding its replay.
+DEFAULT_SNAPSHOT_EVERY = int(os.getenv("TURN_JOURNAL_SNAPSHOT_EVERY", "50"))
+DEFAULT_SEGMENT_BYTES = int(os.getenv("TURN_JOURNAL_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Extra time the writer waits for more records before committing a group (0: commit as
+# soon as the previous fsync returns, which batches naturally under load).
+DEFAULT_COMMIT_DELAY = float(os.getenv("TURN_JOURNAL_COMMIT_DELAY_MS", "0")) / 1000
+DEFAULT_FSYNC = os.getenv("TURN_JOURNAL_FSYNC", "1") != "0"
+
+_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+
+# Record kinds
+SNAPSHOT, TURN, FORGET = "s", "t", "f"
+
+def apply_turn_delta(game_state, delta):
+    """Replays one journaled turn onto a session. Returns True if it revealed a node."""
+    (version, villager_index, player_input, npc_dialogue, familiarity, revealed_node_id,
+     opening_cleared, bank_used) = delta
+    memory = game_state.full_npc_memory[villager_index]
+    memory.append(Role.PLAYER, player_input)
+    memory.append(Role.NPC, npc_dialogue)
+    game_state.player_state.familiarity[villager_index] = familiarity
+    if opening_cleared and game_state.opening_lines is not None:
+        game_state.opening_lines[villager_index] = None
+    if game_state.response_bank is not None:
+        for kind, band, used in bank_used:
+            game_state.response_bank.used[(villager_index, kind, band)] = used
+    game_state.state_version = version
+    if revealed_node_id:
+        game_state.player_state.discovered_nodes.append(revealed_node_id)
+        return True
+    return False
+
+class _Recovered:
+    __slots__ = ("snapshot", "deltas", "frames")
+
+    def __init__(self, snapshot, frame):
+        self.snapshot = snapshot
+        self.deltas = []
+        self.frames = [frame]
+
+class TurnJournal:
+    """
+    Append-only segment files (journal-<n>.log) of length- and CRC-framed pickled records:
+
+      ("s", game_id, state_version, compressed pickle)   snapshot
+      ("t", game_id, delta)                              turn, see apply_turn_delta
+      ("f", game_id)                                     left memory (hibernated or ended)
+
+    Records are appended from the event loop and pickled by the writer, so they only hold
+    immutable values. `sync()` waits until everything appended so far is on disk; callers
+    awaiting it in the same window share one fsync. A segment is deleted once no game in
+    memory needs its snapshot.
+    """
+
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+                 segment_bytes: int = DEFAULT_SEGMENT_BYTES, commit_delay: float = DEFAULT_COMMIT_DELAY,
+                 fsync: bool = DEFAULT_FSYNC):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.segment_bytes = segment_bytes
+        self.commit_delay = commit_delay
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._pending = []
+        self._waiters = deque()  # (seq, future), seq ascending
+        self._appended = 0
+        self._durable_seq = 0
+        self._closing = False
+        self._thread = None
+        self._file = None
+        self._segment = 0
+        self._size = 0
+        self._turns_since_snapshot = {}  # event loop: game_id -> journaled turns since its snapshot
+        self._snapshot_segment = {}  # writer thread: game_id -> segment holding its latest snapshot
+        self.records = 0
+        self.snapshots = 0
+        self.turns = 0
+        self.commits = 0
+        self.bytes_written = 0
+        self.segments_deleted = 0
+        self.write_errors = 0
+        self.recovered = 0
+        self.recovery_seconds = None
+        self.commit_latency = LatencyTracker()
+        self.group_sizes = deque(maxlen=1024)
+
+    # ---- Appending (event loop) ----
+
+    def _append(self, record) -> int:
+        with self._lock:
+            self._pending.append(record)
+            self._appended += 1
+            seq = self._appended
+            self._wake.notify()
+        if self._thread is None:
+            self._start()
+        return seq
+
+    def snapshot(self, game_id: str, game_state) -> int:
+        self._turns_since_snapshot[game_id] = 0
+        self.snapshots += 1
+        return self._append((SNAPSHOT, game_id, game_state.state_version,
+                             pickle.dumps(game_state, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def record_turn(self, game_state, villager_index: int, player_input, npc_dialogue, revealed_node_id) -> int:
+        """Journals a turn that has just been applied to `game_state`."""
+        game_id = game_state.game_id
+        turns = self._turns_since_snapshot.get(game_id, 0) + 1
+        if turns >= self.snapshot_every:
+            return self.snapshot(game_id, game_state)
+        self._turns_since_snapshot[game_id] = turns
+        self.turns += 1
+        opening_lines = game_state.opening_lines
+        bank = game_state.response_bank
+        bank_used = () if bank is None else tuple(
+            (kind, band, used) for (index, kind, band), used in bank.used.items() if index == villager_index)
+        return self._append((TURN, game_id, (
+            game_state.state_version, villager_index, player_input, npc_dialogue,
+            game_state.player_state.familiarity[villager_index], revealed_node_id,
+            opening_lines is not None and opening_lines[villager_index] is None, bank_used,
+        )))
+
+    def forget(self, game_id: str) -> int:
+        """The session left memory (hibernated to the archive or ended); recovery skips it."""
+        self._turns_since_snapshot.pop(game_id, None)
+        return self._append((FORGET, game_id))
+
+    async def sync(self):
+        """Waits until every record appended so far has been committed."""
+        seq = self._appended
+        with self._lock:
+            if self._durable_seq >= seq:
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((seq, future))
+        await future
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Blocking sync() for callers outside the event loop's await points."""
+        seq = self._appended
+        with self._lock:
+            return self._durable.wait_for(lambda: self._durable_seq >= seq, timeout)
+
+    # ---- Writer thread ----
+
+    def _start(self):
+        self._open_segment(self._next_segment_number())
+        self._thread = threading.Thread(target=self._run, name="turn-journal-writer", daemon=True)
+        self._thread.start()
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"journal-{number:06d}.log")
+
+    def _segment_numbers(self) -> list:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".log"):
+                numbers.append(int(name[len("journal-"):-len(".log")]))
+        return sorted(numbers)
+
+    def _next_segment_number(self) -> int:
+        numbers = self._segment_numbers()
+        return numbers[-1] + 1 if numbers else 1
+
+    def _open_segment(self, number: int):
+        self._segment = number
+        self._file = open(self._segment_path(number), "ab")
+        self._size = self._file.tell()
+        self._sync_directory()
+
+    def _sync_directory(self):
+        if self.fsync and hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _frame(self, record) -> bytes:
+        if record[0] == SNAPSHOT:
+            kind, game_id, version, state = record
+            record = (kind, game_id, version, zlib.compress(state, 1))
+            self._snapshot_segment[game_id] = self._segment
+        elif record[0] == FORGET:
+            self._snapshot_segment.pop(record[1], None)
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._wake.wait()
+                if not self._pending:
+                    break
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                seq = self._appended
+            start = time.perf_counter()
+            try:
+                self._commit(batch)
+            except OSError as e:
+                # The turns are applied in memory either way; they just are not crash-safe.
+                self.write_errors += 1
+                print(f"--- WARNING: Turn journal write failed, {len(batch)} records not durable: {e} ---")
+            self.commit_latency.record(time.perf_counter() - start)
+            self.commits += 1
+            self.records += len(batch)
+            self.group_sizes.append(len(batch))
+            self._release(seq)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _commit(self, batch):
+        data = b"".join(self._frame(record) for record in batch)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += len(data)
+        self.bytes_written += len(data)
+        if self._size >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._open_segment(self._segment + 1)
+        # Games without a snapshot in the new segment still pin the segment holding theirs.
+        oldest_needed = min(self._snapshot_segment.values(), default=self._segment)
+        for number in self._segment_numbers():
+            if number >= oldest_needed:
+                break
+            os.remove(self._segment_path(number))
+            self.segments_deleted += 1
+
+    def _release(self, seq: int):
+        with self._lock:
+            self._durable_seq = seq
+            self._durable.notify_all()
+            ready = []
+            while self._waiters and self._waiters[0][0] <= seq:
+                ready.append(self._waiters.popleft()[1])
+        for future in ready:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    def close(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        with self._lock:
+            self._closing = True
+            self._wake.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---- Recovery ----
+
+    def _read_segment(self, number: int):
+        """Yields (record, frame bytes); stops at a torn or corrupt tail."""
+        with open(self._segment_path(number), "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, offset)
+            end = offset + _HEADER.size + length
+            payload = data[offset + _HEADER.size:end]
+            if end > len(data) or zlib.crc32(payload) != crc:
+                print(f"--- WARNING: Turn journal segment {number} ends in a torn record at byte {offset}; ignoring the rest. ---")
+                return
+            yield pickle.loads(payload), data[offset:end]
+            offset = end
+
+    def recover(self, skip=None) -> list:
+        """
+        Rebuilds the sessions that were in memory when the process stopped, as
+        [(game_id, game_state)], and rewrites their records into a fresh segment so the old
+        ones can be deleted. `skip(game_id, state_version)` is given the game's latest
+        journaled version and excludes games whose archived copy is at least that new.
+        Must run before anything is appended.
+        """
+        start = time.perf_counter()
+        games = {}
+        numbers = self._segment_numbers()
+        for number in numbers:
+            for record, frame in self._read_segment(number):
+                kind, game_id = record[0], record[1]
+                if kind == SNAPSHOT:
+                    games[game_id] = _Recovered(record, frame)
+                elif kind == TURN:
+                    entry = games.get(game_id)
+                    if entry is not None:
+                        entry.deltas.append(record[2])
+                        entry.frames.append(frame)
+                else:
+                    games.pop(game_id, None)
+
+        recovered = []
+        for game_id, entry in games.items():
+            version = max(entry.snapshot[2], entry.deltas[-1][0] if entry.deltas else 0)
+            if skip is not None and skip(game_id, version):
+                continue
+            game_state = pickle.loads(zlib.decompress(entry.snapshot[3]))
+            revealed = False
+            for delta in entry.deltas:
+                if delta[0] > game_state.state_version:
+                    revealed = apply_turn_delta(game_state, delta) or revealed
+            if revealed:
+                game_state.quest_graph = QuestGraph.from_state(game_state.quest_network,
+                                                               game_state.player_state.discovered_nodes)
+                game_state.player_state.knowledge_summary = game_state.quest_graph.knowledge_summary()
+            recovered.append((game_id, game_state, entry))
+
+        # Carry the surviving records over verbatim, then drop every older segment.
+        self._open_segment((numbers[-1] + 1) if numbers else 1)
+        data = b"".join(b"".join(entry.frames) for _, _, entry in recovered)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size = len(data)
+        for number in numbers:
+            os.remove(self._segment_path(number))
+        for game_id, _, entry in recovered:
+            self._snapshot_segment[game_id] = self._segment
+            self._turns_since_snapshot[game_id] = len(entry.deltas)
+        self._thread = threading.Thread(target=self._run, name="turn-journal-writer", daemon=True)
+        self._thread.start()
+
+        self.recovered = len(recovered)
+        self.recovery_seconds = time.perf_counter() - start
+        return [(game_id, game_state) for game_id, game_state, _ in recovered]
+
+    def stats(self) -> dict:
+        groups = list(self.group_sizes)
+        return {
+            "directory": self.directory,
+            "segment": self._segment,
+            "segment_bytes": self._size,
+            "fsync": self.fsync,
+            "records": self.records,
+            "turns": self.turns,
+            "snapshots": self.snapshots,
+            "commits": self.commits,
+            "mean_group_size": round(sum(groups) / len(groups), 2) if groups else None,
+            "commit_latency": self.commit_latency.summary(),
+            "bytes_written": self.bytes_written,
+            "segments_deleted": self.segments_deleted,
+            "write_errors": self.write_errors,
+            "recovered_games": self.recovered,
+            "recovery_seconds": None if self.recovery_seconds is None else round(self.recovery_seconds, 3),
+        }
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
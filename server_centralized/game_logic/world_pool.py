@@ -0,0 +1,122 @@
+# game_logic/world_pool.py
+# Keeps a stock of pre-generated worlds (story, quest network, pre-written lines) so /game/new
+# does not have to wait on back-to-back LLM calls.
+
+import os
+import time
+import asyncio
+import traceback
+from collections import deque
+from .stats import LatencyTracker
+
+DEFAULT_POOL_SIZE = int(os.getenv("WORLD_POOL_SIZE", "2"))
+# Comma separated "difficulty:num_inaccessible_locations" keys to fill at startup.
+DEFAULT_PREWARM = os.getenv("WORLD_POOL_PREWARM", "Easy:5,Medium:5,Hard:5")
+
+def parse_pool_keys(spec: str):
+    keys = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        difficulty, _, count = item.rpartition(":")
+        keys.append((difficulty, int(count)))
+    return keys
+
+class WorldPool:
+    """
+    Per-(difficulty, num_inaccessible_locations) queues of ready worlds.
+
+    `generate_world` is an async callable returning a (story_idea, quest_network,
+    response_bank_data, opening_lines_data) tuple.
+    Only keys registered with `warm` are pooled; /game/new accepts any difficulty and count,
+    and pooling whatever a client sends would spend a full pool of world generations per
+    new key. Every `take` on a pooled key tops it back up to `target_size`, generating the
+    missing worlds concurrently.
+    """
+
+    def __init__(self, generate_world, target_size: int = DEFAULT_POOL_SIZE, max_failures: int = 3):
+        self.generate_world = generate_world
+        self.target_size = target_size
+        self.max_failures = max_failures
+        self.worlds: dict[tuple, deque] = {}
+        self._refill_tasks: dict[tuple, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.unpooled = 0
+        self.refill_failures = 0
+        self.refill_latency = LatencyTracker()
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def take(self, difficulty: str, num_inaccessible_locations: int):
+        """Pops a ready world for the key, or returns None on a miss or an unpooled key. Never blocks."""
+        if not self.enabled:
+            return None
+        key = (difficulty, num_inaccessible_locations)
+        ready = self.worlds.get(key)
+        if ready is None:
+            self.unpooled += 1
+            return None
+        world = ready.popleft() if ready else None
+        if world is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._schedule_refill(key)
+        return world
+
+    def warm(self, keys):
+        for difficulty, num_inaccessible_locations in keys:
+            key = (difficulty, num_inaccessible_locations)
+            self.worlds.setdefault(key, deque())
+            self._refill_tasks.setdefault(key, set())
+            self._schedule_refill(key)
+
+    def _schedule_refill(self, key):
+        if not self.enabled:
+            return
+        tasks = self._refill_tasks[key]
+        missing = self.target_size - len(self.worlds[key]) - len(tasks)
+        for _ in range(missing):
+            task = asyncio.create_task(self._refill_one(key))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def _refill_one(self, key):
+        difficulty, num_inaccessible_locations = key
+        for failures in range(1, self.max_failures + 1):
+            start = time.perf_counter()
+            try:
+                world = await self.generate_world(num_inaccessible_locations, difficulty)
+            except Exception:
+                self.refill_failures += 1
+                print(f"--- WARNING: World pool refill failed for {key} (attempt {failures}) ---")
+                traceback.print_exc()
+                await asyncio.sleep(2 ** failures)
+                continue
+            self.refill_latency.record(time.perf_counter() - start)
+            self.worlds[key].append(world)
+            return
+
+    async def close(self):
+        tasks = [t for key_tasks in self._refill_tasks.values() for t in key_tasks if not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "target_size": self.target_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unpooled": self.unpooled,
+            "hit_rate": round(self.hits / requests, 4) if requests else None,
+            "refill_failures": self.refill_failures,
+            "refill_latency": self.refill_latency.summary(),
+            "ready": {f"{d}:{n}": len(q) for (d, n), q in self.worlds.items()},
+            "refilling": {f"{d}:{n}": len(t) for (d, n), t in self._refill_tasks.items() if t},
+        }
@@ -1,22 +1,36 @@
 # main.py
 # This script runs the FastAPI server, exposing the game engine through API endpoints.
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Any
 import logging
+import json
+import asyncio
 import uuid
 import os
 import traceback
 import sys
+import time
+import pickle
 from datetime import datetime
 from dotenv import load_dotenv
 
 from schemas import *
 from game_logic.engine import GameEngine
 from game_logic.state_manager import GameState
-from reward_service import RewardManager, RewardValidator
+from game_logic.world_pool import DEFAULT_PREWARM, parse_pool_keys
+from game_logic.session_store import DEFAULT_ARCHIVE_MAX_AGE
+from game_logic.shared_state import create_session_store, VersionConflict
+from game_logic.request_coalescer import InteractionCoalescer, IdempotencyKeyReused
+from game_logic.llm_backends import DEFAULT_LLM_BACKEND, backend_requires_api_key
+from game_logic.metrics import REGISTRY, CONTENT_TYPE, HTTPMetricsMiddleware
+from game_logic.events import Guess
+from reward_service import RewardManager, RewardValidator, MAX_BATCH_ITEMS
+from completions_ledger import CompletionsLedger, DEFAULT_PAGE_SIZE
+from chain_indexer import create_chain_indexer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,10 +48,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(HTTPMetricsMiddleware)
 
-# In-memory storage
-active_games: dict[str, GameState] = {}
-completed_games: dict[str, dict] = {}
+# Live sessions are bounded in memory; idle ones are hibernated to disk. With
+# SESSION_BACKEND set to sqlite or redis they are shared between worker processes.
+active_games = create_session_store()
+completions = CompletionsLedger()
+# On-chain GameSession/RewardClaim index (CHAIN_INDEXER_ENABLED=1); None when disabled.
+chain_index = create_chain_indexer()
+# One turn per game at a time; retried requests reuse the first response.
+interactions = InteractionCoalescer()
+SESSION_SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "30"))
+_session_count = {"value": None}  # For the sessions_active gauge; refreshed by each sweep
 
 API_KEY = os.environ.get("GOOGLE_API_KEY")
 game_engine: GameEngine
@@ -46,29 +68,79 @@ game_engine: GameEngine
 async def startup_event():
     global game_engine
     print("--- Server Startup ---")
-    if not API_KEY or API_KEY == "YOUR_GOOGLE_API_KEY_HERE":
-        sys.exit("API Key is not configured. Shutting down.")
-    
-    print("API Key found. Initializing Game Engine...")
-    game_engine = GameEngine(api_key=API_KEY)
+    if backend_requires_api_key(DEFAULT_LLM_BACKEND):
+        if not API_KEY or API_KEY == "YOUR_GOOGLE_API_KEY_HERE":
+            sys.exit("API Key is not configured. Shutting down.")
+        print("API Key found. Initializing Game Engine...")
+    else:
+        print(f"LLM backend '{DEFAULT_LLM_BACKEND}' needs no API key. Initializing Game Engine...")
+    game_engine = GameEngine(api_key=API_KEY, journal=active_games.journal)
     if not game_engine.llm_api.model:
-        sys.exit("Failed to initialize Gemini Model.")
+        sys.exit(f"Failed to initialize LLM backend '{DEFAULT_LLM_BACKEND}'.")
     print("Game Engine initialized successfully.")
+    recovered = active_games.recover()
+    if recovered:
+        print(f"Recovered {recovered} in-progress games from the turn journal.")
+    game_engine.world_pool.warm(parse_pool_keys(DEFAULT_PREWARM))
+    asyncio.create_task(_refresh_session_count())
+    asyncio.create_task(_sweep_sessions())
+    if chain_index is not None:
+        chain_index.start()
+
+async def _sweep_sessions():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            hibernated = active_games.evict_idle()
+            purged = await asyncio.to_thread(active_games.purge, DEFAULT_ARCHIVE_MAX_AGE)
+            if hibernated or purged:
+                logger.info(f"Session sweep: hibernated {hibernated}, purged {purged}")
+        except Exception:
+            traceback.print_exc()
+        await _refresh_session_count()
+
+async def _refresh_session_count():
+    # Counting every stored session can mean a SQLite COUNT or a Redis SCAN of the whole
+    # keyspace, so it is done here, off the loop, rather than on every metrics scrape.
+    try:
+        _session_count["value"] = await asyncio.to_thread(len, active_games)
+    except Exception:
+        traceback.print_exc()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await game_engine.world_pool.close()
+    active_games.hibernate_all()
+    if active_games.journal is not None:
+        active_games.journal.close()
+    game_engine.events.close()
+    if chain_index is not None:
+        await chain_index.close()
+
+@app.exception_handler(VersionConflict)
+async def version_conflict_handler(request, exc: VersionConflict):
+    # Another worker applied a turn to this game first; the client should retry.
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(IdempotencyKeyReused)
+async def idempotency_key_reused_handler(request, exc: IdempotencyKeyReused):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
 
 @app.post("/game/new", response_model=NewGameResponse)
 async def create_new_game(request: NewGameRequest):
     game_id = str(uuid.uuid4())
     try:
-        game_state = game_engine.start_new_game(
+        game_state = await game_engine.start_new_game(
             game_id=game_id,
             num_inaccessible_locations=request.num_inaccessible_locations,
             difficulty=request.difficulty
         )
-        active_games[game_id] = game_state
-        
+        await active_games.add(game_id, game_state)
+        await game_engine.commit()
+
         initial_villagers = [
-            {"id": f"villager_{i}", "title": v["title"]} 
-            for i, v in enumerate(game_state.villagers)
+            {"id": f"villager_{v.index}", "title": v.title} 
+            for v in game_state.villagers
         ]
 
         return NewGameResponse(
@@ -81,26 +153,38 @@ async def create_new_game(request: NewGameRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate new game: {e}")
 
+def _resolve_interaction(game_state: GameState, request: InteractRequest):
+    villager_index = int(request.villager_id.split('_')[1])
+    if not (0 <= villager_index < len(game_state.villagers)):
+        raise HTTPException(status_code=400, detail="Invalid villager ID.")
+        
+    villager_name = game_state.villagers[villager_index].name
+    frustration = game_engine.frustration_of(game_state, villager_name)
+    player_input = request.player_prompt if request.player_prompt is not None else "I'd like to talk."
+    return villager_name, player_input, frustration
+
+def _idempotency(endpoint: str, request: InteractRequest, header_key: Optional[str]):
+    key = request.idempotency_key or header_key
+    return key, (endpoint, request.villager_id, request.player_prompt)
+
 @app.post("/game/{game_id}/interact", response_model=InteractResponse)
-async def interact(game_id: str, request: InteractRequest):
-    if game_id not in active_games:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    game_state = active_games[game_id]
-    
+async def interact(game_id: str, request: InteractRequest, idempotency_key: Optional[str] = Header(default=None)):
+    key, fingerprint = _idempotency("interact", request, idempotency_key)
+    async with interactions.claim(game_id, key, fingerprint) as claim:
+        if claim.replayed:
+            return claim.result
+        async with active_games.checkout(game_id) as game_state:
+            if game_state is None:
+                raise HTTPException(status_code=404, detail="Game not found")
+            response = await _interact(game_state, request)
+        claim.result = response
+        return response
+
+async def _interact(game_state: GameState, request: InteractRequest):
     try:
-        villager_index = int(request.villager_id.split('_')[1])
-        if not (0 <= villager_index < len(game_state.villagers)):
-            raise HTTPException(status_code=400, detail="Invalid villager ID.")
-            
-        villager_name = game_state.villagers[villager_index]["name"]
-        frustration = {"friends": len([
-            msg for msg in game_state.full_npc_memory.get(villager_name, [])
-            if msg.get("content") and "friend" in msg.get("content").lower()
-        ])}
-        player_input = request.player_prompt if request.player_prompt is not None else "I'd like to talk."
-
-        dialogue_data = game_engine.process_interaction_turn(game_state, villager_name, player_input, frustration)
+        villager_name, player_input, frustration = _resolve_interaction(game_state, request)
+
+        dialogue_data = await game_engine.process_interaction_turn(game_state, villager_name, player_input, frustration)
         
         if not dialogue_data:
              raise HTTPException(status_code=500, detail="LLM failed to generate valid dialogue.")
@@ -115,17 +199,74 @@ async def interact(game_id: str, request: InteractRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Interaction failed: {e}")
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/game/{game_id}/interact/stream")
+async def interact_stream(game_id: str, request: InteractRequest, idempotency_key: Optional[str] = Header(default=None)):
+    """
+    Server-Sent Events variant of /interact. Emits `dialogue` events carrying
+    npc_dialogue text as it is generated, then a single `final` event with the
+    suggestions, revealed node and familiarity once the turn has been applied and saved.
+    """
+    game_state = await active_games.fetch(game_id)
+    if game_state is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    try:
+        _resolve_interaction(game_state, request)
+    except (ValueError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid villager ID.")
+    key, fingerprint = _idempotency("stream", request, idempotency_key)
+
+    async def event_stream():
+        # Re-checked out here: the body runs after this handler has returned.
+        try:
+            async with interactions.claim(game_id, key, fingerprint) as claim:
+                if claim.replayed:
+                    yield _sse("final", claim.result)
+                    return
+                final = None
+                async with active_games.checkout(game_id) as game_state:
+                    # Resolved again under the game lock so frustration reflects any turn that just finished.
+                    villager_name, player_input, frustration = _resolve_interaction(game_state, request)
+                    async for event, data in game_engine.stream_interaction_turn(game_state, villager_name, player_input, frustration):
+                        if event != "final":
+                            yield _sse(event, data)
+                            continue
+                        dialogue_data = data["dialogue"]
+                        final = {
+                            "villager_id": request.villager_id,
+                            "villager_name": villager_name,
+                            "npc_dialogue": dialogue_data.get("npc_dialogue"),
+                            "player_suggestions": dialogue_data.get("player_responses"),
+                            "node_revealed_id": dialogue_data.get("node_revealed_id"),
+                            "familiarity": game_state.familiarity_of(villager_name),
+                            "ttft_ms": data["ttft_ms"],
+                        }
+                # Sent only once the checkout has saved the turn: a VersionConflict on the way out
+                # means the turn was discarded, and the client gets the error instead.
+                if final is not None:
+                    claim.result = final
+                    yield _sse("final", final)
+        except (VersionConflict, IdempotencyKeyReused) as e:
+            yield _sse("error", {"detail": str(e), "status": 409 if isinstance(e, VersionConflict) else 422})
+        except Exception as e:
+            traceback.print_exc()
+            yield _sse("error", {"detail": f"Interaction failed: {e}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/game/{game_id}/guess", response_model=GuessResponse)
 async def guess(game_id: str, request: GuessRequest):
-    if game_id not in active_games:
+    game_state = await active_games.fetch(game_id)
+    if game_state is None:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    game_state = active_games[game_id]
     is_correct = request.location_name == game_state.correct_location
     
-    key_clues = [node['node_id'] for node in game_state.quest_network.get('nodes', []) if node.get('key_clue')]
-    discovered_key_clues = [node_id for node_id in game_state.player_state['discovered_nodes'] if node_id in key_clues]
-    is_true_ending = len(discovered_key_clues) == len(key_clues)
+    is_true_ending = game_engine.quest_graph(game_state).all_key_clues_found()
+    game_engine.events.emit(Guess(game_id, request.location_name, is_correct, is_true_ending,
+                                  len(game_state.player_state.discovered_nodes)))
 
     message = ""
     if is_correct:
@@ -181,8 +322,13 @@ class CompleteGameResponse(BaseModel):
     isTrueEnding: bool
     rewardAmount: int
     rewardClaimId: Optional[str] = None
+    claimStatus: Optional[str] = None  # From the chain index: created | claimed
     completedAt: str
 
+class CompleteGameBatchRequest(BaseModel):
+    # Items are checked one by one so a bad item fails alone, not the whole batch.
+    items: List[Any] = Field(..., description="CompleteGameRequest-shaped completions")
+
 # ============== Reward Endpoints ==============
 
 @app.get("/health")
@@ -193,6 +339,70 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/stats")
+async def server_stats():
+    """Operational counters for capacity planning."""
+    return {
+        "world_pool": game_engine.world_pool.stats(),
+        "streaming": {
+            "ttft": game_engine.stream_ttft.summary(),
+            "total": game_engine.stream_total.summary(),
+        },
+        "context": game_engine.context_manager.stats(),
+        "response_bank": game_engine.response_bank_stats.stats(),
+        "opening_lines": game_engine.opening_line_stats.stats(),
+        "speculation": game_engine.speculator.stats(),
+        "llm_calls": game_engine.llm_api.resilience.stats(),
+        "llm_routing": game_engine.llm_api.router.stats(),
+        "prompts": game_engine.llm_api.prompt_builder.stats(),
+        "sessions": active_games.stats(),
+        "interact_dedupe": interactions.stats(),
+        "events": game_engine.events.stats(),
+        "completions": completions.stats(),
+        "chain_index": chain_index.stats() if chain_index is not None else None,
+    }
+
+# Scrape-time gauges: nothing is computed on the request path for these.
+SESSION_SIZE_SAMPLE = 16
+SESSION_SIZE_REFRESH = float(os.environ.get("METRICS_SESSION_SIZE_REFRESH", "60"))
+_session_size = {"at": float("-inf"), "bytes": 0.0}
+
+def _estimated_session_bytes():
+    """Mean pickled size of a few recently used sessions, times the number held in memory."""
+    now = time.monotonic()
+    if now - _session_size["at"] >= SESSION_SIZE_REFRESH:
+        sample = active_games.sample_resident(SESSION_SIZE_SAMPLE)
+        sizes = [len(pickle.dumps(s, protocol=pickle.HIGHEST_PROTOCOL)) for s in sample]
+        _session_size.update(at=now, bytes=sum(sizes) / len(sizes) if sizes else 0.0)
+    return round(_session_size["bytes"] * active_games.resident_count())
+
+REGISTRY.gauge("sessions_active", "Live game sessions, in memory or hibernated.", lambda: _session_count["value"])
+REGISTRY.gauge("sessions_resident", "Game sessions currently held in memory.", lambda: active_games.resident_count())
+REGISTRY.gauge("sessions_resident_estimated_bytes", "Estimated memory held by in-memory sessions.", _estimated_session_bytes)
+REGISTRY.gauge("games_completed", "Completions recorded through /api/complete-game.", completions.total_completions)
+REGISTRY.gauge("chain_indexer_lag_seconds", "Seconds since the chain index was last known to be complete.",
+               lambda: chain_index.lag_seconds() if chain_index is not None else None)
+REGISTRY.gauge("chain_indexer_events_indexed", "Contract events folded into the chain index.",
+               lambda: chain_index.events_indexed if chain_index is not None else None)
+REGISTRY.gauge("llm_in_flight", "LLM calls currently holding a concurrency slot.", lambda: game_engine.llm_api.in_flight)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of request, LLM, session and engine hot-path metrics."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+def _record_completion(request: CompleteGameRequest) -> Dict[str, Any]:
+    with completions.session() as db:
+        reward_manager = RewardManager(db_session=db)
+        
+        return reward_manager.create_game_completion_record(
+            user_address=request.userAddress,
+            game_session_id=request.gameSessionId,
+            score=request.score,
+            won=request.won,
+            is_true_ending=request.isTrueEnding
+        )
+
 @app.post("/api/complete-game", response_model=CompleteGameResponse)
 async def complete_game(request: CompleteGameRequest):
     """
@@ -206,21 +416,14 @@ async def complete_game(request: CompleteGameRequest):
             raise HTTPException(status_code=400, detail="Invalid wallet address")
         if not RewardValidator.validate_score(request.score):
             raise HTTPException(status_code=400, detail="Invalid score")
+        if not RewardValidator.validate_game_session(request.gameSessionId, chain_index, request.userAddress):
+            raise HTTPException(status_code=400, detail="Game session belongs to another player")
         
-        reward_manager = RewardManager(db_session=None)
-        
-        result = reward_manager.create_game_completion_record(
-            user_address=request.userAddress,
-            game_session_id=request.gameSessionId,
-            score=request.score,
-            won=request.won,
-            is_true_ending=request.isTrueEnding
-        )
-        
-        completion_id = f"{request.userAddress}_{request.gameSessionId}"
-        completed_games[completion_id] = result
+        # SQLite write and fsync: blocking, so off the event loop.
+        result = await asyncio.to_thread(_record_completion, request)
         
         logger.info(f"Game completion processed: {result}")
+        claim = chain_index.claim(request.gameSessionId) if chain_index is not None else None
         
         message = "Game completed! "
         if result["won"] and result["rewardAmount"] > 0:
@@ -235,10 +438,13 @@ async def complete_game(request: CompleteGameRequest):
             won=result["won"],
             isTrueEnding=result["isTrueEnding"],
             rewardAmount=result["rewardAmount"],
-            rewardClaimId=None,  # No claim ID needed anymore
+            rewardClaimId=claim["claim_id"] if claim else None,
+            claimStatus=claim["status"] if claim else None,
             completedAt=result["completedAt"]
         )
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.warning(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -246,23 +452,58 @@ async def complete_game(request: CompleteGameRequest):
         logger.error(f"Error completing game: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _record_completions(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with completions.session() as db:
+        return RewardManager(db_session=db).create_game_completion_records(items, chain_index)
+
+@app.post("/api/complete-game/batch")
+async def complete_game_batch(request: CompleteGameBatchRequest):
+    """
+    Records many completions in one call (backfills, tournament settlements, replays of
+    offline sessions). Rewards are computed exactly as /api/complete-game computes them;
+    each item gets its own result, so one bad item does not fail the rest.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No completions given")
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} completions per batch")
+    try:
+        # Up to MAX_BATCH_ITEMS rows in one SQLite transaction: blocking, so off the event loop.
+        results = await asyncio.to_thread(_record_completions, request.items)
+        completed = sum(1 for r in results if r["success"])
+        return {
+            "success": True,
+            "completed": completed,
+            "failed": len(results) - completed,
+            "results": results,
+        }
+    except Exception as e:
+        logger.error(f"Error completing game batch: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/api/completions/{user_address}")
-async def get_user_completions(user_address: str):
-    """Get all game completions for a user"""
+async def get_user_completions(user_address: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Get a user's game completions, newest first. Pass the returned nextCursor back as
+    `cursor` for the next page; totals always cover every completion.
+    """
     try:
         if not RewardValidator.validate_user_address(user_address):
             raise HTTPException(status_code=400, detail="Invalid user address")
         
-        user_completions = [
-            comp for comp_id, comp in completed_games.items()
-            if comp["userAddress"] == user_address
-        ]
+        try:
+            page = await asyncio.to_thread(completions.history, user_address, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
             "userAddress": user_address,
-            "completions": user_completions,
-            "totalRewards": sum(c["rewardAmount"] for c in user_completions if c["won"])
+            "completions": page["completions"],
+            "nextCursor": page["nextCursor"],
+            "totalCompletions": page["completionCount"],
+            "wins": page["wins"],
+            "totalRewards": page["totalRewards"]
         }
         
     except HTTPException:
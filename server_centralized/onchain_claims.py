@@ -0,0 +1,597 @@
+# onchain_claims.py
+# Batches on-chain reward claims. Pending claims are queued and flushed as one programmable
+# transaction holding a complete_game call per claim, when the batch is full or its oldest
+# claim has waited long enough. Created RewardClaim objects are matched back to their
+# requests. When a batch fails, the claim its Move abort names (or, if none is named, every
+# claim) is retried in a transaction of its own, so a single bad claim cannot fail the rest.
+# Several batches can be on-chain at once from the one admin address, each paying with its
+# own coin from a GasCoinPool. Nothing here imports pysui: transactions are submitted by
+# callbacks (BlockchainService, or a local stand-in). A transaction is signed once; when its
+# outcome is unknown (timeout, dropped connection) it is looked up by digest and the same
+# signed bytes resent, never rebuilt, so a claim cannot be created twice.
+
+import os
+import re
+import time
+import base64
+import hashlib
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any
+from game_logic.stats import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLAIM_BATCH_SIZE = int(os.getenv("CLAIM_BATCH_SIZE", "50"))
+DEFAULT_CLAIM_BATCH_WAIT = float(os.getenv("CLAIM_BATCH_WAIT_MS", "250")) / 1000
+# Admin gas coins kept split out for parallel submission (one transaction per coin at a
+# time), the balance each is topped up with, and the balance below which a coin is
+# retired and merged back into the reserve coin at the next refill (values in MIST).
+DEFAULT_GAS_POOL_SIZE = int(os.getenv("GAS_POOL_SIZE", "8"))
+DEFAULT_GAS_COIN_BALANCE = int(os.getenv("GAS_COIN_BALANCE", "500000000"))
+DEFAULT_GAS_COIN_MIN_BALANCE = int(os.getenv("GAS_COIN_MIN_BALANCE", "50000000"))
+DEFAULT_CLAIM_MAX_IN_FLIGHT = int(os.getenv("CLAIM_MAX_IN_FLIGHT", str(DEFAULT_GAS_POOL_SIZE)))
+# How long a transaction waits for a free gas coin before its submission fails.
+DEFAULT_GAS_LEASE_TIMEOUT = float(os.getenv("GAS_LEASE_TIMEOUT", "30"))
+
+class ClaimSubmissionError(Exception):
+    """
+    A claim transaction did not execute. `command_index` is the move call that aborted,
+    when the node's error names one; `retryable` is False for Move aborts, which fail the
+    same way every time. `ambiguous` means the transaction was sent and may have executed
+    after all: its claims must not be submitted again in another transaction.
+    """
+
+    def __init__(self, message: str, command_index: Optional[int] = None, retryable: bool = True,
+                 ambiguous: bool = False):
+        super().__init__(message)
+        self.command_index = command_index
+        self.retryable = retryable and not ambiguous
+        self.ambiguous = ambiguous
+
+class ClaimRequest:
+    __slots__ = ("game_session_id", "player_address", "won", "reward_amount", "future", "enqueued_at")
+
+    def __init__(self, game_session_id: str, player_address: str, won: bool, reward_amount: int):
+        self.game_session_id = game_session_id
+        self.player_address = player_address
+        self.won = won
+        self.reward_amount = reward_amount
+        self.future = None
+        self.enqueued_at = 0.0
+
+def claim_move_call(package_id: str, treasury_id: str, claim: ClaimRequest):
+    """(target, arguments) of the complete_game call for one claim."""
+    return (f"{package_id}::contract_onechain::complete_game",
+            [treasury_id, claim.game_session_id, claim.won, claim.reward_amount])
+
+_ABORT_COMMAND = re.compile(r"in command (\d+)")
+
+def check_execution(result: Dict[str, Any]):
+    """Raises ClaimSubmissionError unless the executeTransactionBlock response succeeded."""
+    status = (result.get("effects") or {}).get("status") or {}
+    if status.get("status") == "success":
+        return
+    error = status.get("error") or result.get("error") or "transaction failed"
+    match = _ABORT_COMMAND.search(error)
+    raise ClaimSubmissionError(error, command_index=int(match.group(1)) if match else None,
+                               retryable="MoveAbort" not in error)
+
+_BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+def transaction_digest(tx_bytes: str) -> str:
+    """The digest a node will give base64 BCS TransactionData bytes, known before sending them."""
+    raw = hashlib.blake2b(b"TransactionData::" + base64.b64decode(tx_bytes), digest_size=32).digest()
+    number, encoded = int.from_bytes(raw, "big"), ""
+    while number:
+        number, digit = divmod(number, 58)
+        encoded = _BASE58[digit] + encoded
+    return "1" * (len(raw) - len(raw.lstrip(b"\0"))) + encoded
+
+async def execute_signed(send, lookup, digest: str, retries: int = 2, backoff: float = 0.5) -> Dict[str, Any]:
+    """
+    Executes one signed transaction and returns the node's response. `send()` submits the
+    same signed bytes every time; `lookup(digest)` returns the executed transaction's
+    response, or None while the node does not know it. A send that fails without a response
+    may still have executed, so the digest is looked up before the bytes are sent again;
+    resending is safe since the node executes a digest at most once. Raises an ambiguous
+    ClaimSubmissionError if the outcome is still unknown after `retries` resends.
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(backoff * (2 ** (attempt - 1)))
+        try:
+            return await send()
+        except Exception as e:
+            error = e
+        try:
+            response = await lookup(digest)
+        except Exception as e:
+            logger.warning(f"Could not look up transaction {digest}: {e}")
+            response = None
+        if response is not None:
+            return response
+    raise ClaimSubmissionError(f"Transaction {digest} outcome unknown: {error}", ambiguous=True)
+
+def map_created_claims(claims: List[ClaimRequest], result: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    game_session_id -> created RewardClaim object ID, from an executeTransactionBlock
+    response with events and object changes. Each complete_game call emits an event whose
+    parsedJson names the game session and the claim it created. A one-claim transaction
+    falls back to the only RewardClaim among the created objects.
+    """
+    wanted = {claim.game_session_id for claim in claims}
+    mapped = {}
+    for event in result.get("events") or []:
+        fields = event.get("parsedJson") or {}
+        session_id = fields.get("game_session_id") or fields.get("game_session")
+        claim_id = fields.get("claim_id") or fields.get("reward_claim_id")
+        if session_id in wanted and claim_id:
+            mapped[session_id] = claim_id
+    if len(claims) == 1 and not mapped:
+        created = [change.get("objectId") for change in result.get("objectChanges") or []
+                   if change.get("type") == "created" and "RewardClaim" in change.get("objectType", "")]
+        created = created or [obj.get("objectId") or (obj.get("reference") or {}).get("objectId")
+                              for obj in (result.get("effects") or {}).get("created", [])
+                              if "RewardClaim" in obj.get("objectType", "")]
+        if len(created) == 1:
+            mapped[claims[0].game_session_id] = created[0]
+    return {session_id: mapped.get(session_id) for session_id in wanted}
+
+class ClaimBatcher:
+    """
+    `await claim(request)` resolves to the RewardClaim object ID, or None if the claim
+    could not be created. Up to `max_in_flight` batches are on-chain at once; claims
+    arriving while every slot is busy form the next batch. Every transaction is signed by
+    the same admin address, so more than one in flight needs a GasCoinPool behind
+    `submit`, which must execute one transaction for the given claims and return
+    {game_session_id: claim_id or None}, raising ClaimSubmissionError on failure. Once it
+    has sent the transaction, `submit` resolves its outcome itself (see execute_signed) and
+    raises an ambiguous ClaimSubmissionError if it cannot; those claims then fail rather
+    than go on-chain a second time in a new transaction.
+    """
+
+    def __init__(self, submit, max_batch: int = DEFAULT_CLAIM_BATCH_SIZE, max_wait: float = DEFAULT_CLAIM_BATCH_WAIT,
+                 max_in_flight: int = 1, retries: int = 2, retry_backoff: float = 0.5):
+        self.submit = submit
+        self.max_in_flight = max_in_flight
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue = []
+        self._pending = {}  # game_session_id -> queued or in-flight ClaimRequest
+        self._wakeup = None
+        self._worker = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._flushing = set()
+        self.batches = 0
+        self.batched_claims = 0
+        self.batch_failures = 0
+        self.individual_retries = 0
+        self.claimed = 0
+        self.failed = 0
+        self.unresolved = 0  # Failed with an unknown outcome; the claim may exist on-chain
+        self.unmapped = 0
+        self.deduplicated = 0
+        self.claim_latency = LatencyTracker()
+        self.transaction_latency = LatencyTracker()
+
+    async def claim(self, request: ClaimRequest) -> Optional[str]:
+        existing = self._pending.get(request.game_session_id)
+        if existing is not None:
+            # The same game is already on its way on-chain; share that result.
+            self.deduplicated += 1
+            return await asyncio.shield(existing.future)
+        loop = asyncio.get_running_loop()
+        request.future = loop.create_future()
+        request.enqueued_at = time.perf_counter()
+        self._pending[request.game_session_id] = request
+        self._queue.append(request)
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+        if len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+        return await asyncio.shield(request.future)
+
+    async def _run(self):
+        while self._queue:
+            oldest = self._queue[0].enqueued_at
+            delay = self.max_wait - (time.perf_counter() - oldest)
+            if delay > 0 and len(self._queue) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self._slots.acquire()
+            self._wakeup.clear()
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            flush = asyncio.ensure_future(self._flush(batch))
+            self._flushing.add(flush)
+            flush.add_done_callback(self._flushed)
+
+    def _flushed(self, flush):
+        self._flushing.discard(flush)
+        self._slots.release()
+
+    async def _flush(self, batch: List[ClaimRequest]):
+        self.batches += 1
+        self.batched_claims += len(batch)
+        while batch:
+            try:
+                results = await self._submit(batch)
+            except ClaimSubmissionError as e:
+                self.batch_failures += 1
+                if len(batch) == 1 or e.ambiguous:
+                    for claim in batch:
+                        self._finish(claim, None, e)
+                    return
+                if e.command_index is None or e.command_index >= len(batch):
+                    logger.warning(f"Claim batch of {len(batch)} failed ({e}); retrying each claim on its own")
+                    for claim in batch:
+                        await self._retry_alone(claim)
+                    return
+                # A Move abort names its command: that claim is retried alone, and the
+                # rest go back on-chain together without it.
+                await self._retry_alone(batch.pop(e.command_index))
+                continue
+            for claim in batch:
+                self._finish(claim, results.get(claim.game_session_id))
+            return
+
+    async def _retry_alone(self, claim: ClaimRequest):
+        self.individual_retries += 1
+        try:
+            results = await self._submit([claim])
+        except ClaimSubmissionError as e:
+            self._finish(claim, None, e)
+        else:
+            self._finish(claim, results.get(claim.game_session_id))
+
+    async def _submit(self, claims: List[ClaimRequest]) -> Dict[str, Optional[str]]:
+        """
+        One transaction, retried with backoff while the failure is transient. Errors other
+        than ClaimSubmissionError come from before the transaction was sent.
+        """
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                return await self.submit(claims)
+            except ClaimSubmissionError as e:
+                if not e.retryable or attempt == self.retries:
+                    raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise ClaimSubmissionError(str(e)) from e
+            finally:
+                self.transaction_latency.record(time.perf_counter() - start)
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _finish(self, claim: ClaimRequest, claim_id: Optional[str], error: Exception = None):
+        self._pending.pop(claim.game_session_id, None)
+        if claim_id:
+            self.claimed += 1
+        elif error is not None:
+            self.failed += 1
+            self.unresolved += getattr(error, "ambiguous", False)
+            logger.error(f"Reward claim for game session {claim.game_session_id} failed: {error}")
+        else:
+            # Executed, but the claim could not be told apart from the others in its batch.
+            self.unmapped += 1
+            logger.warning(f"No RewardClaim matched game session {claim.game_session_id}")
+        self.claim_latency.record(time.perf_counter() - claim.enqueued_at)
+        if not claim.future.done():
+            claim.future.set_result(claim_id)
+
+    async def close(self):
+        """Flushes everything still queued."""
+        if self._worker is not None:
+            if self._wakeup is not None:
+                self.max_wait = 0
+                self._wakeup.set()
+            await self._worker
+        if self._flushing:
+            await asyncio.gather(*self._flushing)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "in_flight": len(self._flushing),
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_claims / self.batches, 2) if self.batches else None,
+            "batch_failures": self.batch_failures,
+            "individual_retries": self.individual_retries,
+            "claimed": self.claimed,
+            "failed": self.failed,
+            "unresolved": self.unresolved,
+            "unmapped": self.unmapped,
+            "deduplicated": self.deduplicated,
+            "claim_latency": self.claim_latency.summary(),
+            "transaction_latency": self.transaction_latency.summary(),
+        }
+
+class ObjectRef:
+    __slots__ = ("object_id", "version", "digest")
+
+    def __init__(self, object_id: str, version: int, digest: Optional[str] = None):
+        self.object_id = object_id
+        self.version = version
+        self.digest = digest
+
+    @classmethod
+    def from_json(cls, reference: Dict[str, Any]) -> "ObjectRef":
+        return cls(reference["objectId"], int(reference["version"]), reference.get("digest"))
+
+    def __repr__(self):
+        return f"ObjectRef({self.object_id}, v{self.version})"
+
+class ObjectRefCache:
+    """
+    Latest known (version, digest) of the objects this process transacts with, kept
+    current from each transaction's effects so the next transaction can be built without
+    asking the fullnode, whose answer may lag the transaction that was just executed.
+    """
+
+    def __init__(self):
+        self._refs = {}
+        self.updates = 0
+
+    def get(self, object_id: str) -> Optional[ObjectRef]:
+        return self._refs.get(object_id)
+
+    def put(self, ref: ObjectRef):
+        current = self._refs.get(ref.object_id)
+        if current is None or ref.version >= current.version:
+            self._refs[ref.object_id] = ref
+            self.updates += 1
+
+    def forget(self, object_id: str):
+        self._refs.pop(object_id, None)
+
+    def apply_effects(self, effects: Dict[str, Any], created: bool = False):
+        """Moves cached objects to their new versions; `created` also caches new objects."""
+        for key in ("created", "mutated", "unwrapped"):
+            for obj in effects.get(key) or []:
+                ref = ObjectRef.from_json(obj["reference"])
+                if ref.object_id in self._refs or (created and key == "created"):
+                    self.put(ref)
+        if effects.get("gasObject"):
+            self.put(ObjectRef.from_json(effects["gasObject"]["reference"]))
+        for key in ("deleted", "wrapped"):
+            for reference in effects.get(key) or []:
+                self.forget(reference["objectId"])
+
+    def __len__(self):
+        return len(self._refs)
+
+def gas_fee(effects: Dict[str, Any]) -> int:
+    used = effects.get("gasUsed") or {}
+    return (int(used.get("computationCost", 0)) + int(used.get("storageCost", 0))
+            - int(used.get("storageRebate", 0)))
+
+class GasCoin:
+    __slots__ = ("object_id", "balance")
+
+    def __init__(self, object_id: str, balance: int):
+        self.object_id = object_id
+        self.balance = balance
+
+class GasLease:
+    """A gas coin checked out for one transaction. `settle` it with the transaction's response."""
+
+    def __init__(self, pool: "GasCoinPool", coin: GasCoin):
+        self.pool = pool
+        self.coin = coin
+        self.ref = pool.refs.get(coin.object_id)
+        self.settled = False
+
+    def settle(self, response: Dict[str, Any]):
+        effects = response.get("effects") or {}
+        self.settled = True
+        if not effects.get("gasObject"):
+            return  # Rejected before execution; the coin's version did not move.
+        self.pool.refs.apply_effects(effects)
+        self.coin.balance -= gas_fee(effects)
+
+class GasCoinPool:
+    """
+    Split gas coins of the admin address, so several transactions from it can be in flight
+    at once. Sui locks an owned object version to the first transaction signed with it; two
+    transactions paying with the same coin version equivocate and lock the coin until the
+    epoch ends. A coin is therefore leased to one transaction at a time and its next version
+    taken from that transaction's effects. A coin whose transaction ended without effects
+    (timeout, dropped connection) may or may not have moved, so it is set aside and re-read
+    from the node once `stale_after` seconds have passed, by when that transaction has
+    either executed or expired.
+
+    The largest coin is the reserve and only pays for refills: when fewer than half of
+    `size` coins are usable, one transaction merges the spent coins into the reserve and
+    splits new `coin_balance` coins off it. `list_coins()` returns [(ObjectRef, balance)]
+    for the admin's coins; `split_coins(reserve, amounts, merge)` executes the refill
+    transaction and returns its response. A lease that finds no free coin within
+    `lease_timeout` seconds fails with a retryable ClaimSubmissionError; a failed refill is
+    not retried for `refill_backoff` seconds.
+    """
+
+    def __init__(self, list_coins, split_coins, refs: Optional[ObjectRefCache] = None,
+                 size: int = DEFAULT_GAS_POOL_SIZE, coin_balance: int = DEFAULT_GAS_COIN_BALANCE,
+                 min_balance: int = DEFAULT_GAS_COIN_MIN_BALANCE, stale_after: float = 30.0,
+                 lease_timeout: float = DEFAULT_GAS_LEASE_TIMEOUT, refill_backoff: float = 1.0):
+        self.list_coins = list_coins
+        self.split_coins = split_coins
+        self.refs = refs if refs is not None else ObjectRefCache()
+        self.size = size
+        self.coin_balance = coin_balance
+        self.min_balance = min_balance
+        self.stale_after = stale_after
+        self.lease_timeout = lease_timeout
+        self.refill_backoff = refill_backoff
+        self._refill_after = 0.0  # No refill before this (monotonic) time after one fails
+        self.reserve = None
+        self._free = []
+        self._leased = {}
+        self._stale = {}  # object_id -> (coin, when its outcome became unknown); re-read before reuse
+        self._spent = {}  # Below min_balance; merged into the reserve at the next refill
+        self._available = asyncio.Condition()
+        self._refilling = None
+        self._starting = None
+        self.leases = 0
+        self.waits = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.lease_timeouts = 0
+        self.wait_latency = LatencyTracker()
+
+    async def start(self):
+        coins = await self.list_coins()
+        self._adopt(coins)
+        if len(self._free) < self.size:
+            await self._refill()
+
+    def _adopt(self, coins):
+        """Takes the node's view of every admin coin not currently leased or recently stale."""
+        now = time.monotonic()
+        self._stale = {object_id: entry for object_id, entry in self._stale.items()
+                       if now - entry[1] < self.stale_after}
+        self._free, self._spent = [], {}
+        coins = sorted(coins, key=lambda coin: coin[1], reverse=True)
+        for ref, balance in coins:
+            self.refs.put(ref)
+        coins = [(ref, balance) for ref, balance in coins
+                 if ref.object_id not in self._leased and ref.object_id not in self._stale]
+        if self.reserve is None or self.reserve.object_id not in {ref.object_id for ref, _ in coins}:
+            self.reserve = GasCoin(coins[0][0].object_id, coins[0][1]) if coins else None
+        for ref, balance in coins:
+            if ref.object_id == self.reserve.object_id:
+                self.reserve.balance = balance
+            elif balance >= self.min_balance:
+                self._free.append(GasCoin(ref.object_id, balance))
+            else:
+                self._spent[ref.object_id] = GasCoin(ref.object_id, balance)
+
+    @asynccontextmanager
+    async def lease(self):
+        coin = await self._acquire()
+        lease = GasLease(self, coin)
+        try:
+            yield lease
+        finally:
+            await self._release(lease)
+
+    async def _acquire(self) -> GasCoin:
+        if self._starting is None or (self._starting.done() and self._starting.exception()):
+            self._starting = asyncio.ensure_future(self.start())
+        await asyncio.shield(self._starting)
+        async with self._available:
+            if not self._free:
+                self.waits += 1
+                deadline = time.monotonic() + self.lease_timeout
+                with self.wait_latency.time():
+                    while not self._free:
+                        # Every wake re-checks for a refill: the last one may have failed, and
+                        # stale coins become re-readable as time passes.
+                        self._maybe_refill()
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.lease_timeouts += 1
+                            raise ClaimSubmissionError(f"No admin gas coin became free within {self.lease_timeout}s")
+                        try:
+                            await asyncio.wait_for(self._available.wait(), min(remaining, self._next_wake()))
+                        except asyncio.TimeoutError:
+                            pass
+            coin = self._free.pop()
+            self._leased[coin.object_id] = coin
+            self.leases += 1
+            return coin
+
+    async def _release(self, lease: GasLease):
+        coin = lease.coin
+        async with self._available:
+            self._leased.pop(coin.object_id, None)
+            if not lease.settled:
+                self._stale[coin.object_id] = (coin, time.monotonic())
+            elif coin.balance < self.min_balance:
+                self._spent[coin.object_id] = coin
+            else:
+                self._free.append(coin)
+                self._available.notify()
+            self._maybe_refill()
+
+    def _next_wake(self) -> float:
+        """Seconds until a refill could do more than the last one: the next stale coin may be
+        re-read, or a failed refill may be retried (infinite if neither is pending)."""
+        now = time.monotonic()
+        pending = [since + self.stale_after - now for _, since in self._stale.values()
+                   if since + self.stale_after > now]
+        if self._refill_after > now:
+            pending.append(self._refill_after - now)
+        return min(pending, default=float("inf"))
+
+    def _maybe_refill(self):
+        usable = len(self._free) + len(self._leased)
+        if usable < max(1, self.size // 2) and (self._refilling is None or self._refilling.done()) \
+                and time.monotonic() >= self._refill_after:
+            self._refilling = asyncio.ensure_future(self._refill())
+
+    async def _refill(self):
+        try:
+            now = time.monotonic()
+            if any(now - since >= self.stale_after for _, since in self._stale.values()):
+                # Re-read coins whose last transaction has an unknown outcome.
+                coins = await self.list_coins()
+                async with self._available:
+                    self._adopt(coins)
+            wanted = self.size - len(self._free) - len(self._leased)
+            if wanted <= 0 or self.reserve is None:
+                return
+            affordable = max(0, (self.reserve.balance + sum(c.balance for c in self._spent.values())
+                                 - self.coin_balance) // self.coin_balance)
+            amounts = [self.coin_balance] * min(wanted, affordable)
+            if not amounts:
+                logger.error(f"Admin gas reserve {self.reserve.object_id} cannot fund more gas coins "
+                             f"(balance {self.reserve.balance})")
+                return
+            merge = list(self._spent.values())
+            response = await self.split_coins(self.refs.get(self.reserve.object_id), amounts,
+                                              [self.refs.get(coin.object_id) for coin in merge])
+            effects = response.get("effects") or {}
+            check_execution(response)
+            self.refs.apply_effects(effects, created=True)
+            async with self._available:
+                self.reserve.balance += sum(coin.balance for coin in merge) - sum(amounts) - gas_fee(effects)
+                for coin in merge:
+                    self._spent.pop(coin.object_id, None)
+                gas_id = effects["gasObject"]["reference"]["objectId"]
+                for obj in effects.get("created") or []:
+                    object_id = obj["reference"]["objectId"]
+                    if object_id != gas_id:
+                        self._free.append(GasCoin(object_id, self.coin_balance))
+                self.refills += 1
+        except Exception as e:
+            self.refill_failures += 1
+            self._refill_after = time.monotonic() + self.refill_backoff
+            logger.error(f"Gas coin refill failed: {e}")
+        finally:
+            # Waiters re-check after every refill, including one that re-read coins and then
+            # stopped early or failed, so none waits on a notify that never comes.
+            async with self._available:
+                self._available.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "free": len(self._free),
+            "leased": len(self._leased),
+            "stale": len(self._stale),
+            "spent": len(self._spent),
+            "reserve_balance": self.reserve.balance if self.reserve else None,
+            "leases": self.leases,
+            "waits": self.waits,
+            "wait_latency": self.wait_latency.summary(),
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "lease_timeouts": self.lease_timeouts,
+            "cached_refs": len(self.refs),
+        }
@@ -1,10 +1,17 @@
+import os
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import numpy as np
 from sqlalchemy.orm import Session
+from completions_ledger import add_completions
+from chain_indexer import normalize_address
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ITEMS = int(os.getenv("COMPLETE_GAME_BATCH_MAX_ITEMS", "10000"))
+U64_MAX = 2 ** 64 - 1
+
 class RewardManager:
     """Manages game completion and reward calculation (NO blockchain calls)"""
     
@@ -14,6 +21,8 @@ class RewardManager:
     MAX_REWARD = int(5 * 1e9)
     MIN_REWARD = int(0.1 * 1e9)
     TRUE_ENDING_BONUS = int(1.0 * 1e9)
+    # complete_game_and_create_proof aborts with E_INVALID_SCORE above this
+    MAX_SCORE = 1000000
     
     def __init__(self, db_session: Session):
         self.db = db_session
@@ -46,6 +55,8 @@ class RewardManager:
         """
         Create game completion record.
         Returns data for frontend to call complete_game_and_create_proof.
+        With a db session the record is also added to the completions ledger; a repeated
+        submission for the same game session returns the record stored the first time.
         """
         try:
             if not user_address or not game_session_id:
@@ -63,7 +74,7 @@ class RewardManager:
                 f"Reward: {reward_amount}"
             )
             
-            return {
+            record = {
                 "success": True,
                 "gameSessionId": game_session_id,
                 "userAddress": user_address,
@@ -75,22 +86,117 @@ class RewardManager:
                 # Frontend will call complete_game_and_create_proof with these params
                 "needsBlockchainProof": won and reward_amount > 0
             }
+            if self.db is not None:
+                [(record, created)] = add_completions(self.db, [record])
+                if not created:
+                    logger.info(f"Game session {game_session_id} was already completed by {user_address}")
+            return record
             
         except Exception as e:
             logger.error(f"Error creating game completion record: {e}")
             raise
+    
+    @classmethod
+    def calculate_rewards(cls, scores: np.ndarray, is_true_ending: np.ndarray, won: np.ndarray) -> np.ndarray:
+        """
+        calculate_reward over arrays, in u64 arithmetic as the Move contract does it: a lost
+        game pays 0, a won one BASE_REWARD + score * SCORE_MULTIPLIER (+ TRUE_ENDING_BONUS),
+        clamped to [MIN_REWARD, MAX_REWARD]. Any u64 overflow raises OverflowError, where
+        the contract would abort.
+        """
+        scores = np.asarray(scores, dtype=np.uint64)
+        is_true_ending = np.asarray(is_true_ending, dtype=bool)
+        # Highest score whose reward fits in a u64, with and without the bonus.
+        limit = np.where(is_true_ending,
+                         np.uint64((U64_MAX - cls.BASE_REWARD - cls.TRUE_ENDING_BONUS) // cls.SCORE_MULTIPLIER),
+                         np.uint64((U64_MAX - cls.BASE_REWARD) // cls.SCORE_MULTIPLIER))
+        if np.any(scores > limit):
+            raise OverflowError("Reward calculation overflows u64")
+        reward = scores * np.uint64(cls.SCORE_MULTIPLIER) + np.uint64(cls.BASE_REWARD)
+        reward += np.where(is_true_ending, np.uint64(cls.TRUE_ENDING_BONUS), np.uint64(0))
+        np.clip(reward, np.uint64(cls.MIN_REWARD), np.uint64(cls.MAX_REWARD), out=reward)
+        return np.where(np.asarray(won, dtype=bool), reward, np.uint64(0))
+    
+    def create_game_completion_records(self, items: List[Dict[str, Any]], chain_index=None) -> List[Dict[str, Any]]:
+        """
+        create_game_completion_record for many completions at once: fields are checked per
+        item, scores and rewards as arrays, and every valid item goes into the ledger in one
+        insert. Returns one result per item, in order: the stored record with `duplicate`
+        set, or {"success": False, "error": ...}.
+        """
+        count = len(items)
+        errors = [None] * count
+        scores = np.zeros(count, dtype=np.int64)
+        won = np.zeros(count, dtype=bool)
+        is_true_ending = np.zeros(count, dtype=bool)
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[i] = "Item must be an object"
+                continue
+            score, item_won, item_true_ending = item.get("score"), item.get("won"), item.get("isTrueEnding", False)
+            if type(score) is not int or not -2 ** 63 <= score < 2 ** 63:
+                errors[i] = "Invalid score"
+            elif type(item_won) is not bool or type(item_true_ending) is not bool:
+                errors[i] = "won and isTrueEnding must be booleans"
+            elif not RewardValidator.validate_user_address(item.get("userAddress")):
+                errors[i] = "Invalid wallet address"
+            elif not isinstance(item.get("gameSessionId"), str) or not RewardValidator.validate_game_session(item["gameSessionId"]):
+                errors[i] = "Invalid game session ID"
+            elif not RewardValidator.validate_game_session(item["gameSessionId"], chain_index, item["userAddress"]):
+                errors[i] = "Game session belongs to another player"
+            else:
+                scores[i], won[i], is_true_ending[i] = score, item_won, item_true_ending
+        
+        bad_score = (scores < 0) | (scores > self.MAX_SCORE)
+        for i in np.flatnonzero(bad_score):
+            errors[i] = errors[i] or "Invalid score"
+        valid = np.array([error is None for error in errors], dtype=bool)
+        rewards = np.zeros(count, dtype=np.uint64)
+        rewards[valid] = self.calculate_rewards(scores[valid], is_true_ending[valid], won[valid])
+        
+        completed_at = datetime.now().isoformat()
+        records, positions = [], []
+        for i in np.flatnonzero(valid).tolist():
+            item, reward_amount = items[i], int(rewards[i])
+            records.append({
+                "success": True,
+                "gameSessionId": item["gameSessionId"],
+                "userAddress": item["userAddress"],
+                "score": item["score"],
+                "won": item["won"],
+                "isTrueEnding": item.get("isTrueEnding", False),
+                "rewardAmount": reward_amount,
+                "completedAt": completed_at,
+                "needsBlockchainProof": item["won"] and reward_amount > 0,
+            })
+            positions.append(i)
+        stored = add_completions(self.db, records) if self.db is not None else [(r, True) for r in records]
+        
+        results = [{"success": False, "error": error} for error in errors]
+        for i, (record, created) in zip(positions, stored):
+            results[i] = {**record, "duplicate": not created}
+        logger.info(f"Batch of {count} completions: {len(records)} recorded, {count - len(records)} rejected")
+        return results
 
 
 class RewardValidator:
     """Validates reward claims and game sessions"""
     
     @staticmethod
-    def validate_game_session(game_session_id: str) -> bool:
-        """Validate that game session exists and is valid"""
+    def validate_game_session(game_session_id: str, chain_index=None, user_address: Optional[str] = None) -> bool:
+        """
+        Validate that game session exists and is valid. The chain index only learns a
+        session when its completion proof goes on-chain, usually after this call, so an
+        unknown session is accepted; one the index attributes to another player than
+        `user_address` is not.
+        """
         try:
             if not game_session_id or len(game_session_id) < 10:
                 return False
-            return True
+            session = chain_index.session(game_session_id) if chain_index is not None else None
+            if session is None or user_address is None:
+                return True
+            return session["player"] == normalize_address(user_address)
         except Exception as e:
             logger.error(f"Error validating game session: {e}")
             return False
@@ -18,6 +18,7 @@ class NewGameResponse(BaseModel):
 class InteractRequest(BaseModel):
     villager_id: str
     player_prompt: Optional[str] = None
+    idempotency_key: Optional[str] = None # Same key = same turn; retries get the original response
 
 class InteractResponse(BaseModel):
     villager_id: str